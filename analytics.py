@@ -0,0 +1,117 @@
+from datetime import date
+from typing import Dict, List, Tuple
+from order_events import KIND_BOX
+from order_lines import OrderLines
+try:
+    import numpy as np
+except ImportError:  # Reports fall back to the pure-Python path
+    np = None
+
+class AnalyticsEngine:
+    def __init__(self, lines: OrderLines, use_numpy: bool = None, rows: range = None):
+        """Initialize report aggregations over the order-line columns
+
+        Every aggregation has a NumPy path (vectorized group-by with argsort and
+        reduceat over int64 columns) and a pure-Python path. Both sum integers only,
+        so they return identical numbers.
+
+        Args:
+            lines (OrderLines): Open order-line columns
+            use_numpy (bool): Force a path; by default NumPy is used when installed
+            rows (range): Only aggregate these rows, e.g. one worker's share; all rows by default
+        """
+        if use_numpy is None:
+            use_numpy = np is not None
+        if use_numpy and np is None:
+            raise ImportError("NumPy is not installed")
+        self.lines = lines
+        self.use_numpy = use_numpy
+        self.rows = rows if rows is not None else range(len(lines))
+
+    def _column(self, name: str):
+        if self.use_numpy:
+            if not len(self.lines):
+                return np.zeros(0, np.int64)
+            return np.frombuffer(self.lines[name], dtype=np.int64)[self.rows.start:self.rows.stop]
+        return self.lines[name]
+
+    def _group_sum(self, key_column: str, value_column: str, day_range: Tuple[int, int] = None,
+                   key_map=None) -> Dict[int, int]:
+        """Sum value_column per distinct key, optionally within [first_day, last_day]
+
+        Args:
+            key_column (str): Column to group by
+            value_column (str): Column to sum
+            day_range (Tuple[int, int]): Inclusive day ordinals to keep, or None for all rows
+            key_map (Callable): Applied to the keys before grouping (vectorized on the NumPy path)
+
+        Returns:
+            Dict[int, int]: key -> sum, for keys with at least one row
+        """
+        if self.use_numpy:
+            keys = self._column(key_column)
+            values = self._column(value_column)
+            if day_range is not None:
+                days = self._column('day')
+                mask = (days >= day_range[0]) & (days <= day_range[1])
+                keys, values = keys[mask], values[mask]
+            if key_map is not None:
+                keys = key_map(keys)
+            if not len(keys):
+                return {}
+            order = np.argsort(keys, kind='stable')
+            keys, values = keys[order], values[order]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            sums = np.add.reduceat(values, starts)
+            return dict(zip(keys[starts].tolist(), sums.tolist()))
+
+        totals: Dict[int, int] = {}
+        keys = self.lines[key_column]
+        values = self.lines[value_column]
+        days = self.lines['day']
+        for row in self.rows:
+            if day_range is not None and not day_range[0] <= days[row] <= day_range[1]:
+                continue
+            key = keys[row] if key_map is None else key_map(keys[row])
+            totals[key] = totals.get(key, 0) + values[row]
+        return totals
+
+    def popular_products(self) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+        """Rank products by quantity sold, box contents included
+
+        Returns:
+            Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]: (veggies, boxes) as
+                (name, quantity in thousandths), best sellers first
+        """
+        return rank_products(self.lines, self.sku_quantities())
+
+    def sku_quantities(self) -> Dict[int, int]:
+        """Quantity sold in thousandths per sku id, box contents included"""
+        return self._group_sum('sku', 'qty')
+
+    def revenue_by_day(self, start_date: date, end_date: date) -> List[Tuple[date, int]]:
+        """Line revenue in cents per day with sales, before discounts and delivery"""
+        totals = self._group_sum('day', 'cents', (start_date.toordinal(), end_date.toordinal()))
+        return [(date.fromordinal(day), cents) for day, cents in sorted(totals.items())]
+
+    def revenue_by_week(self, start_date: date, end_date: date) -> List[Tuple[date, int]]:
+        """Line revenue in cents per week (keyed by its Monday), before discounts and delivery"""
+        # Day ordinal 1 (0001-01-01) is a Monday
+        week_start = lambda days: days - (days - 1) % 7
+        totals = self._group_sum('day', 'cents', (start_date.toordinal(), end_date.toordinal()),
+                                 key_map=week_start)
+        return [(date.fromordinal(day), cents) for day, cents in sorted(totals.items())]
+
+    def customer_spend(self) -> List[Tuple[str, int]]:
+        """Line revenue in cents per customer, biggest spenders first"""
+        totals = self._group_sum('cust', 'cents')
+        return sorted(((self.lines.customers[cust], cents) for cust, cents in totals.items()),
+                      key=lambda pair: (-pair[1], pair[0]))
+
+def rank_products(lines: OrderLines, quantities: Dict[int, int]) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+    """Split per-sku quantities into (veggies, boxes) as (name, quantity), best sellers first"""
+    veggies, boxes = [], []
+    for sku, qty in quantities.items():
+        (boxes if lines.kinds[sku] == KIND_BOX else veggies).append((lines.skus[sku], qty))
+    by_quantity = lambda pair: (-pair[1], pair[0])
+    return sorted(veggies, key=by_quantity), sorted(boxes, key=by_quantity)
@@ -1,38 +1,116 @@
+import logging
 from typing import Dict, List
-from decimal import Decimal
 from login import Login
 import os
-from decimal import ROUND_HALF_UP
-import pickle
 from model import *
+from pricing import PriceTable, set_catalog
+from money import Money, ZERO
+from price_history import PriceHistory
+from datetime import date
+from identity_map import customer_map
+from credit_ledger import credit_ledger
+from storage import load_store, store_version, verify_stores
+from order_archive import archive_fulfilled_orders
+from order_store import ensure_manifest, store_paths
+from order_lines import ensure_order_lines, META_FILE as ORDER_LINES_META_FILE
+from identity_map import PRIVATE_CUSTOMERS_FILE, CORPORATE_CUSTOMERS_FILE
+from report_cache import report_cache, DATA_VERSION_FILE
+from customer_stats import customer_stats, STATS_FILE as CUSTOMER_STATS_FILE
+from derived_store import ensure_derived_stores
+from trending import TRENDING_FILE
+from recommendations import recommender, COOCCURRENCE_FILE
+from sketches import SKETCH_FILE
+
+logger = logging.getLogger(__name__)
+
+PRICE_FILES = ('static/veggies.txt', 'static/premadeboxes.txt')
+PRICE_HISTORY_FILE = 'data/price_history.pkl'
 
 # The Company class is the controller class that manages the data and business logic of the application
 class Company:
     def __init__(self):
         '''Initializes the Company class with product data, box configurations, and user data'''
 
+        # Restore the previous generation of any store damaged by a crash mid-write
+        verify_stores(store_paths() + [PRIVATE_CUSTOMERS_FILE, CORPORATE_CUSTOMERS_FILE,
+                       "data/staffs.pkl", PRICE_HISTORY_FILE, "data/sequences.pkl",
+                       ORDER_LINES_META_FILE, DATA_VERSION_FILE, CUSTOMER_STATS_FILE,
+                       TRENDING_FILE, COOCCURRENCE_FILE, SKETCH_FILE])
+
+        # Repair the order manifest if a crash left it behind its partitions
+        ensure_manifest()
+
+        # Keep the hot order store small: move old fulfilled orders to the monthly archive
+        archive_fulfilled_orders()
+        ensure_order_lines()
+        ensure_derived_stores()
+
         # Initialize product data lists
         self.all_veggies_list = []  # Store all vegetables
         self.veggies_weight_list = []  # Store vegetables sold by weight
         self.veggies_unit_list = []    # Store vegetables sold by unit
         self.veggies_pack_list = []    # Store vegetables sold by pack
+        # Initialize box registry (one immutable template per [section] in premadeboxes.txt)
+        self.box_registry: Dict[str, BoxTemplate] = {}
+        self._load_catalog()
+
+        # Customers come from the process-wide identity map (one live object per cust_id)
+        self.private_customers = customer_map().private_customers
+        self.corporate_customers = customer_map().corporate_customers
+        self.staff_members = self.load_data("data/staffs.pkl")
+
+        # Replay committed balances onto the live customers before anything displays them
+        credit_ledger().ensure_loaded()
+
+    def _price_file_mtimes(self) -> Dict[str, float]:
+        """Modification times of the price files, keyed by path"""
+        return {path: os.path.getmtime(path) for path in PRICE_FILES if os.path.exists(path)}
+
+    def _load_catalog(self):
+        """Parse the price files into the display lists, box registry and a new price table
+
+        The lists and registry are refilled in place, since screens hold references to
+        them. Checkouts reprice against the new table from the moment it is installed.
+        """
+        self._catalog_mtimes = self._price_file_mtimes()
+        for products in (self.all_veggies_list, self.veggies_weight_list,
+                         self.veggies_unit_list, self.veggies_pack_list):
+            products.clear()
+        self.box_registry.clear()
+        self.price_table = PriceTable()  # In-memory SKU -> price catalog used to reprice checkouts
         self._parse_veggies()
-        
-        # Initialize box configurations
-        self.smallbox_default_dict = {'price': Decimal('0'), 'contents': []}
-        self.mediumbox_default_dict = {'price': Decimal('0'), 'contents': []}
-        self.largebox_default_dict = {'price': Decimal('0'), 'contents': []}
         self._parse_premadeboxes()
+        set_catalog(self.price_table)
 
-        # Load user data from pickle files
-        self.private_customers = self.load_data("data/private_customers.pkl")
-        self.corporate_customers = self.load_data("data/corporate_customers.pkl")
-        self.staff_members = self.load_data("data/staffs.pkl")
+        # Record catalog price changes so past prices can be looked up by date
+        self.price_history = PriceHistory.sync_store(PRICE_HISTORY_FILE, self._dated_prices())
+
+    def _dated_prices(self):
+        """Catalog (sku, price, effective_from) triples, dated by when their price file last changed"""
+        box_skus = {template.display_name for template in self.box_registry.values()}
+        changed_on = {path: date.fromtimestamp(mtime) for path, mtime in self._catalog_mtimes.items()}
+        for sku, price in self.price_table.items():
+            path = PRICE_FILES[1] if sku in box_skus else PRICE_FILES[0]
+            yield sku, price, changed_on.get(path, date.today())
+
+    def refresh_catalog(self) -> bool:
+        """Reload the price catalog if a price file changed since it was loaded
+
+        Cart lines keep the price shown when they were added, so a line quoted before
+        a price change is rejected as stale at checkout instead of being charged at
+        a price the customer never saw.
+
+        Returns:
+            bool: True if the catalog was reloaded
+        """
+        if self._price_file_mtimes() == self._catalog_mtimes:
+            return False
+        self._load_catalog()
+        return True
 
     def load_data(self, filename):
         """Load data from pickle files"""
-        with open(filename, 'rb') as file:
-            return pickle.load(file)
+        return load_store(filename)
 
     def _parse_veggies(self):
         """Parse vegetables data from veggies.txt"""
@@ -54,10 +132,9 @@ class Company:
                 elif '=' in line and current_type:
                     name, price = line.split('=')
                     name = name.strip()
-                    price_decimal = Decimal(price.strip()).quantize(
-                        Decimal('0.01'), rounding=ROUND_HALF_UP
-                    )
-                    formatted_item = f"{name} - ${float(price_decimal):.2f}"
+                    price_money = Money.from_decimal(price.strip())
+                    formatted_item = f"{name} - ${price_money:.2f}"
+                    self.price_table.set_price(name, price_money)
                     
                     # Add to appropriate lists based on sales type
                     self.all_veggies_list.append(formatted_item)
@@ -74,7 +151,7 @@ class Company:
             raise
             
     def _parse_premadeboxes(self):
-        """Parse premade box configurations from premadeboxes.txt"""
+        """Parse premade box configurations from premadeboxes.txt into the box registry"""
         try:
             if not os.path.exists('static/premadeboxes.txt'):
                 raise FileNotFoundError("static/premadeboxes.txt file not found")
@@ -82,6 +159,8 @@ class Company:
             with open('static/premadeboxes.txt', 'r') as f:
                 lines = f.readlines()
             
+            # Collect raw values per section first, then freeze them into templates
+            sections = {}
             current_size = None
             for line in lines:
                 line = line.strip()
@@ -89,26 +168,36 @@ class Company:
                     continue
                     
                 if line.startswith('['):
-                    current_size = line[1:-1].lower()
+                    current_size = line[1:-1].strip().lower()
+                    sections.setdefault(current_size, {'price': ZERO, 'contents': []})
                 elif '=' in line and current_size:
-                    key, value = line.split('=')
-                    key = key.lower()
+                    key, value = line.split('=', 1)
+                    key = key.strip().lower()
                     
                     if key == 'price':
                         # Save box price
-                        box_dict = getattr(self, f"{current_size}box_default_dict")
-                        box_dict['price'] = Decimal(value.strip()).quantize(
-                            Decimal('0.01'), rounding=ROUND_HALF_UP
-                        )
+                        sections[current_size]['price'] = Money.from_decimal(value.strip())
                     elif key.startswith('item'):
                         # Save box contents
-                        box_dict = getattr(self, f"{current_size}box_default_dict")
-                        box_dict['contents'].append(value.strip())
+                        sections[current_size]['contents'].append(value.strip())
+
+            for size, section in sections.items():
+                template = BoxTemplate(
+                    size=size,
+                    price=section['price'],
+                    contents=tuple(section['contents'])
+                )
+                self.box_registry[size] = template
+                self.price_table.set_price(template.display_name, template.price)
                         
         except FileNotFoundError as e:
             print(f"File Error: {str(e)}")
             raise
 
+    def get_box_template(self, size: str) -> BoxTemplate:
+        """Return the registered box template for the given size (case-insensitive)"""
+        return self.box_registry[size.lower()]
+
     def get_user(self, username, user_type):
         """Get user object based on username and user type from corresponding pickle file"""
         if user_type == "staff":
@@ -160,14 +249,9 @@ class Company:
         text += "\n".join([f"• {item}" for item in self.all_veggies_list])
         
         text += "\n\n Pre-made Boxes:\n"
-        text += f"\n Small Box (${float(self.smallbox_default_dict['price']):.2f})\n"
-        text += f"  Contents: {', '.join(self.smallbox_default_dict['contents'])}"
-        
-        text += f"\n Medium Box (${float(self.mediumbox_default_dict['price']):.2f})\n"
-        text += f"  Contents: {', '.join(self.mediumbox_default_dict['contents'])}"
-        
-        text += f"\n Large Box (${float(self.largebox_default_dict['price']):.2f})\n"
-        text += f"  Contents: {', '.join(self.largebox_default_dict['contents'])}"
+        for template in self.box_registry.values():
+            text += f"\n {template.display_name} (${template.price:.2f})\n"
+            text += f"  Contents: {', '.join(template.contents)}"
 
         return text
 
@@ -185,33 +269,82 @@ class Company:
 
     def staff_all_customers(self):
         """Allow staff to view all customers"""
-        return self.user.show_all_customers()
+        return self._cached_report('all_customers', (), self.user.show_all_customers)
+
+    def staff_search_customers(self, search, field, sort, after=None):
+        """Get one page of the customer directory"""
+        try:
+            return self.user.search_customers(search, field, sort, after)
+        except Exception as e:
+            return f"Error searching customers: {e}"
 
     def staff_sales_report(self, start_date, end_date):
         """Generate and view sales reports"""
-        return self.user.show_sales_report(start_date, end_date)
+        return self._cached_report('sales_report', (start_date, end_date),
+                                   lambda: self.user.show_sales_report(start_date, end_date))
 
     def staff_popular_items(self):
         """View popular items"""
-        return self.user.show_popular_products()
+        return self._cached_report('popular_items', (), self.user.show_popular_products)
+
+    def staff_trending_items(self):
+        """View trending items over recent windows"""
+        # Windows end today, so the ranking moves at midnight even without new orders
+        return self._cached_report('trending_items', (date.today(),), self.user.show_trending_products)
+
+    def staff_demand_forecast(self):
+        """View next week's demand forecast"""
+        return self._cached_report('demand_forecast', (date.today(),), self.user.show_demand_forecast)
+
+    def staff_customer_spend(self):
+        """View total spend per customer"""
+        return self._cached_report('customer_spend', (), self.user.show_customer_spend)
+
+    def staff_price_audit(self):
+        """View hot order lines charged at a price other than the catalog price on their order date"""
+        # The audit also moves when a catalog change adds to the price history
+        return self._cached_report('price_audit', (store_version(PRICE_HISTORY_FILE),),
+                                   lambda: self.user.show_price_audit(self.price_history))
+
+    def _cached_report(self, report, params, compute):
+        """Serve a staff report from the report cache until orders or customers change"""
+        return report_cache().get_or_compute(report, params, compute)
 
     def staff_fulfill_order(self, order_id):
         """Process and fulfill customer orders"""
         return self.user.fulfill_order(order_id)
 
     # Customer Methods
-    def check_out_with_payment(self, data):
-        """Process customer checkout and payment"""
-        return self.user.check_out_with_payment(data)
+    def check_out_with_payment(self, order_data, payment_method, **payment_details):
+        """Process customer checkout and payment against the latest price catalog"""
+        self.refresh_catalog()
+        return order_data['user'].check_out_with_payment(order_data, payment_method, **payment_details)
 
     def customer_make_payment(self):
         """Process customer payment"""
         pass
 
+    def customer_profile(self, customer):
+        """Profile text for the customer's home screen, with their lifetime totals"""
+        return customer.profile(customer_stats(customer.cust_id))
+
     def customer_current_orders(self, customer):
         """Allow customers to view their current orders"""
         return customer.view_current_orders()
 
     def customer_previous_orders(self,customer):
         """Allow customers to view their order history"""
-        return customer.view_previous_orders()
\ No newline at end of file
+        return customer.view_previous_orders()
+
+    def customer_suggestions(self, cart_lines):
+        """Suggest products other customers added alongside the cart's items"""
+        names = set()
+        for line in cart_lines:
+            names.add(line.name)
+            names.update(line.contents)
+        try:
+            return [name for name, _ in recommender().suggest(names)]
+        except Exception:
+            # Suggestions are optional; the cart works without them
+            logger.exception("Could not load suggestions")
+            return []
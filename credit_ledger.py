@@ -0,0 +1,188 @@
+import itertools
+import os
+import pickle
+import threading
+from typing import Dict, NamedTuple, Optional
+from money import Money
+from identity_map import customer_map
+from report_cache import bump_data_version
+from storage import file_lock
+
+LEDGER_JOURNAL_FILE = 'data/credit_ledger.log'
+
+class Reservation(NamedTuple):
+    """Credit held against a customer's limit while a checkout is in progress"""
+    reservation_id: int
+    cust_id: str
+    amount: Money
+
+class CreditLedger:
+    def __init__(self, journal_file: str = LEDGER_JOURNAL_FILE):
+        """Initialize an in-memory balance ledger keyed by cust_id
+
+        Balances and limits are seeded from the customer identity map, then the journal
+        is replayed. The journal is append-only: every committed charge appends one
+        (cust_id, balance_cents) record, so the customer store is never rewritten just
+        to move a balance. Records appended by other processes are replayed before
+        every check, and commits happen under a file lock on the journal, so
+        concurrent tills never charge against a stale balance.
+
+        Args:
+            journal_file (str): Append-only file of committed balances
+        """
+        self.journal_file = journal_file
+        self._balance: Dict[str, int] = {}    # Committed balance owing, in cents
+        self._limit: Dict[str, int] = {}      # max_owing, in cents
+        self._reserved: Dict[str, int] = {}   # Sum of open reservations, in cents
+        self._open: Dict[int, Reservation] = {}
+        self._ids = itertools.count(1)
+        self._journal_offset = 0  # End of the last complete journal record replayed
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _load(self):
+        """Seed balances from the live customers and replay the journal"""
+        self._loaded = True
+        customers = customer_map()
+        for store in (customers.private_customers, customers.corporate_customers):
+            for cust_id, customer in store.items():
+                self._balance[cust_id] = Money.from_decimal(customer.cust_balance).cents
+                self._limit[cust_id] = Money.from_decimal(customer.max_owing).cents
+
+        self._replay()
+
+    def _replay(self):
+        """Apply journal records written since the last replay, including other processes' commits"""
+        if not os.path.exists(self.journal_file):
+            return
+        if os.path.getsize(self.journal_file) <= self._journal_offset:
+            return
+        customers = customer_map()
+        with open(self.journal_file, 'rb') as file:
+            file.seek(self._journal_offset)
+            while True:
+                try:
+                    cust_id, balance_cents = pickle.load(file)
+                except Exception:
+                    break  # End of journal, or a record still being written
+                self._journal_offset = file.tell()
+                self._balance[cust_id] = balance_cents
+                # Bring the live customer object in line with the replayed balance
+                customer = customers.get(cust_id)
+                if customer is not None:
+                    customer.cust_balance = Money(balance_cents).to_decimal()
+
+    def ensure_loaded(self):
+        """Load the ledger if this has not happened yet, otherwise replay new journal records"""
+        if not self._loaded:
+            self._load()
+        else:
+            self._replay()
+
+    def _headroom(self, cust_id: str) -> int:
+        """Credit still available in cents, after committed balance and open reservations"""
+        return self._limit[cust_id] - self._balance[cust_id] - self._reserved.get(cust_id, 0)
+
+    def balance(self, cust_id: str) -> Optional[Money]:
+        """Return the committed balance owing, or None if the customer is unknown"""
+        with self._lock:
+            self.ensure_loaded()
+            if cust_id not in self._balance:
+                return None
+            return Money(self._balance[cust_id])
+
+    def can_reserve(self, cust_id: str, amount) -> bool:
+        """O(1) check whether amount fits under the customer's max owing limit"""
+        with self._lock:
+            self.ensure_loaded()
+            if cust_id not in self._limit:
+                return False
+            return Money.from_decimal(amount).cents <= self._headroom(cust_id)
+
+    def reserve(self, cust_id: str, amount) -> Optional[Reservation]:
+        """Atomically check the limit and hold credit for a checkout
+
+        Args:
+            cust_id (str): Customer id
+            amount (Money | Decimal): Amount to hold
+
+        Returns:
+            Reservation: The hold, or None if it would exceed the customer's limit
+        """
+        with self._lock:
+            if not self.can_reserve(cust_id, amount):
+                return None
+            reservation = Reservation(next(self._ids), cust_id, Money.from_decimal(amount))
+            self._reserved[cust_id] = self._reserved.get(cust_id, 0) + reservation.amount.cents
+            self._open[reservation.reservation_id] = reservation
+            return reservation
+
+    def commit(self, reservation: Reservation) -> Money:
+        """Turn a reservation into a charge on the customer's balance and journal it
+
+        The limit is checked again against the latest journal, since another process
+        may have charged the same customer after the reservation was made.
+
+        Returns:
+            Money: The new balance owing, or None if the charge no longer fits the limit
+        """
+        with self._lock, file_lock(self.journal_file):
+            self._close(reservation)
+            self._replay()
+            new_balance = self._balance[reservation.cust_id] + reservation.amount.cents
+            if new_balance + self._reserved.get(reservation.cust_id, 0) > self._limit[reservation.cust_id]:
+                return None
+            return self._set_balance(reservation.cust_id, new_balance)
+
+    def refund(self, cust_id: str, amount) -> Money:
+        """Take a committed charge back off the customer's balance and journal it
+
+        This is the compensating entry for a charge whose order could not be saved.
+
+        Args:
+            cust_id (str): Customer id
+            amount (Money | Decimal): Amount charged
+
+        Returns:
+            Money: The new balance owing
+        """
+        with self._lock, file_lock(self.journal_file):
+            self.ensure_loaded()
+            return self._set_balance(cust_id, self._balance[cust_id] - Money.from_decimal(amount).cents)
+
+    def _set_balance(self, cust_id: str, balance_cents: int) -> Money:
+        """Journal a new committed balance and apply it; the caller holds the journal lock"""
+        self._append(cust_id, balance_cents)
+        self._balance[cust_id] = balance_cents
+        bump_data_version()
+
+        customer = customer_map().get(cust_id)
+        if customer is not None:
+            customer.cust_balance = Money(balance_cents).to_decimal()
+        return Money(balance_cents)
+
+    def release(self, reservation: Reservation) -> None:
+        """Drop a reservation without charging it; does nothing if already closed"""
+        with self._lock:
+            if reservation.reservation_id in self._open:
+                self._close(reservation)
+
+    def _close(self, reservation: Reservation):
+        if self._open.pop(reservation.reservation_id, None) is None:
+            raise ValueError(f"Reservation {reservation.reservation_id} is not open")
+        self._reserved[reservation.cust_id] -= reservation.amount.cents
+
+    def _append(self, cust_id: str, balance_cents: int):
+        """Append one committed balance to the journal"""
+        with open(self.journal_file, 'ab') as file:
+            pickle.dump((cust_id, balance_cents), file)
+            file.flush()
+            os.fsync(file.fileno())
+            self._journal_offset = file.tell()
+
+# Process-wide ledger used by checkout
+_credit_ledger = CreditLedger()
+
+def credit_ledger() -> CreditLedger:
+    """Return the process-wide credit ledger"""
+    return _credit_ledger
@@ -0,0 +1,138 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from identity_map import customer_map
+from customer_stats import CustomerStats, load_customer_stats
+from money import Money
+from report_cache import data_version
+
+SEARCH_FIELDS = ('name', 'username', 'address')
+SORT_KEYS = ('name', 'balance', 'owing', 'spend', 'last_order')
+PAGE_SIZE = 100
+
+class CustomerRow(NamedTuple):
+    """One customer as listed in the directory"""
+    cust_id: str
+    name: str
+    username: str
+    address: str
+    balance: Money
+    max_owing: Money
+    corporate: bool
+    discount_rate: Optional[float]  # Corporate customers only
+    stats: CustomerStats            # Lifetime orders, spend and last order date
+
+    @property
+    def owing(self) -> Money:
+        """Credit still available before the customer reaches max owing"""
+        return self.max_owing - self.balance
+
+class Page(NamedTuple):
+    """One page of directory results"""
+    rows: List[CustomerRow]
+    total: int                   # Customers matching the search, across all pages
+    next_after: Optional[tuple]  # Pass as `after` to get the next page; None on the last page
+
+def _sort_key(row: CustomerRow, sort: str) -> tuple:
+    # cust_id breaks ties, so every key is unique and keyset pagination never skips a row
+    if sort == 'balance':
+        return (-row.balance.cents, row.cust_id)
+    if sort == 'owing':
+        return (row.owing.cents, row.cust_id)
+    if sort == 'spend':
+        return (-row.stats.spend_cents, row.cust_id)
+    if sort == 'last_order':
+        # Most recent first; customers who never ordered last
+        last = row.stats.last_order
+        return (-last.toordinal() if last else 1, row.cust_id)
+    return (row.name.lower(), row.cust_id)
+
+class CustomerDirectory:
+    def __init__(self):
+        """Initialize a searchable, sortable view of every customer
+
+        The directory is built from the identity map and rebuilt whenever the shared
+        data version moves. Searches are case-insensitive prefix matches served from
+        sorted indexes; results come back a page at a time.
+        """
+        self._version = None
+        self._rows: Dict[str, CustomerRow] = {}
+        self._indexes: Dict[str, List[Tuple[str, str]]] = {}  # field -> sorted (term, cust_id)
+        self._orders: Dict[str, List[tuple]] = {}             # sort -> sorted keys
+
+    def _ensure_current(self):
+        version = data_version()
+        if version != self._version:
+            self._build()
+            self._version = version
+
+    def _build(self):
+        rows = {}
+        stats = load_customer_stats()
+        for corporate, customers in ((False, customer_map().private_customers),
+                                     (True, customer_map().corporate_customers)):
+            for cust_id, customer in customers.items():
+                rate = getattr(customer, 'discount_rate', None) if corporate else None
+                rows[cust_id] = CustomerRow(
+                    cust_id, f"{customer.first_name} {customer.last_name}", customer.username,
+                    customer.cust_address or "", Money.from_decimal(customer.cust_balance),
+                    Money.from_decimal(customer.max_owing), corporate,
+                    float(rate) if rate is not None else None, stats.get(cust_id, CustomerStats()))
+
+        name_terms, username_terms, address_terms = [], [], []
+        for cust_id, row in rows.items():
+            # A name matches on its first name, its last name or the full name
+            first, _, last = row.name.lower().partition(' ')
+            name_terms.extend({(row.name.lower(), cust_id), (first, cust_id), (last, cust_id)})
+            username_terms.append((row.username.lower(), cust_id))
+            address_terms.append((row.address.lower(), cust_id))
+
+        self._rows = rows
+        self._indexes = {'name': sorted(name_terms), 'username': sorted(username_terms),
+                         'address': sorted(address_terms)}
+        self._orders = {sort: sorted(_sort_key(row, sort) for row in rows.values())
+                        for sort in SORT_KEYS}
+
+    def _matching(self, field: str, prefix: str) -> set:
+        index = self._indexes[field]
+        prefix = prefix.lower()
+        start = bisect_left(index, (prefix,))
+        end = bisect_right(index, (prefix + '\uffff',))
+        return {cust_id for _, cust_id in index[start:end]}
+
+    def page(self, search: str = "", field: str = 'name', sort: str = 'name',
+             offset: int = 0, after: tuple = None, limit: int = PAGE_SIZE) -> Page:
+        """Return one page of customers, optionally filtered by a prefix search
+
+        Args:
+            search (str): Prefix to match, case-insensitive; empty lists every customer
+            field (str): Field searched: 'name', 'username' or 'address'
+            sort (str): 'name', 'balance' (highest first), 'owing' (least credit left first),
+                'spend' (biggest lifetime spend first) or 'last_order' (most recent first)
+            offset (int): Rows to skip, for jumping to a page by number
+            after (tuple): Page.next_after of the previous page; takes precedence over offset
+            limit (int): Maximum rows on the page
+
+        Returns:
+            Page: The rows, the number of matches and the key to continue from
+        """
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"Cannot search customers by {field}")
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Cannot sort customers by {sort}")
+        self._ensure_current()
+
+        keys = self._orders[sort]
+        if search:
+            keys = sorted(_sort_key(self._rows[cust_id], sort)
+                          for cust_id in self._matching(field, search))
+        start = bisect_right(keys, after) if after is not None else offset
+        window = keys[start:start + limit]
+        next_after = window[-1] if start + limit < len(keys) and window else None
+        return Page([self._rows[key[-1]] for key in window], len(keys), next_after)
+
+# Process-wide directory used by the staff screens
+_customer_directory = CustomerDirectory()
+
+def customer_directory() -> CustomerDirectory:
+    """Return the process-wide customer directory"""
+    return _customer_directory
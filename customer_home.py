@@ -160,7 +160,7 @@ class CustomerHome:
         # Customer Profile Area
         self.profile_frame = ttk.LabelFrame(self.left_frame, text="Customer Profile", padding="10")
         self.profile_frame.pack(fill=tk.X, pady=(0, 10))
-        ttk.Label(self.profile_frame, text=str(self.customer)).pack(anchor=tk.W, pady=2)
+        ttk.Label(self.profile_frame, text=self.controller.customer_profile(self.customer)).pack(anchor=tk.W, pady=2)
 
         # Function Area
         self.function_frame = ttk.LabelFrame(self.left_frame, text="Function Area", padding="10")
@@ -0,0 +1,61 @@
+# Lifetime aggregates per customer, derived from the order-event journal.
+from datetime import date
+from typing import Dict, NamedTuple, Optional
+from derived_store import DerivedStore, register
+from money import Money
+from order_events import CHECKOUT, OrderEvent
+
+STATS_FILE = 'data/customer_stats.snapshot.pkl'
+
+class CustomerStats(NamedTuple):
+    """Lifetime totals of one customer"""
+    orders: int = 0
+    fulfilled: int = 0
+    spend_cents: int = 0                # Sum of order sales_amount: after discount, before delivery
+    first_order: Optional[date] = None
+    last_order: Optional[date] = None
+
+    @property
+    def spend(self) -> Money:
+        return Money(self.spend_cents)
+
+    @property
+    def average_basket(self) -> Money:
+        """Average order sales amount, rounded down to the cent"""
+        return Money(self.spend_cents // self.orders) if self.orders else Money(0)
+
+    def add_order(self, day: date, sales_cents: int) -> 'CustomerStats':
+        """Return the totals with one more placed order"""
+        return self._replace(
+            orders=self.orders + 1,
+            spend_cents=self.spend_cents + sales_cents,
+            first_order=day if self.first_order is None else min(self.first_order, day),
+            last_order=day if self.last_order is None else max(self.last_order, day))
+
+class CustomerStatsStore(DerivedStore):
+    def __init__(self, snapshot_file: str = STATS_FILE):
+        """Initialize the lifetime totals of every customer with at least one order, keyed by cust_id"""
+        super().__init__(snapshot_file, "lifetime totals")
+
+    def new_state(self) -> Dict[str, CustomerStats]:
+        return {}
+
+    def apply(self, state: Dict[str, CustomerStats], event: OrderEvent):
+        stats = state.get(event.cust_id, CustomerStats())
+        if event.kind == CHECKOUT:
+            state[event.cust_id] = stats.add_order(date.fromordinal(event.day), event.sales_cents)
+        else:
+            state[event.cust_id] = stats._replace(fulfilled=stats.fulfilled + 1)
+
+_customer_stats_store = register(CustomerStatsStore())
+
+def load_customer_stats() -> Dict[str, CustomerStats]:
+    """Return the lifetime totals of every customer with at least one order, keyed by cust_id
+
+    The result is shared and must not be changed.
+    """
+    return _customer_stats_store.current()
+
+def customer_stats(cust_id: str) -> CustomerStats:
+    """Return the lifetime totals of one customer; all zero if they have never ordered"""
+    return load_customer_stats().get(cust_id, CustomerStats())
@@ -0,0 +1,132 @@
+# Stores derived from the order-event journal: a snapshot plus the journal tail.
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, List
+from order_events import (ORDER_EVENTS_FILE, OrderEvent, checkout_event, fulfill_event,
+                          journal_size, read_events)
+from storage import file_lock, footer_version, load_store, save_store
+
+logger = logging.getLogger(__name__)
+
+class DerivedStore(ABC):
+    def __init__(self, snapshot_file: str, description: str):
+        """Initialize a store kept up to date from the order-event journal
+
+        Checkout and fulfillment only append one small event to the journal. The
+        snapshot file holds the state folded up to a journal offset; readers load it
+        once and apply the journal's tail in memory, reloading only when the snapshot
+        itself was rewritten. compact() folds the tail into the snapshot, which
+        Company does at startup, and rebuild() recomputes the state from the orders.
+
+        Subclasses provide new_state() and apply().
+
+        Args:
+            snapshot_file (str): Pickle store holding {'state': ..., 'offset': int}
+            description (str): What the store holds, for messages, e.g. "lifetime totals"
+        """
+        self.snapshot_file = snapshot_file
+        self.description = description
+        self._state = None
+        self._offset = 0
+        self._snapshot_version = None
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def new_state(self) -> Any:
+        """Return the state of a store with no events applied"""
+        pass
+
+    @abstractmethod
+    def apply(self, state: Any, event: OrderEvent) -> None:
+        """Apply one event to the state in place"""
+        pass
+
+    def trim(self, state: Any) -> None:
+        """Drop state that is no longer needed before a snapshot is saved"""
+
+    def _new_snapshot(self) -> dict:
+        return {'state': self.new_state(), 'offset': 0}
+
+    def _fold(self, state: Any, offset: int) -> int:
+        for event, offset in read_events(offset):
+            self.apply(state, event)
+        return offset
+
+    def current(self) -> Any:
+        """Return the state with every journalled event applied
+
+        The result is shared with later calls and must not be changed.
+        """
+        with self._lock:
+            version = footer_version(self.snapshot_file)
+            if version != self._snapshot_version:
+                snapshot = load_store(self.snapshot_file, self._new_snapshot)
+                self._state, self._offset = snapshot['state'], snapshot['offset']
+                self._snapshot_version = version
+            self._offset = self._fold(self._state, self._offset)
+            return self._state
+
+    def compact(self) -> None:
+        """Fold the journal tail into the snapshot"""
+        with file_lock(self.snapshot_file):
+            snapshot = load_store(self.snapshot_file, self._new_snapshot)
+            offset = self._fold(snapshot['state'], snapshot['offset'])
+            if offset != snapshot['offset']:
+                self.trim(snapshot['state'])
+                save_store(self.snapshot_file, {'state': snapshot['state'], 'offset': offset})
+
+    def rebuild(self, orders: Iterable['Order'] = None) -> None:
+        """Recompute the snapshot from every hot and archived order
+
+        The journal is locked meanwhile, so no event lands between the orders being
+        read and the offset the snapshot is taken at. Run it while the tills are idle:
+        an order saved just before the rebuild but journalled after it counts twice.
+
+        Args:
+            orders (Iterable[Order]): Orders to replay, by default every hot and archived order
+        """
+        from model import OrderStatus
+        from order_archive import load_orders
+        with file_lock(ORDER_EVENTS_FILE), file_lock(self.snapshot_file):
+            offset = journal_size()
+            state = self.new_state()
+            for order in load_orders().values() if orders is None else orders:
+                self.apply(state, checkout_event(order))
+                if order.order_status == OrderStatus.FULFILLED:
+                    self.apply(state, fulfill_event(order))
+            self.trim(state)
+            save_store(self.snapshot_file, {'state': state, 'offset': offset})
+
+    def ensure(self) -> None:
+        """Build the snapshot if it has never been built, otherwise compact it"""
+        if os.path.exists(self.snapshot_file):
+            self.compact()
+        else:
+            self.rebuild()
+
+# Every derived store, registered by the module defining it
+_derived_stores: List[DerivedStore] = []
+
+def register(store: DerivedStore) -> DerivedStore:
+    """Add a store to the ones built and compacted at startup, returning it"""
+    _derived_stores.append(store)
+    return store
+
+def ensure_derived_stores() -> None:
+    """Build or compact every registered store; a failure leaves that store to its journal tail"""
+    for store in _derived_stores:
+        try:
+            store.ensure()
+        except Exception:
+            logger.exception("Could not update the %s in %s (run rebuild_stores.py to rebuild it)",
+                             store.description, store.snapshot_file)
+
+def rebuild_derived_stores() -> List[DerivedStore]:
+    """Rebuild every registered store from the orders, loading them only once"""
+    from order_archive import load_orders
+    orders = list(load_orders().values())
+    for store in _derived_stores:
+        store.rebuild(orders)
+    return _derived_stores
@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+from typing import List, NamedTuple, Tuple
+from order_lines import OrderLines
+try:
+    import numpy as np
+except ImportError:  # Forecasts fall back to the pure-Python path
+    np = None
+
+HISTORY_DAYS = 182       # Days of demand the models are fitted on
+MOVING_AVERAGE_DAYS = 28
+SMOOTHING_ALPHA = 0.3    # Weight of the newest day in exponential smoothing
+HORIZON_DAYS = 7
+
+class Forecast(NamedTuple):
+    """Demand forecast for one SKU, quantities in thousandths per day unless noted"""
+    name: str
+    kind: int                    # KIND_* of order_events
+    moving_average: float        # Mean daily demand over the last MOVING_AVERAGE_DAYS
+    smoothed: float              # Exponentially smoothed daily demand
+    daily: Tuple[float, ...]     # Smoothed level times the day-of-week index, for the next HORIZON_DAYS
+    next_week: float             # Sum of daily
+
+class DemandForecaster:
+    def __init__(self, lines: OrderLines, use_numpy: bool = None):
+        """Initialize demand forecasting over the order-line columns
+
+        Daily demand per SKU, box contents included, is rolled up into a SKU x day
+        matrix over the last HISTORY_DAYS. Every model is then fitted to all SKUs at
+        once: moving average, simple exponential smoothing, and a day-of-week index
+        (each weekday's mean demand over the overall mean) applied to the smoothed
+        level.
+
+        Args:
+            lines (OrderLines): Open order-line columns
+            use_numpy (bool): Force a path; by default NumPy is used when installed
+        """
+        if use_numpy is None:
+            use_numpy = np is not None
+        if use_numpy and np is None:
+            raise ImportError("NumPy is not installed")
+        self.lines = lines
+        self.use_numpy = use_numpy
+
+    def forecast(self, today: date = None) -> List[Forecast]:
+        """Forecast the next HORIZON_DAYS days after today for every SKU
+
+        Args:
+            today (date): Last day of history, today by default
+
+        Returns:
+            List[Forecast]: One forecast per SKU, highest next-week demand first
+        """
+        today = today or date.today()
+        first_day = today.toordinal() - HISTORY_DAYS + 1
+        # Weekday (Monday 0) of each history day and of each forecast day
+        history_weekdays = [(first_day + i - 1) % 7 for i in range(HISTORY_DAYS)]
+        horizon_weekdays = [(today + timedelta(days=i)).weekday() for i in range(1, HORIZON_DAYS + 1)]
+        if self.use_numpy:
+            fitted = self._fit_numpy(first_day, history_weekdays, horizon_weekdays)
+        else:
+            fitted = self._fit_python(first_day, history_weekdays, horizon_weekdays)
+
+        forecasts = [Forecast(self.lines.skus[sku], self.lines.kinds[sku], moving_average,
+                              smoothed, daily, sum(daily))
+                     for sku, (moving_average, smoothed, daily) in enumerate(fitted)]
+        return sorted(forecasts, key=lambda forecast: (-forecast.next_week, forecast.name))
+
+    def _fit_numpy(self, first_day, history_weekdays, horizon_weekdays):
+        skus = len(self.lines.skus)
+        demand = np.zeros((skus, HISTORY_DAYS))
+        if len(self.lines):
+            days = np.frombuffer(self.lines['day'], dtype=np.int64)
+            mask = (days >= first_day) & (days < first_day + HISTORY_DAYS)
+            np.add.at(demand, (np.frombuffer(self.lines['sku'], dtype=np.int64)[mask],
+                               days[mask] - first_day),
+                      np.frombuffer(self.lines['qty'], dtype=np.int64)[mask])
+
+        moving_average = demand[:, -MOVING_AVERAGE_DAYS:].mean(axis=1)
+        level = demand[:, 0].copy()
+        for day in range(1, HISTORY_DAYS):
+            level = SMOOTHING_ALPHA * demand[:, day] + (1 - SMOOTHING_ALPHA) * level
+
+        weekdays = np.array(history_weekdays)
+        overall = demand.mean(axis=1)
+        index = np.ones((skus, 7))
+        selling = overall > 0
+        for weekday in range(7):
+            index[selling, weekday] = demand[selling][:, weekdays == weekday].mean(axis=1) / overall[selling]
+        daily = level[:, None] * index[:, horizon_weekdays]
+        return [(float(ma), float(sm), tuple(row)) for ma, sm, row in
+                zip(moving_average.tolist(), level.tolist(), daily.tolist())]
+
+    def _fit_python(self, first_day, history_weekdays, horizon_weekdays):
+        demand = [[0] * HISTORY_DAYS for _ in self.lines.skus]
+        days, skus, qtys = self.lines['day'], self.lines['sku'], self.lines['qty']
+        for row in range(len(self.lines)):
+            offset = days[row] - first_day
+            if 0 <= offset < HISTORY_DAYS:
+                demand[skus[row]][offset] += qtys[row]
+
+        fitted = []
+        for series in demand:
+            moving_average = sum(series[-MOVING_AVERAGE_DAYS:]) / MOVING_AVERAGE_DAYS
+            level = float(series[0])
+            for value in series[1:]:
+                level = SMOOTHING_ALPHA * value + (1 - SMOOTHING_ALPHA) * level
+
+            overall = sum(series) / HISTORY_DAYS
+            index = [1.0] * 7
+            if overall > 0:
+                for weekday in range(7):
+                    values = [value for value, day in zip(series, history_weekdays) if day == weekday]
+                    index[weekday] = sum(values) / len(values) / overall
+            fitted.append((moving_average, level,
+                           tuple(level * index[weekday] for weekday in horizon_weekdays)))
+        return fitted
@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional
+from report_cache import bump_data_version
+from storage import load_store, update_store
+
+PRIVATE_CUSTOMERS_FILE = 'data/private_customers.pkl'
+CORPORATE_CUSTOMERS_FILE = 'data/corporate_customers.pkl'
+
+class CustomerIdentityMap:
+    def __init__(self, private_file: str = PRIVATE_CUSTOMERS_FILE,
+                 corporate_file: str = CORPORATE_CUSTOMERS_FILE):
+        """Initialize a map from cust_id to the single live customer object in this process
+
+        Both customer stores are deserialised once, on first use. All reads are then
+        served from memory, and every write goes through commit(), which merges the
+        changed customers into the latest version of the affected store(s) on disk.
+
+        Args:
+            private_file (str): Pickle file holding private customers
+            corporate_file (str): Pickle file holding corporate customers
+        """
+        self.private_file = private_file
+        self.corporate_file = corporate_file
+        self._stores: Dict[str, Dict[str, 'Customer']] = {}
+        self._store_of: Dict[str, str] = {}  # cust_id -> store file
+        self._loaded = False
+
+    def _load(self):
+        """Load both customer stores into the map"""
+        self._loaded = True
+        for filename in (self.private_file, self.corporate_file):
+            customers = load_store(filename)
+            self._stores[filename] = customers
+            for cust_id in customers:
+                self._store_of.setdefault(cust_id, filename)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load()
+
+    @property
+    def private_customers(self) -> Dict[str, 'Customer']:
+        """Live private customers keyed by cust_id"""
+        self._ensure_loaded()
+        return self._stores[self.private_file]
+
+    @property
+    def corporate_customers(self) -> Dict[str, 'Customer']:
+        """Live corporate customers keyed by cust_id"""
+        self._ensure_loaded()
+        return self._stores[self.corporate_file]
+
+    def get(self, cust_id: str) -> Optional['Customer']:
+        """Return the live customer for cust_id, or None if unknown"""
+        self._ensure_loaded()
+        filename = self._store_of.get(cust_id)
+        if filename is None:
+            return None
+        return self._stores[filename][cust_id]
+
+    def register(self, customer: 'Customer', corporate: bool = False) -> 'Customer':
+        """Add a new customer to the map, returning the live object for its cust_id
+
+        Args:
+            customer (Customer): Customer to add
+            corporate (bool): True to keep the customer in the corporate store
+        """
+        existing = self.get(customer.cust_id)
+        if existing is not None:
+            return existing
+        filename = self.corporate_file if corporate else self.private_file
+        self._stores[filename][customer.cust_id] = customer
+        self._store_of[customer.cust_id] = filename
+        return customer
+
+    def commit(self, *customers: 'Customer') -> None:
+        """Write the given customers to their stores; the only write path for customers
+
+        Only the committed customers are replaced in the store on disk, so customers
+        changed by other processes are kept. Orders another process added to a
+        committed customer are merged into the live object first.
+
+        Args:
+            *customers (Customer): Live customers that were changed
+        """
+        self._ensure_loaded()
+        dirty: Dict[str, List['Customer']] = {}
+        for customer in customers:
+            filename = self._store_of.get(customer.cust_id)
+            if filename is None:
+                raise KeyError(f"Customer {customer.cust_id} is not registered")
+            if self._stores[filename][customer.cust_id] is not customer:
+                raise ValueError(f"Customer {customer.cust_id} is not the live object")
+            dirty.setdefault(filename, []).append(customer)
+
+        for filename, changed in dirty.items():
+            def merge(stored: Dict[str, 'Customer']):
+                for customer in changed:
+                    if customer.cust_id in stored:
+                        _merge_orders(customer, stored[customer.cust_id])
+                    stored[customer.cust_id] = customer
+                return stored
+            stored = update_store(filename, merge)
+
+            # Pick up customers registered by other processes
+            live = self._stores[filename]
+            for cust_id, customer in stored.items():
+                if cust_id not in live:
+                    live[cust_id] = customer
+                    self._store_of.setdefault(cust_id, filename)
+        bump_data_version()
+
+def _merge_orders(live: 'Customer', stored: 'Customer'):
+    """Add order references the stored copy of a customer has and the live object does not"""
+    known = {ref.order_number for ref in live.order_refs}
+    live.order_refs.extend(ref for ref in stored.order_refs if ref.order_number not in known)
+
+# Process-wide identity map: one live object per customer id
+_customer_map = CustomerIdentityMap()
+
+def customer_map() -> CustomerIdentityMap:
+    """Return the process-wide customer identity map"""
+    return _customer_map
@@ -0,0 +1,44 @@
+# One-off data migrations for the pickle stores in data/.
+# Run from the project directory: python migrate.py
+import os
+import shutil
+import model  # noqa: F401  (pickled classes live in the model module)
+from identity_map import PRIVATE_CUSTOMERS_FILE, CORPORATE_CUSTOMERS_FILE
+from storage import load_store, save_store
+from order_store import store_paths
+
+def migrate_store(filename: str) -> int:
+    """Rewrite a pickle store so every Order holds a cust_id instead of a customer object,
+    and every Customer holds order references instead of orders
+
+    Loading runs Order.__setstate__, which replaces an embedded order_customer with
+    its cust_id; dumping the result runs Customer.__getstate__, which writes its
+    embedded orders as references, so the normalized form is written. The original file is
+    kept next to the store with a .bak suffix.
+
+    Args:
+        filename (str): Pickle store to migrate
+
+    Returns:
+        int: Number of records in the store, or 0 if the file does not exist
+    """
+    if not os.path.exists(filename):
+        return 0
+
+    records = load_store(filename)
+
+    shutil.copy2(filename, filename + '.bak')
+    save_store(filename, records)
+    return len(records)
+
+def migrate_customer_references():
+    """Normalize customer references in the order stores and order references in the customer stores"""
+    order_partitions = store_paths()[1:]
+    for filename in order_partitions + [PRIVATE_CUSTOMERS_FILE, CORPORATE_CUSTOMERS_FILE]:
+        before = os.path.getsize(filename) if os.path.exists(filename) else 0
+        count = migrate_store(filename)
+        after = os.path.getsize(filename) if os.path.exists(filename) else 0
+        print(f"{filename}: {count} records, {before} -> {after} bytes")
+
+if __name__ == "__main__":
+    migrate_customer_references()
@@ -1,15 +1,36 @@
-from datetime import date
-from typing import List, Dict, Tuple, Any
+import logging
+from datetime import date, timedelta
+from typing import List, Dict, Tuple, Any, NamedTuple
 from decimal import Decimal
 from abc import ABC, abstractmethod
-import pickle
 from enum import Enum
+from pricing import get_catalog, QUANTITY_SCALE
+from identity_map import customer_map
+from credit_ledger import credit_ledger
+from payments_journal import payments_journal
+from sequences import sequences
+from order_archive import ARCHIVE_AFTER_DAYS, load_orders, load_orders_by_ref
+from order_store import (OrderRef, load_hot_orders, load_pending_orders, order_ref, save_order,
+                         update_order)
+from order_lines import open_order_lines
+from analytics import AnalyticsEngine
+from forecasting import DemandForecaster, HORIZON_DAYS
+from customer_directory import customer_directory, Page, PAGE_SIZE
+from sketches import summarize_orders
+from trending import WINDOWS as TRENDING_WINDOWS, trending_products
+from customer_stats import CustomerStats, load_customer_stats
+from report_cache import ReportError
+from order_events import record_checkout, record_fulfillment, KIND_WEIGHT, KIND_PACK, KIND_BOX
+from money import (Money, ZERO, to_milligrams, milligrams_to_kg,
+                   money_fields_to_decimal, money_fields_from_decimal)
+
+logger = logging.getLogger(__name__)
 
 # Constants for business rules
 MAX_PRIVATE_CUSTOMER_OWING = Decimal('100.00')
 DEFAULT_CORPORATE_DISCOUNT = Decimal('0.10')
 DELIVERY_RADIUS_KM = 20
-DELIVERY_FEE = Decimal('10.00')
+DELIVERY_FEE = Money(1000)
 
 class Person:
     def __init__(self, first_name: str, last_name: str, username: str, password: str):
@@ -76,27 +97,26 @@ class Staff(Person):
                 Dict[str, Dict[str, Any]]: Dictionary containing pending orders with their details
             """
             try:
-                with open('data/orders.pkl', 'rb') as file:
-                    orders = pickle.load(file)
-                    # Filter orders with pending status
-                    pending_orders = {k: v for k, v in orders.items() 
-                                    if v.order_status == OrderStatus.PENDING}
+                orders = load_pending_orders()
+                # Filter orders with pending status
+                pending_orders = {k: v for k, v in orders.items() 
+                                if v.order_status == OrderStatus.PENDING}
                     
-                    # Create the result dictionary
-                    current_orders = {
-                        order.order_number: {
-                            "Customer": f"{order.order_customer.first_name} {order.order_customer.last_name}",
-                            "Date": order.order_date,
-                            "Status": order.order_status.value,
-                            "Items": self._get_order_items_string(order),
-                            "Subtotal": order.subtotal,
-                            "Delivery Fee": order.delivery_fee,
-                            "Total Amount": order.total_amount
-                        } 
-                        for order in pending_orders.values()
-                    }
+                # Create the result dictionary
+                current_orders = {
+                    order.order_number: {
+                        "Customer": order.customer_name,
+                        "Date": order.order_date,
+                        "Status": order.order_status.value,
+                        "Items": self._get_order_items_string(order),
+                        "Subtotal": order.subtotal,
+                        "Delivery Fee": order.delivery_fee,
+                        "Total Amount": order.total_amount
+                    } 
+                    for order in pending_orders.values()
+                }
                     
-                    return current_orders
+                return current_orders
             except Exception as e:
                 return {"Error": f"Error loading orders: {str(e)}"}
 
@@ -117,34 +137,38 @@ class Staff(Person):
                 items_str += f"{item.item_name} "
         return items_str
 
-    def show_previous_orders(self) -> Dict[str, Dict[str, Any]]:
-        """Show all orders with 'fulfilled' status
+    def show_previous_orders(self, since: date = None) -> Dict[str, Dict[str, Any]]:
+        """Show orders with 'fulfilled' status placed on or after a date
         
+        Args:
+            since (date): Earliest order date shown, by default ARCHIVE_AFTER_DAYS ago
+            
         Returns:
             Dict[str, Dict[str, Any]]: Dictionary containing fulfilled orders with their details
         """
         try:
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
-                # Filter fulfilled orders
-                fulfilled_orders = {k: v for k, v in orders.items() 
-                                if v.order_status == OrderStatus.FULFILLED}
+            since = since or date.today() - timedelta(days=ARCHIVE_AFTER_DAYS)
+            # Only the hot and archived months from since onwards are opened
+            orders = load_orders(start_date=since)
+            # Filter fulfilled orders
+            fulfilled_orders = {k: v for k, v in orders.items() 
+                            if v.order_status == OrderStatus.FULFILLED and v.order_date >= since}
                 
-                # Create result dictionary
-                previous_orders = {
-                    order.order_number: {
-                        "Customer": f"{order.order_customer.first_name} {order.order_customer.last_name}",
-                        "Date": order.order_date,
-                        "Status": order.order_status.value,
-                        "Items": self._get_order_items_string(order),
-                        "Subtotal": order.subtotal,
-                        "Delivery Fee": order.delivery_fee,
-                        "Total Amount": order.total_amount
-                    } 
-                    for order in fulfilled_orders.values()
-                }
+            # Create result dictionary
+            previous_orders = {
+                order.order_number: {
+                    "Customer": order.customer_name,
+                    "Date": order.order_date,
+                    "Status": order.order_status.value,
+                    "Items": self._get_order_items_string(order),
+                    "Subtotal": order.subtotal,
+                    "Delivery Fee": order.delivery_fee,
+                    "Total Amount": order.total_amount
+                } 
+                for order in fulfilled_orders.values()
+            }
                 
-                return previous_orders
+            return previous_orders
         except Exception as e:
             return {"Error": f"Error loading orders: {str(e)}"}
         
@@ -155,18 +179,14 @@ class Staff(Person):
                 str: Formatted string containing all customer information
             """
             try:
-                # Load private customers
-                with open('data/private_customers.pkl', 'rb') as file:
-                    private_customers = pickle.load(file)
+                # Live customers from the identity map
+                private_customers = customer_map().private_customers
+                corporate_customers = customer_map().corporate_customers
                 
-                # Load corporate customers
-                with open('data/corporate_customers.pkl', 'rb') as file:
-                    corporate_customers = pickle.load(file)
-                
-                # Initialize formatted strings for display
-                formatted_customers = "\n=== Private Customers ===\n"
+                # Collect the parts and join once; appending to one growing string is quadratic
+                parts = ["\n=== Private Customers ===\n"]
                 for cust_id, customer in private_customers.items():
-                    formatted_customers += (
+                    parts.append(
                         f"\nCustomer ID: {cust_id}\n"
                         f"Name: {customer.first_name} {customer.last_name}\n"
                         f"Address: {customer.cust_address}\n"
@@ -174,20 +194,42 @@ class Staff(Person):
                         f"Max Owing: ${customer.max_owing}\n"
                     )
                 
-                formatted_customers += "\n=== Corporate Customers ===\n"
+                parts.append("\n=== Corporate Customers ===\n")
+                lifetime = load_customer_stats()
                 for cust_id, customer in corporate_customers.items():
-                    formatted_customers += (
+                    stats = lifetime.get(cust_id, CustomerStats())
+                    parts.append(
                         f"\nCustomer ID: {cust_id}\n"
                         f"Name: {customer.first_name} {customer.last_name}\n"
                         f"Address: {customer.cust_address}\n"
                         f"Balance: ${customer.cust_balance}\n"
                         f"Max Owing: ${customer.max_owing}\n"
                         f"Discount Rate: {customer.discount_rate * 100}%\n"
+                        f"Lifetime Orders: {stats.orders}\n"
+                        f"Lifetime Spend: ${stats.spend:.2f}\n"
+                        f"Average Basket: ${stats.average_basket:.2f}\n"
+                        f"Last Order: {stats.last_order or 'N/A'}\n"
                     )
                 
-                return formatted_customers
+                return "".join(parts)
             except Exception as e:
-                return "Error loading customers."
+                return ReportError("Error loading customers.")
+
+    def search_customers(self, search: str = "", field: str = 'name', sort: str = 'name',
+                         after: tuple = None, limit: int = PAGE_SIZE) -> Page:
+        """Return one page of the customer directory
+        
+        Args:
+            search (str): Prefix to match, case-insensitive; empty lists every customer
+            field (str): Field searched: 'name', 'username' or 'address'
+            sort (str): 'name', 'balance', 'owing', 'spend' or 'last_order'
+            after (tuple): Page.next_after of the previous page, or None for the first page
+            limit (int): Maximum rows on the page
+            
+        Returns:
+            Page: The rows, the number of matches and the key to continue from
+        """
+        return customer_directory().page(search, field, sort, after=after, limit=limit)
 
     def show_sales_report(self, start_date: date, end_date: date) -> str:
         """Generate a sales report for a specific date range.
@@ -203,9 +245,8 @@ class Staff(Person):
                 - Details for each order in the date range
         """
         try:
-            # Load orders from pickle file
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
+            # Load orders, opening only the archive months in the date range
+            orders = load_orders(start_date, end_date)
             
             # Filter orders within the date range
             valid_orders = [
@@ -214,18 +255,42 @@ class Staff(Person):
             ]
             
             # Calculate total sales for the period
-            total_sales = sum(order.sales_amount for order in valid_orders)
+            total_sales = Money.sum(order.sales_amount for order in valid_orders)
             
             # Initialize report string
             report = []
             report.append(f"=== Sales Report ({start_date} to {end_date}) ===")
             report.append(f"Total Sales: ${total_sales:.2f}\n")
+
+            # Order statistics from the per-day sketches (approximate; see sketches.py)
+            summary = summarize_orders(start_date, end_date)
+            if summary.orders:
+                report.append("Order Statistics (approximate):")
+                report.append(f"  Median Order Value: ${Money(round(summary.median_cents)):.2f}")
+                report.append(f"  95th Percentile Order Value: ${Money(round(summary.p95_cents)):.2f}")
+                report.append(f"  Distinct Customers: {summary.distinct_customers}")
+                report.append("  Basket Sizes: " + ", ".join(
+                    f"{size} lines x {count}" for size, count in summary.basket_sizes.items()))
+                report.append("")
+
+            # Revenue series from the order-line columns
+            with open_order_lines() as lines:
+                engine = AnalyticsEngine(lines)
+                daily = engine.revenue_by_day(start_date, end_date)
+                weekly = engine.revenue_by_week(start_date, end_date)
+            report.append("Revenue by Day (before discounts and delivery):")
+            for day, cents in daily:
+                report.append(f"  {day}: ${Money(cents):.2f}")
+            report.append("Revenue by Week (before discounts and delivery):")
+            for week_start, cents in weekly:
+                report.append(f"  Week of {week_start}: ${Money(cents):.2f}")
+            report.append("")
             
             # Add details for each order
             for order in valid_orders:
                 # Order header information
                 report.append(f"Order Number: {order.order_number}")
-                report.append(f"Customer: {order.order_customer.first_name} {order.order_customer.last_name}")
+                report.append(f"Customer: {order.customer_name}")
                 report.append(f"Date: {order.order_date}")
                 report.append(f"Delivery Method: {order.delivery_method.value}")
                 
@@ -262,7 +327,7 @@ class Staff(Person):
             return '\n'.join(report)
             
         except Exception as e:
-            error_msg = f"Error generating sales report: {e}"
+            error_msg = ReportError(f"Error generating sales report: {e}")
             print(error_msg)  # For debugging
             return error_msg
 
@@ -273,45 +338,11 @@ class Staff(Person):
             str: Formatted string listing popular products and their total quantities sold
         """
         try:
-            # Load orders from pickle file
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
-            
-            # Initialize dictionaries for product quantities
-            veggie_sales = {}     # For all veggie products
-            premade_box_sales = {} # For premade boxes
-            
-            for order in orders.values():
-                for item in order.list_of_items:
-                    # Handle veggie products
-                    if isinstance(item, WeightedVeggie) or isinstance(item, UnitPriceVeggie) or isinstance(item, PackVeggie):
-                        item_name = item.item_name
-                        if isinstance(item, WeightedVeggie):
-                            veggie_sales[item_name] = veggie_sales.get(item_name, 0) + item.weight
-                        elif isinstance(item, UnitPriceVeggie):
-                            veggie_sales[item_name] = veggie_sales.get(item_name, 0) + item.quantity
-                        elif isinstance(item, PackVeggie):
-                            veggie_sales[item_name] = veggie_sales.get(item_name, 0) + item.num_of_pack
-                    
-                    # Handle premade boxes
-                    if isinstance(item, PremadeBox):
-                        box_name = item.item_name
-                        # Count the premade box
-                        premade_box_sales[box_name] = premade_box_sales.get(box_name, 0) + item.quantity
-                        
-                        # Count box contents
-                        for content in item.box_content:
-                            content_name = content.item_name
-                            if isinstance(content, WeightedVeggie):
-                                veggie_sales[content_name] = veggie_sales.get(content_name, 0) + content.weight
-                            elif isinstance(content, UnitPriceVeggie):
-                                veggie_sales[content_name] = veggie_sales.get(content_name, 0) + content.quantity
-                            elif isinstance(content, PackVeggie):
-                                veggie_sales[content_name] = veggie_sales.get(content_name, 0) + content.num_of_pack
-
-            # Sort sales data
-            sorted_veggie_sales = sorted(veggie_sales.items(), key=lambda x: x[1], reverse=True)
-            sorted_premade_box_sales = sorted(premade_box_sales.items(), key=lambda x: x[1], reverse=True)
+            # Rank products over the order-line columns instead of walking the orders
+            with open_order_lines() as lines:
+                veggie_ranking, box_ranking = AnalyticsEngine(lines).popular_products()
+            sorted_veggie_sales = [(name, qty / QUANTITY_SCALE) for name, qty in veggie_ranking]
+            sorted_premade_box_sales = [(name, qty // QUANTITY_SCALE) for name, qty in box_ranking]
 
             # Format the report
             formatted_products = "\n=== Popular Products by Category ===\n"
@@ -327,9 +358,115 @@ class Staff(Person):
             return formatted_products
         
         except Exception as e:
-            return f"Error generating popular products report: {e}"
+            return ReportError(f"Error generating popular products report: {e}")
+        
+    def show_trending_products(self) -> str:
+        """Show the best sellers of the last 7, 30 and 90 days with their rank changes
+        
+        Returns:
+            str: Formatted string listing trending products per window and category
+        """
+        try:
+            def movement(row):
+                if row.change is None:
+                    return "new"
+                if row.change == 0:
+                    return "="
+                return f"{'+' if row.change > 0 else ''}{row.change}"
+
+            parts = ["\n=== Trending Products ===\n"]
+            for window in TRENDING_WINDOWS:
+                veggies, boxes = trending_products(window)
+                parts.append(f"\n--- Last {window} days (change vs previous {window} days) ---\n")
+                parts.append("\n[Veggie Products]\n")
+                for row in veggies:
+                    parts.append(f"{row.rank}. {row.name}: {row.quantity / QUANTITY_SCALE:.2f} sold ({movement(row)})\n")
+                parts.append("\n[Premade Boxes]\n")
+                for row in boxes:
+                    parts.append(f"{row.rank}. {row.name}: {row.quantity // QUANTITY_SCALE} sold ({movement(row)})\n")
+            return "".join(parts)
+        
+        except Exception as e:
+            return ReportError(f"Error generating trending products report: {e}")
+
+    def show_demand_forecast(self) -> str:
+        """Show next week's forecast demand per product, box contents included
+        
+        Returns:
+            str: Formatted string listing each product's forecast, highest demand first
+        """
+        try:
+            with open_order_lines() as lines:
+                forecasts = DemandForecaster(lines).forecast()
+            units = {KIND_WEIGHT: "kg", KIND_PACK: "packs", KIND_BOX: "boxes"}
+
+            parts = [f"\n=== Demand Forecast: next {HORIZON_DAYS} days ===\n",
+                     "(exponentially smoothed daily demand x day-of-week index; "
+                     "28-day average for comparison)\n"]
+            for title, in_category in (("Veggie Products", lambda kind: kind != KIND_BOX),
+                                       ("Premade Boxes", lambda kind: kind == KIND_BOX)):
+                parts.append(f"\n[{title}]\n")
+                for forecast in forecasts:
+                    if not in_category(forecast.kind):
+                        continue
+                    unit = units.get(forecast.kind, "units")
+                    parts.append(
+                        f"{forecast.name}: {forecast.next_week / QUANTITY_SCALE:.2f} {unit} "
+                        f"(28-day average {forecast.moving_average * HORIZON_DAYS / QUANTITY_SCALE:.2f} {unit}/week)\n")
+            return "".join(parts)
+        
+        except Exception as e:
+            return ReportError(f"Error generating demand forecast: {e}")
+
+    def show_customer_spend(self) -> str:
+        """Show total spend per customer, biggest spenders first
+        
+        Returns:
+            str: Formatted string listing each customer's spend before discounts and delivery
+        """
+        try:
+            with open_order_lines() as lines:
+                spend = AnalyticsEngine(lines).customer_spend()
+            
+            formatted_spend = "\n=== Customer Spend ===\n"
+            for cust_id, cents in spend:
+                customer = customer_map().get(cust_id)
+                name = f"{customer.first_name} {customer.last_name}" if customer else "Unknown"
+                formatted_spend += f"{cust_id} ({name}): ${Money(cents):.2f}\n"
+            return formatted_spend
         
-def fulfill_order(self, order_number: str) -> bool:
+        except Exception as e:
+            return ReportError(f"Error generating customer spend report: {e}")
+
+    def show_price_audit(self, price_history: 'PriceHistory') -> str:
+        """Show hot order lines charged at a price other than the catalog price on their order date
+        
+        Args:
+            price_history (PriceHistory): Effective-dated catalog prices
+            
+        Returns:
+            str: Formatted string listing each mismatched line
+        """
+        try:
+            order_items = [(order, item) for order in load_hot_orders().values()
+                           for item in order.list_of_items]
+            catalog_prices = price_history.prices_at((item.item_name, order.order_date)
+                                                     for order, item in order_items)
+            
+            formatted_audit = "\n=== Price Audit ===\n"
+            mismatches = 0
+            for (order, item), catalog_price in zip(order_items, catalog_prices):
+                if catalog_price is not None and item.unit_price != catalog_price:
+                    mismatches += 1
+                    formatted_audit += (f"{order.order_number} ({order.order_date}) {item.item_name}: "
+                                        f"charged ${item.unit_price:.2f}, catalog ${catalog_price:.2f}\n")
+            formatted_audit += f"\n{mismatches} of {len(order_items)} order lines differ from the catalog\n"
+            return formatted_audit
+        
+        except Exception as e:
+            return ReportError(f"Error generating price audit: {e}")
+
+    def fulfill_order(self, order_number: str) -> bool:
         """Update order status from pending to fulfilled
         
         Args:
@@ -338,21 +475,16 @@ def fulfill_order(self, order_number: str) -> bool:
         Returns:
             bool: True if successful, False otherwise
         """
+        fulfilled = []
+        def mark_fulfilled(order):
+            order.order_status = OrderStatus.FULFILLED
+            fulfilled[:] = [order]
+
         try:
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
-            
-            order = orders.get(order_number)
-            if not order:
+            if not update_order(order_number, mark_fulfilled):
                 print(f"Order {order_number} not found")
                 return False
-            
-            order.order_status = OrderStatus.FULFILLED
-            orders[order_number] = order
-            
-            with open('data/orders.pkl', 'wb') as file:
-                pickle.dump(orders, file)
-            
+            record_fulfillment(fulfilled[0])
             return True
         except Exception as e:
             print(f"Error fulfilling order: {e}")
@@ -382,7 +514,8 @@ class Customer(Person):
         self.cust_address = cust_address
         self.cust_balance = cust_balance
         self.max_owing = max_owing
-        self.list_of_orders = []
+        self._order_refs: List[OrderRef] = []  # Orders live in the order store, not here
+        self._legacy_orders = None
         self.list_of_payments = []
         self.cust_id = cust_id
         # Determine delivery availability based on address
@@ -402,6 +535,41 @@ class Customer(Person):
                 f"Maximum Owing: ${self.max_owing:.2f}\n"
                 f"Delivery Available: {'Yes' if self.can_delivery else 'No'}\n")
 
+    @property
+    def order_refs(self) -> List[OrderRef]:
+        """References to the customer's orders, oldest first"""
+        if self._legacy_orders:
+            # Legacy pickles embed whole orders; they are only complete after loading
+            self._order_refs.extend(order_ref(order) for order in self._legacy_orders)
+            self._legacy_orders = None
+        return self._order_refs
+
+    def add_order(self, order: 'Order'):
+        """Remember an order placed by the customer"""
+        self.order_refs.append(order_ref(order))
+
+    def __getstate__(self):
+        """Persist order references instead of the orders themselves"""
+        state = dict(self.__dict__)
+        state['order_refs'] = self.order_refs
+        for transient in ('_order_refs', '_legacy_orders'):
+            state.pop(transient, None)
+        return state
+
+    def __setstate__(self, state):
+        """Restore order references, keeping the embedded orders of legacy pickles to convert"""
+        state['_order_refs'] = list(state.pop('order_refs', ()))
+        state['_legacy_orders'] = state.pop('list_of_orders', None)
+        self.__dict__.update(state)
+
+    def profile(self, stats: CustomerStats) -> str:
+        """Profile text shown on the customer's home screen
+        
+        Args:
+            stats (CustomerStats): Lifetime totals of this customer
+        """
+        return str(self)
+
     def can_place_order(self, order_amount: Decimal) -> bool:
         """Check if customer can place order based on total amount and max owing limit
         
@@ -412,20 +580,12 @@ class Customer(Person):
             bool: True if customer can place order, False otherwise
         """
         try:
-            with open('data/private_customers.pkl', 'rb') as file:
-                customers = pickle.load(file)
-                customer = customers.get(self.cust_id)
-                if customer:
-                    potential_balance = customer.cust_balance + order_amount
-                    can_place = potential_balance <= customer.max_owing
-                    print(f"Order amount: ${order_amount}")
-                    print(f"Current balance: ${customer.cust_balance}")
-                    print(f"Max owing: ${customer.max_owing}")
-                    print(f"Can place order: {can_place}")
-                    return can_place
-                return False
-        except Exception as e:
-            print(f"Error checking order possibility: {e}")
+            can_place = credit_ledger().can_reserve(self.cust_id, order_amount)
+            logger.debug("Order amount $%s, balance $%s, max owing $%s: can place order %s",
+                         order_amount, credit_ledger().balance(self.cust_id), self.max_owing, can_place)
+            return can_place
+        except Exception:
+            logger.exception("Error checking order possibility for %s", self.cust_id)
             return False
 
     def make_payment(self, *, payment_amount: Decimal, payment_date: date, 
@@ -446,6 +606,8 @@ class Customer(Person):
                     For debit card:
                         - bank_name (str)
                         - debit_card_num (str)
+                    Optionally:
+                        - order_number (str): Order the payment is for
                         
             Returns:
                 bool: True if payment successful, False otherwise
@@ -467,6 +629,8 @@ class Customer(Person):
                     payment = CreditCardPayment(
                         payment_amount=payment_amount,
                         payment_date=payment_date,
+                        cust_id=self.cust_id,
+                        order_number=kwargs.get('order_number'),
                         card_number=kwargs['card_number'],
                         card_type=kwargs['card_type'],
                         card_expiry_date=kwargs['card_expiry_date'],
@@ -484,18 +648,14 @@ class Customer(Person):
                     payment = DebitCardPayment(
                         payment_amount=payment_amount,
                         payment_date=payment_date,
+                        cust_id=self.cust_id,
+                        order_number=kwargs.get('order_number'),
                         bank_name=kwargs['bank_name'],
                         debit_card_num=kwargs['debit_card_num']
                     )
 
-                # Update payment records
-                with open('data/payments.pkl', 'rb') as file:
-                    payments = pickle.load(file)
-                payments[payment.payment_id] = payment
-
-                # Save payment records
-                with open('data/payments.pkl', 'wb') as file:
-                    pickle.dump(payments, file)
+                # Append to the payment records
+                payments_journal().append(payment)
 
                 print(f"Payment successful: ${payment_amount}")
                 return True
@@ -504,6 +664,77 @@ class Customer(Person):
                 print(f"Error processing payment: {e}")
                 return False
 
+    def _reprice_cart_lines(self, cart_lines: List['CartLine']) -> List['CartLine']:
+        """Reprice cart lines from the catalog Company installed and reject stale prices
+        
+        Args:
+            cart_lines (List[CartLine]): Lines handed over from the shopping cart
+            
+        Returns:
+            List[CartLine]: Lines carrying catalog prices, or None if any line is
+                unknown or was quoted at a price that no longer matches the catalog
+        """
+        catalog = get_catalog()
+        if catalog is None:
+            logger.error("Price catalog not loaded; cannot reprice the cart")
+            return None
+
+        result = catalog.reprice(cart_lines)
+        if result.unknown_line_ids:
+            logger.warning("Unknown products in cart lines: %s", result.unknown_line_ids)
+            return None
+        if result.stale_line_ids:
+            logger.warning("Stale prices in cart lines: %s", result.stale_line_ids)
+            return None
+
+        return [
+            line._replace(price=Money(unit_cents), subtotal=Money(line_cents))
+            for line, unit_cents, line_cents in zip(cart_lines, result.unit_cents, result.line_cents)
+        ]
+
+    def _build_order_items(self, cart_lines: List['CartLine']) -> List['Item']:
+        """Convert typed cart lines into Item instances with totals calculated
+        
+        Args:
+            cart_lines (List[CartLine]): Lines handed over from the shopping cart
+            
+        Returns:
+            List[Item]: Order items ready to be set on an Order
+        """
+        items = []
+        for line in cart_lines:
+            if line.item_type == 'weight':
+                item = WeightedVeggie(line.name, line.quantity, line.price)
+            elif line.item_type == 'unit':
+                item = UnitPriceVeggie(line.name, int(line.quantity), line.price)
+            elif line.item_type == 'pack':
+                item = PackVeggie(line.name, int(line.quantity), line.price)
+            elif line.item_type == 'box':
+                item = PremadeBox(line.name, int(line.quantity), line.price)
+                item.set_content([self._build_box_content(veg_name) for veg_name in line.contents])
+            else:
+                raise ValueError(f"Unknown cart item type: {line.item_type}")
+
+            item.calculate_total()
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _build_box_content(veg_name: str) -> 'Veggie':
+        """Create a single box content item (one of each, priced as part of the box)
+        
+        Args:
+            veg_name (str): Veggie name including its sales type, e.g. "Carrot by weight/kg"
+            
+        Returns:
+            Veggie: Typed veggie item with a zero price
+        """
+        if 'weight/kg' in veg_name:
+            return WeightedVeggie(veg_name, Decimal('1'), ZERO)
+        elif 'pack' in veg_name:
+            return PackVeggie(veg_name, 1, ZERO)
+        return UnitPriceVeggie(veg_name, 1, ZERO)
+
     def check_out_with_payment(self, order_data: dict, payment_method: str, *, 
                           card_number: str = None,
                           card_type: str = None, 
@@ -522,104 +753,77 @@ class Customer(Person):
         Returns:
             bool: True if checkout successful, False otherwise
         """
+        reservation = None
+        charged = None  # Amount committed to the account ledger
+        saved = False
         try:
-            # Convert cart items to appropriate Item instances
-            items = []
-            for cart_item in order_data['cart_items']:
-                item_type = cart_item['type']
-                name = cart_item['name']  # 使用完整的商品名称
-                price = cart_item['price']
-                quantity = cart_item['quantity']
-                
-                if item_type == 'weight':
-                    # WeightedVeggie(veg_name, weight, weight_per_kilo)
-                    item = WeightedVeggie(name, quantity, price)
-                    
-                elif item_type == 'unit':
-                    # UnitPriceVeggie(veg_name, quantity, price_per_unit)
-                    item = UnitPriceVeggie(name, int(quantity), price)
-                    
-                elif item_type == 'pack':
-                    # PackVeggie(veg_name, num_of_pack, price_per_pack)
-                    item = PackVeggie(name, int(quantity), price)
-                    
-                elif item_type == 'box':
-                    # PremadeBox(box_size, quantity, price)
-                    item = PremadeBox(name, int(quantity), price)  # name 是 "Small Box"等
-                    # 解析box contents并设置
-                    if cart_item['contents']:
-                        contents = []
-                        for content in cart_item['contents'].split(', '):
-                            # content 格式是 "Xxx by weight/kg x 1" 或类似格式
-                            veg_name = content.split(' x ')[0]  # 保留完整的商品名称，包括 "by weight/kg" 等
-                            contents.append(Veggie(veg_name))
-                        item.set_content(contents)
-                        
-                # 计算每个item的总价
-                item.calculate_total()
-                items.append(item)
+            # Reprice every line from the catalog instead of trusting the cart's prices
+            cart_lines = self._reprice_cart_lines(order_data['cart_items'])
+            if cart_lines is None:
+                return False
+
+            # Convert cart lines to appropriate Item instances
+            items = self._build_order_items(cart_lines)
 
-            # Create order
+            # Create order for the live customer object
             order = Order(
-                order_customer=order_data['user'],
+                order_customer=customer_map().get(self.cust_id),
                 order_date=date.today(),
                 delivery_method=DeliveryMethod.DELIVERY if order_data['is_delivery'] else DeliveryMethod.PICKUP
             )
             order.set_items(items)
 
             # Verify order amount equals the total from order_data
-            if abs(order.total_amount - order_data['total']) > Decimal('0.01'):  # 允许0.01的误差
+            if abs(order.total_amount - Money.from_decimal(order_data['total'])) > Money(1):  # 允许0.01的误差
                 print("Order amount mismatch")
                 return False
 
-            # Verify credit limit
-            if not self.can_place_order(order.total_amount):
+            # Hold credit against the limit while the payment is processed
+            reservation = credit_ledger().reserve(self.cust_id, order.total_amount)
+            if reservation is None:
                 print("Order amount exceeds available credit")
                 return False
 
             # Process payment
             if payment_method == "account":
-                if not self.charge_to_account(order.total_amount):
+                if not self.charge_to_account(order.total_amount.to_decimal(), reservation=reservation):
                     return False
+                charged = order.total_amount
             elif payment_method == "credit":
                 if not self.make_payment(
-                    payment_amount=order.total_amount,
+                    payment_amount=order.total_amount.to_decimal(),
                     payment_date=date.today(),
                     payment_method=payment_method,
                     card_number=card_number,
                     card_type=card_type,
                     card_expiry_date=card_expiry_date,
                     cvv=cvv,
-                    card_holder=card_holder
+                    card_holder=card_holder,
+                    order_number=order.order_number
                 ):
                     return False
             else:  # debit
                 if not self.make_payment(
-                    payment_amount=order.total_amount,
+                    payment_amount=order.total_amount.to_decimal(),
                     payment_date=date.today(),
                     payment_method=payment_method,
                     bank_name=bank_name,
-                    debit_card_num=debit_card_num
+                    debit_card_num=debit_card_num,
+                    order_number=order.order_number
                 ):
                     return False
 
-            # Save order
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
-            with open('data/private_customers.pkl', 'rb') as file:
-                customers = pickle.load(file)
-
             # Update order status
             order.order_status = OrderStatus.PENDING
-            order_data['user'].list_of_orders.append(order)
-            orders[order.order_number] = order
-            customers[order_data['user'].cust_id] = order_data['user']
+            customer = order.order_customer
+            customer.add_order(order)
 
-            # Save updates
-            with open('data/orders.pkl', 'wb') as file:
-                pickle.dump(orders, file)
-            with open('data/private_customers.pkl', 'wb') as file:
-                pickle.dump(customers, file)
+            # Save order; only the current month's partition is rewritten
+            save_order(order)
+            saved = True
+            # One journal event keeps every store derived from the orders up to date
+            record_checkout(order)
+            customer_map().commit(customer)
 
             print(f"Order {order.order_number} created and paid successfully")
             return True
@@ -627,34 +831,49 @@ class Customer(Person):
         except Exception as e:
             print(f"Error processing checkout: {str(e)}")
             return False
+        finally:
+            # Card payments and failed checkouts never charge the account
+            if reservation is not None:
+                credit_ledger().release(reservation)
+            # An account charge is taken back if its order was never saved
+            if charged is not None and not saved:
+                self._refund_charge(order, charged)
         
-    def charge_to_account(self, amount: Decimal) -> bool:
-            """Charge amount to customer account
+    def charge_to_account(self, amount: Decimal, reservation: 'Reservation' = None) -> bool:
+            """Charge amount to customer account through the credit ledger
             
             Args:
                 amount (Decimal): Amount to charge
+                reservation (Reservation): Credit already held for this charge, if any
                 
             Returns:
                 bool: True if charge successful, False otherwise
             """
             try:
-                with open('data/private_customers.pkl', 'rb') as file:
-                    customers = pickle.load(file)
-                    if self.cust_id not in customers:
+                if reservation is None:
+                    reservation = credit_ledger().reserve(self.cust_id, amount)
+                    if reservation is None:
                         return False
-                    
-                    self.cust_balance += amount
-                    customers[self.cust_id] = self
-                    
-                    with open('data/private_customers.pkl', 'wb') as file:
-                        pickle.dump(customers, file)
-                    
-                    print(f"Successfully charged ${amount} to account {self.cust_id}")
-                    return True
+                
+                if credit_ledger().commit(reservation) is None:
+                    logger.warning("Charge of $%s to account %s exceeds available credit", amount, self.cust_id)
+                    return False
+                
+                print(f"Successfully charged ${amount} to account {self.cust_id}")
+                return True
             except Exception as e:
                 print(f"Error charging to account: {e}")
                 return False
 
+    def _refund_charge(self, order: 'Order', amount: Money):
+        """Append a compensating ledger entry for an account charge whose order was not saved"""
+        try:
+            credit_ledger().refund(self.cust_id, amount)
+            logger.warning("Refunded $%.2f charged for unsaved order %s", amount.to_decimal(), order.order_number)
+        except Exception:
+            logger.exception("Could not refund $%.2f charged to account %s for unsaved order %s",
+                             amount.to_decimal(), self.cust_id, order.order_number)
+
     def view_current_orders(self) -> Dict[str, Dict[str, Any]]:
         """View customer's current (pending) orders in a formatted dictionary
         
@@ -662,30 +881,29 @@ class Customer(Person):
             Dict[str, Dict[str, Any]]: Dictionary containing customer's pending orders with their details
         """
         try:
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
-                # Filter orders for current customer and pending status
-                pending_orders = {
-                    k: v for k, v in orders.items() 
-                    if v.order_customer.cust_id == self.cust_id 
-                    and v.order_status == OrderStatus.PENDING
-                }
+            orders = load_pending_orders()
+            # Filter orders for current customer and pending status
+            pending_orders = {
+                k: v for k, v in orders.items() 
+                if v.cust_id == self.cust_id 
+                and v.order_status == OrderStatus.PENDING
+            }
                 
-                # Create the result dictionary with the same format as staff view
-                current_orders = {
-                    order.order_number: {
-                        "Customer": f"{order.order_customer.first_name} {order.order_customer.last_name}",
-                        "Date": order.order_date,
-                        "Status": order.order_status.value,
-                        "Items": self._get_order_items_string(order),
-                        "Subtotal": order.subtotal,
-                        "Delivery Fee": order.delivery_fee,
-                        "Total Amount": order.total_amount
-                    } 
-                    for order in pending_orders.values()
-                }
+            # Create the result dictionary with the same format as staff view
+            current_orders = {
+                order.order_number: {
+                    "Customer": order.customer_name,
+                    "Date": order.order_date,
+                    "Status": order.order_status.value,
+                    "Items": self._get_order_items_string(order),
+                    "Subtotal": order.subtotal,
+                    "Delivery Fee": order.delivery_fee,
+                    "Total Amount": order.total_amount
+                } 
+                for order in pending_orders.values()
+            }
                 
-                return current_orders
+            return current_orders
         except Exception as e:
             return {"Error": f"Error loading orders: {str(e)}"}
 
@@ -696,30 +914,29 @@ class Customer(Person):
             Dict[str, Dict[str, Any]]: Dictionary containing customer's fulfilled orders with their details
         """
         try:
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
-                # Filter orders for current customer and fulfilled status
-                fulfilled_orders = {
-                    k: v for k, v in orders.items() 
-                    if v.order_customer.cust_id == self.cust_id 
-                    and v.order_status == OrderStatus.FULFILLED
-                }
+            orders = load_orders_by_ref(self.order_refs)
+            # Filter orders for current customer and fulfilled status
+            fulfilled_orders = {
+                k: v for k, v in orders.items() 
+                if v.cust_id == self.cust_id 
+                and v.order_status == OrderStatus.FULFILLED
+            }
                 
-                # Create the result dictionary with the same format as staff view
-                previous_orders = {
-                    order.order_number: {
-                        "Customer": f"{order.order_customer.first_name} {order.order_customer.last_name}",
-                        "Date": order.order_date,
-                        "Status": order.order_status.value,
-                        "Items": self._get_order_items_string(order),
-                        "Subtotal": order.subtotal,
-                        "Delivery Fee": order.delivery_fee,
-                        "Total Amount": order.total_amount
-                    } 
-                    for order in fulfilled_orders.values()
-                }
+            # Create the result dictionary with the same format as staff view
+            previous_orders = {
+                order.order_number: {
+                    "Customer": order.customer_name,
+                    "Date": order.order_date,
+                    "Status": order.order_status.value,
+                    "Items": self._get_order_items_string(order),
+                    "Subtotal": order.subtotal,
+                    "Delivery Fee": order.delivery_fee,
+                    "Total Amount": order.total_amount
+                } 
+                for order in fulfilled_orders.values()
+            }
                 
-                return previous_orders
+            return previous_orders
         except Exception as e:
             return {"Error": f"Error loading orders: {str(e)}"}
 
@@ -766,32 +983,17 @@ class CorporateCustomer(Customer):
         base_str = super().__str__()
         return base_str[:-1] + f"\nDiscount Rate: {self.discount_rate:.0%}\n"
 
-    def can_place_order(self, order_amount: Decimal) -> bool:
-        """Check if corporate customer can place order based on total amount and max owing limit
+    def profile(self, stats: CustomerStats) -> str:
+        """Profile text including the customer's lifetime totals
         
         Args:
-            order_amount (Decimal): Amount of the potential order
-            
-        Returns:
-            bool: True if customer can place order, False otherwise
+            stats (CustomerStats): Lifetime totals of this customer
         """
-        try:
-            with open('data/corporate_customers.pkl', 'rb') as file:
-                customers = pickle.load(file)
-                customer = customers.get(self.cust_id)
-                if customer:
-                    potential_balance = customer.cust_balance + order_amount
-                    can_place = potential_balance <= customer.max_owing
-                    print(f"Order amount: ${order_amount}")
-                    print(f"Current balance: ${customer.cust_balance}")
-                    print(f"Max owing: ${customer.max_owing}")
-                    print(f"Can place order: {can_place}")
-                    return can_place
-                return False
-        except Exception as e:
-            print(f"Error checking order possibility: {e}")
-            return False
-        
+        return (str(self) + f"Lifetime Orders: {stats.orders}\n"
+                f"Lifetime Spend: ${stats.spend:.2f}\n"
+                f"Average Basket: ${stats.average_basket:.2f}\n"
+                f"Last Order: {stats.last_order or 'N/A'}\n")
+
     def check_out_with_payment(self, order_data: dict, payment_method: str, *, 
                           card_number: str = None,
                           card_type: str = None, 
@@ -810,89 +1012,72 @@ class CorporateCustomer(Customer):
         Returns:
             bool: True if checkout successful, False otherwise
         """
+        reservation = None
+        charged = None  # Amount committed to the account ledger
+        saved = False
         try:
-            # Convert cart items to appropriate Item instances
-            items = []
-            for cart_item in order_data['cart_items']:
-                item_type = cart_item['type']
-                name = cart_item['name']
-                price = cart_item['price']
-                quantity = cart_item['quantity']
-                
-                if item_type == 'weight':
-                    item = WeightedVeggie(name, quantity, price)
-                elif item_type == 'unit':
-                    item = UnitPriceVeggie(name, int(quantity), price)
-                elif item_type == 'pack':
-                    item = PackVeggie(name, int(quantity), price)
-                elif item_type == 'box':
-                    item = PremadeBox(name, int(quantity), price)
-                    if cart_item['contents']:
-                        contents = []
-                        for content in cart_item['contents'].split(', '):
-                            veg_name = content.split(' x ')[0]
-                            contents.append(Veggie(veg_name))
-                        item.set_content(contents)
-                
-                item.calculate_total()
-                items.append(item)
+            # Reprice every line from the catalog instead of trusting the cart's prices
+            cart_lines = self._reprice_cart_lines(order_data['cart_items'])
+            if cart_lines is None:
+                return False
 
-            # Create order
+            # Convert cart lines to appropriate Item instances
+            items = self._build_order_items(cart_lines)
+
+            # Create order for the live customer object
             order = Order(
-                order_customer=self,
+                order_customer=customer_map().get(self.cust_id),
                 order_date=date.today(),
                 delivery_method=DeliveryMethod.DELIVERY if order_data['is_delivery'] else DeliveryMethod.PICKUP
             )
             order.set_items(items)
 
-            # Verify order amount
-            if not self.can_place_order(order.total_amount):
+            # Hold credit against the limit while the payment is processed
+            reservation = credit_ledger().reserve(self.cust_id, order.total_amount)
+            if reservation is None:
                 print("Order amount exceeds available credit limit for corporate customer")
                 return False
 
             # Process payment
             if payment_method == "account":
-                if not self.charge_to_account(order.total_amount):
+                if not self.charge_to_account(order.total_amount.to_decimal(), reservation=reservation):
                     return False
+                charged = order.total_amount
             elif payment_method == "credit":
                 if not self.make_payment(
-                    payment_amount=order.total_amount,
+                    payment_amount=order.total_amount.to_decimal(),
                     payment_date=date.today(),
                     payment_method=payment_method,
                     card_number=card_number,
                     card_type=card_type,
                     card_expiry_date=card_expiry_date,
                     cvv=cvv,
-                    card_holder=card_holder
+                    card_holder=card_holder,
+                    order_number=order.order_number
                 ):
                     return False
             else:  # debit
                 if not self.make_payment(
-                    payment_amount=order.total_amount,
+                    payment_amount=order.total_amount.to_decimal(),
                     payment_date=date.today(),
                     payment_method=payment_method,
                     bank_name=bank_name,
-                    debit_card_num=debit_card_num
+                    debit_card_num=debit_card_num,
+                    order_number=order.order_number
                 ):
                     return False
 
-            # Save order
-            with open('data/orders.pkl', 'rb') as file:
-                orders = pickle.load(file)
-            with open('data/corporate_customers.pkl', 'rb') as file:
-                customers = pickle.load(file)
-
             # Update order status
             order.order_status = OrderStatus.PENDING
-            self.list_of_orders.append(order)
-            orders[order.order_number] = order
-            customers[self.cust_id] = self
+            customer = order.order_customer
+            customer.add_order(order)
 
-            # Save updates
-            with open('data/orders.pkl', 'wb') as file:
-                pickle.dump(orders, file)
-            with open('data/corporate_customers.pkl', 'wb') as file:
-                pickle.dump(customers, file)
+            # Save order; only the current month's partition is rewritten
+            save_order(order)
+            saved = True
+            # One journal event keeps every store derived from the orders up to date
+            record_checkout(order)
+            customer_map().commit(customer)
 
             print(f"Corporate customer order {order.order_number} created and paid successfully")
             print(f"Applied discount rate: {self.discount_rate:.0%}")
@@ -901,33 +1086,13 @@ class CorporateCustomer(Customer):
         except Exception as e:
             print(f"Error during corporate checkout and payment: {e}")
             return False
-        
-    def charge_to_account(self, amount: Decimal) -> bool:
-        """Charge amount to corporate customer account
-        
-        Args:
-            amount (Decimal): Amount to charge
-            
-        Returns:
-            bool: True if charge successful, False otherwise
-        """
-        try:
-            with open('data/corporate_customers.pkl', 'rb') as file:
-                customers = pickle.load(file)
-                if self.cust_id not in customers:
-                    return False
-                
-                self.cust_balance += amount
-                customers[self.cust_id] = self
-                
-                with open('data/corporate_customers.pkl', 'wb') as file:
-                    pickle.dump(customers, file)
-                
-                print(f"Successfully charged ${amount} to corporate account {self.cust_id}")
-                return True
-        except Exception as e:
-            print(f"Error charging to corporate account: {e}")
-            return False
+        finally:
+            # Card payments and failed checkouts never charge the account
+            if reservation is not None:
+                credit_ledger().release(reservation)
+            # An account charge is taken back if its order was never saved
+            if charged is not None and not saved:
+                self._refund_charge(order, charged)
 
 class OrderStatus(Enum):
     """Enum for order status"""
@@ -935,24 +1100,26 @@ class OrderStatus(Enum):
     FULFILLED = "fulfilled"
 
 class Payment:
-    payment_id = 1000
-    
-    def __init__(self, *, payment_amount: Decimal, payment_date: date):
+    def __init__(self, *, payment_amount: Decimal, payment_date: date,
+                 cust_id: str = None, order_number: str = None):
         """Initialize Payment
         
         Args:
             payment_amount (Decimal): Amount of payment
             payment_date (date): Date of payment
+            cust_id (str): Id of the paying customer
+            order_number (str): Order the payment is for
         """
-        self.payment_id = f"PAY{Payment.payment_id}"
-        Payment.payment_id += 1
+        self.payment_id = f"PAY{sequences().next_id('payment')}"
         self.payment_amount = Decimal(str(payment_amount))
         self.payment_date = payment_date
+        self.cust_id = cust_id
+        self.order_number = order_number
 
 class CreditCardPayment(Payment):
     def __init__(self, *, payment_amount: Decimal, payment_date: date,
                  card_number: str, card_type: str, card_expiry_date: date,
-                 cvv: str, card_holder: str):
+                 cvv: str, card_holder: str, cust_id: str = None, order_number: str = None):
         """Initialize CreditCardPayment
         
         Args:
@@ -963,8 +1130,11 @@ class CreditCardPayment(Payment):
             card_expiry_date (date): Card expiry date
             cvv (str): Card verification value
             card_holder (str): Name of the card holder
+            cust_id (str): Id of the paying customer
+            order_number (str): Order the payment is for
         """
-        super().__init__(payment_amount=payment_amount, payment_date=payment_date)
+        super().__init__(payment_amount=payment_amount, payment_date=payment_date,
+                         cust_id=cust_id, order_number=order_number)
         self.card_number = card_number
         self.card_type = card_type
         self.card_expiry_date = card_expiry_date
@@ -973,7 +1143,7 @@ class CreditCardPayment(Payment):
 
 class DebitCardPayment(Payment):
     def __init__(self, *, payment_amount: Decimal, payment_date: date,
-                 bank_name: str, debit_card_num: str):
+                 bank_name: str, debit_card_num: str, cust_id: str = None, order_number: str = None):
         """Initialize DebitCardPayment
         
         Args:
@@ -981,14 +1151,15 @@ class DebitCardPayment(Payment):
             payment_date (date): Date of payment
             bank_name (str): Name of the bank
             debit_card_num (str): Debit card number
+            cust_id (str): Id of the paying customer
+            order_number (str): Order the payment is for
         """
-        super().__init__(payment_amount=payment_amount, payment_date=payment_date)
+        super().__init__(payment_amount=payment_amount, payment_date=payment_date,
+                         cust_id=cust_id, order_number=order_number)
         self.bank_name = bank_name
         self.debit_card_num = debit_card_num
 
 class Order:
-    order_id = 1000
-    
     def __init__(self, order_customer: 'Customer', order_date: date, delivery_method: DeliveryMethod):
         """Initialize an order
         
@@ -997,18 +1168,65 @@ class Order:
             order_date (date): Date of order
             delivery_method (DeliveryMethod): Method of delivery
         """
-        self.order_number = f"ORD{Order.order_id}"
-        Order.order_id += 1
-        self.order_customer = order_customer
+        self.order_number = f"ORD{sequences().next_id('order')}"
+        self.order_customer = order_customer  # Persisted as cust_id only
         self.order_date = order_date
         self.order_status = OrderStatus.PENDING
         self.list_of_items: List[Item] = []
         self.delivery_method = delivery_method
-        self.delivery_fee = DELIVERY_FEE if delivery_method == DeliveryMethod.DELIVERY else Decimal('0.00')
-        self.subtotal = Decimal('0.00')  # Total before discount
-        self.discount = Decimal('0.00')  # Corporate customer discount amount
-        self.sales_amount = Decimal('0.00')  # After discount
-        self.total_amount = Decimal('0.00')  # Final total including delivery
+        self.delivery_fee = DELIVERY_FEE if delivery_method == DeliveryMethod.DELIVERY else ZERO
+        self.subtotal = ZERO  # Total before discount
+        self.discount = ZERO  # Corporate customer discount amount
+        self.sales_amount = ZERO  # After discount
+        self.total_amount = ZERO  # Final total including delivery
+
+    # Amounts are Money in memory and persisted as Decimal
+    _money_fields = ('delivery_fee', 'subtotal', 'discount', 'sales_amount', 'total_amount')
+
+    @property
+    def cust_id(self) -> str:
+        """Id of the customer placing the order; this is all that is persisted"""
+        if self._cust_id is None and self._legacy_customer is not None:
+            # Legacy pickles embed the customer; its state is only complete after loading
+            self._cust_id = self._legacy_customer.cust_id
+            self._legacy_customer = None
+        return self._cust_id
+
+    @property
+    def order_customer(self) -> 'Customer':
+        """Customer placing the order, resolved from cust_id through the identity map"""
+        if self._customer is None:
+            self._customer = customer_map().get(self.cust_id)
+        return self._customer
+
+    @order_customer.setter
+    def order_customer(self, customer: 'Customer'):
+        self._cust_id = customer.cust_id
+        self._customer = customer
+        self._legacy_customer = None
+
+    @property
+    def customer_name(self) -> str:
+        """Customer's full name, or the cust_id if the customer is no longer known"""
+        customer = self.order_customer
+        if customer is None:
+            return self.cust_id
+        return f"{customer.first_name} {customer.last_name}"
+
+    def __getstate__(self):
+        """Persist Money amounts as Decimal and the customer as a cust_id reference"""
+        state = money_fields_to_decimal(self.__dict__, self._money_fields)
+        state['cust_id'] = self.cust_id
+        for transient in ('_cust_id', '_customer', '_legacy_customer'):
+            state.pop(transient, None)
+        return state
+
+    def __setstate__(self, state):
+        """Restore Money amounts and normalize legacy embedded customers to cust_id"""
+        state['_cust_id'] = state.pop('cust_id', None)
+        state['_legacy_customer'] = state.pop('order_customer', None)
+        state['_customer'] = None
+        self.__dict__.update(money_fields_from_decimal(state, self._money_fields))
 
     def __str__(self) -> str:
         """String representation of the order"""
@@ -1049,14 +1267,14 @@ class Order:
 
     def calculate_subtotal(self):
         """Calculate subtotal from all items"""
-        self.subtotal = sum(item.total_price for item in self.list_of_items)
+        self.subtotal = Money.sum(item.total_price for item in self.list_of_items)
 
     def calculate_discount(self):
         """Calculate discount if customer is corporate"""
         if isinstance(self.order_customer, CorporateCustomer):
-            self.discount = self.subtotal * self.order_customer.discount_rate
+            self.discount = self.subtotal.times(self.order_customer.discount_rate)
         else:
-            self.discount = Decimal('0.00')
+            self.discount = ZERO
 
     def calculate_sales_amount(self):
         """Calculate sales amount (subtotal - discount)"""
@@ -1081,7 +1299,18 @@ class Item(ABC):
             name (str): Name of the item
         """
         self.item_name = name
-        self.total_price = Decimal('0.00')
+        self.total_price = ZERO
+
+    # Amounts are Money in memory and persisted as Decimal
+    _money_fields: Tuple[str, ...] = ('total_price',)
+
+    def __getstate__(self):
+        """Persist Money amounts as Decimal"""
+        return money_fields_to_decimal(self.__dict__, self._money_fields)
+
+    def __setstate__(self, state):
+        """Restore Money amounts from persisted Decimal values"""
+        self.__dict__.update(money_fields_from_decimal(state, self._money_fields))
 
     @abstractmethod
     def calculate_total(self):
@@ -1102,6 +1331,8 @@ class Veggie(Item):
         return f"Name: {self.item_name}\n"
 
 class WeightedVeggie(Veggie):
+    _money_fields = ('total_price', 'price_per_kilo')
+
     def __init__(self, veg_name: str, weight: Decimal, weight_per_kilo: Decimal):
         """Initialize a weighted vegetable item
         
@@ -1111,18 +1342,36 @@ class WeightedVeggie(Veggie):
             weight_per_kilo (Decimal): Price per kilogram
         """
         super().__init__(veg_name)
-        self.weight = Decimal(str(weight))
-        self.price_per_kilo = Decimal(str(weight_per_kilo))
+        self.weight_mg = to_milligrams(weight)
+        self.price_per_kilo = Money.from_decimal(weight_per_kilo)
+
+    @property
+    def weight(self) -> Decimal:
+        """Weight in kilograms"""
+        return milligrams_to_kg(self.weight_mg)
+
+    def __setstate__(self, state):
+        """Restore state, converting the legacy Decimal weight to milligrams"""
+        if 'weight' in state:
+            state['weight_mg'] = to_milligrams(state.pop('weight'))
+        super().__setstate__(state)
+
+    @property
+    def unit_price(self) -> Money:
+        """Price per kg the item was charged at"""
+        return self.price_per_kilo
 
     def calculate_total(self):
         """Calculate total price based on weight"""
-        self.total_price = self.weight * self.price_per_kilo
+        self.total_price = self.price_per_kilo.per_kg(self.weight_mg)
 
     def __str__(self):
         """String representation of weighted vegetable item"""
         return super().__str__() + f"Weight: {self.weight} kg\nPrice per kilo: ${self.price_per_kilo}"
     
 class PackVeggie(Veggie):
+    _money_fields = ('total_price', 'price_per_pack')
+
     def __init__(self, veg_name: str, num_of_pack: int, price_per_pack: Decimal):
         """Initialize a pack vegetable item
         
@@ -1133,7 +1382,12 @@ class PackVeggie(Veggie):
         """
         super().__init__(veg_name)
         self.num_of_pack = num_of_pack
-        self.price_per_pack = Decimal(str(price_per_pack))
+        self.price_per_pack = Money.from_decimal(price_per_pack)
+
+    @property
+    def unit_price(self) -> Money:
+        """Price per pack the item was charged at"""
+        return self.price_per_pack
 
     def calculate_total(self):
         """Calculate total price based on number of packs"""
@@ -1144,6 +1398,8 @@ class PackVeggie(Veggie):
         return super().__str__() + f"Number of packs: {self.num_of_pack}\nPrice per pack: ${self.price_per_pack}"
 
 class UnitPriceVeggie(Veggie):
+    _money_fields = ('total_price', 'price_per_unit')
+
     def __init__(self, veg_name: str, quantity: int, price_per_unit: Decimal):
         """Initialize a unit-priced vegetable item
         
@@ -1154,8 +1410,13 @@ class UnitPriceVeggie(Veggie):
         """
         super().__init__(veg_name)
         self.quantity = quantity
-        self.price_per_unit = Decimal(str(price_per_unit))
+        self.price_per_unit = Money.from_decimal(price_per_unit)
     
+    @property
+    def unit_price(self) -> Money:
+        """Price per unit the item was charged at"""
+        return self.price_per_unit
+
     def calculate_total(self):
         """Calculate total price based on quantity"""
         self.total_price = self.quantity * self.price_per_unit
@@ -1165,6 +1426,8 @@ class UnitPriceVeggie(Veggie):
         return super().__str__() + f"Quantity: {self.quantity}\nPrice per unit: ${self.price_per_unit}"
 
 class PremadeBox(Item):
+    _money_fields = ('total_price', 'price')
+
     def __init__(self, box_size: str, quantity: int, price: Decimal):
         """Initialize a premade box item
         
@@ -1176,7 +1439,7 @@ class PremadeBox(Item):
         super().__init__(box_size)
         self.box_content: List['Item'] = []
         self.quantity = quantity
-        self.price = price
+        self.price = Money.from_decimal(price)
 
     def set_content(self, content: List['Item']):
         """Set the contents of the box
@@ -1186,6 +1449,11 @@ class PremadeBox(Item):
         """
         self.box_content = content
 
+    @property
+    def unit_price(self) -> Money:
+        """Price per box the item was charged at"""
+        return self.price
+
     def calculate_total(self):
         """Calculate total price based on quantity"""
         self.total_price = self.quantity * self.price
@@ -1195,4 +1463,104 @@ class PremadeBox(Item):
         return (f"Box Size: {self.item_name}\n"
                 f"Quantity: {self.quantity}\n"
                 f"Price: ${self.price}\n"
-                f"Contents: {', '.join([item.item_name for item in self.box_content])}")
\ No newline at end of file
+                f"Contents: {', '.join([item.item_name for item in self.box_content])}")
+
+class BoxTemplate(NamedTuple):
+    """Immutable premade box template, one per [section] in premadeboxes.txt"""
+    size: str
+    price: Money
+    contents: Tuple[str, ...]
+
+    @property
+    def display_name(self) -> str:
+        """Name shown in the cart and stored on orders, e.g. 'Small Box'"""
+        return f"{self.size.capitalize()} Box"
+
+    @property
+    def num_items(self) -> int:
+        """Number of item slots in the box"""
+        return len(self.contents)
+
+class CartLine(NamedTuple):
+    """A typed shopping cart line as chosen on the Product screen"""
+    line_id: int
+    item_type: str  # 'weight', 'unit', 'pack' or 'box'
+    name: str
+    quantity: Decimal
+    price: Money
+    subtotal: Money
+    contents: Tuple[str, ...] = ()
+
+    @property
+    def contents_display(self) -> str:
+        """Box contents formatted for display, e.g. 'Carrot by weight/kg x 1, ...'"""
+        return ", ".join(f"{name} x 1" for name in self.contents)
+
+class Cart:
+    def __init__(self, discount_rate: Decimal = Decimal('0.00')):
+        """Initialize an empty cart with running totals
+        
+        Args:
+            discount_rate (Decimal): Discount rate applied to the subtotal (corporate customers)
+        """
+        self.discount_rate = discount_rate
+        self.lines: Dict[int, CartLine] = {}
+        self.is_delivery = False
+        self.subtotal = ZERO
+        self.discount = ZERO
+        self.delivery_fee = ZERO
+        self.total = ZERO
+        self._next_line_id = 1
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines.values())
+
+    def add(self, item_type: str, name: str, quantity: Decimal, price: Decimal,
+            contents: Tuple[str, ...] = ()) -> CartLine:
+        """Add a line to the cart and update the running totals
+        
+        Args:
+            item_type (str): 'weight', 'unit', 'pack' or 'box'
+            name (str): Product name (veggie name or box display name)
+            quantity (Decimal): Quantity in kg, units, packs or boxes
+            price (Money | Decimal): Price per kg/unit/pack/box
+            contents (Tuple[str, ...]): Veggie names inside a box
+            
+        Returns:
+            CartLine: The newly added line
+        """
+        price = Money.from_decimal(price)
+        line = CartLine(self._next_line_id, item_type, name, Decimal(quantity), price,
+                        price.times(quantity), tuple(contents))
+        self._next_line_id += 1
+        self.lines[line.line_id] = line
+        self.subtotal += line.subtotal
+        self._update_totals()
+        return line
+
+    def remove(self, line_id: int) -> None:
+        """Remove a line from the cart and update the running totals"""
+        line = self.lines.pop(line_id, None)
+        if line is not None:
+            self.subtotal -= line.subtotal
+            self._update_totals()
+
+    def clear(self) -> None:
+        """Remove all lines from the cart"""
+        self.lines.clear()
+        self.subtotal = ZERO
+        self._update_totals()
+
+    def set_delivery(self, is_delivery: bool) -> None:
+        """Select delivery or pickup and update the total"""
+        self.is_delivery = is_delivery
+        self._update_totals()
+
+    def _update_totals(self) -> None:
+        """Recalculate discount, delivery fee and total from the running subtotal"""
+        self.discount = self.subtotal.times(self.discount_rate)
+        self.delivery_fee = DELIVERY_FEE if self.is_delivery and self.lines else ZERO
+        self.total = self.subtotal - self.discount + self.delivery_fee
@@ -0,0 +1,150 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import total_ordering
+from typing import Iterable
+
+CENTS_PER_DOLLAR = 100
+MILLIGRAMS_PER_KG = 1_000_000
+
+@total_ordering
+class Money:
+    """Fixed-point money amount stored as integer cents
+
+    Arithmetic and aggregation stay in integers; amounts are converted to
+    Decimal only for display and persistence via to_decimal().
+    """
+    __slots__ = ('_cents',)
+
+    def __init__(self, cents: int = 0):
+        """Initialize an amount from integer cents
+
+        Args:
+            cents (int): Amount in cents
+        """
+        self._cents = int(cents)
+
+    @classmethod
+    def from_decimal(cls, amount) -> 'Money':
+        """Create an amount from a Decimal, str, int or float dollar value, rounding half-up"""
+        if isinstance(amount, Money):
+            return amount
+        cents = (Decimal(str(amount)) * CENTS_PER_DOLLAR).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        return cls(int(cents))
+
+    @staticmethod
+    def sum(amounts: Iterable['Money']) -> 'Money':
+        """Sum amounts using plain integer addition"""
+        return Money(sum(amount._cents for amount in amounts))
+
+    @property
+    def cents(self) -> int:
+        """Amount in integer cents"""
+        return self._cents
+
+    def to_decimal(self) -> Decimal:
+        """Convert to a two-place Decimal for display or persistence"""
+        return Decimal(self._cents).scaleb(-2)
+
+    def times(self, quantity) -> 'Money':
+        """Multiply by an int or Decimal quantity, rounding half-up to whole cents"""
+        if isinstance(quantity, int):
+            return Money(self._cents * quantity)
+        cents = (self._cents * Decimal(str(quantity))).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        return Money(int(cents))
+
+    def scale(self, numerator: int, denominator: int) -> 'Money':
+        """Multiply by numerator/denominator in integers, rounding half away from zero"""
+        product = self._cents * numerator
+        half = denominator // 2
+        if product >= 0:
+            return Money((product + half) // denominator)
+        return Money(-((-product + half) // denominator))
+
+    def per_kg(self, weight_mg: int) -> 'Money':
+        """Price of weight_mg milligrams when this amount is a price per kilogram"""
+        return self.scale(weight_mg, MILLIGRAMS_PER_KG)
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self._cents + other._cents)
+        return NotImplemented
+
+    def __radd__(self, other):
+        # Allows the built-in sum() which starts from 0
+        if other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self._cents - other._cents)
+        return NotImplemented
+
+    def __mul__(self, other):
+        if isinstance(other, int):
+            return Money(self._cents * other)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self._cents)
+
+    def __abs__(self):
+        return Money(abs(self._cents))
+
+    def __bool__(self):
+        return self._cents != 0
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self._cents == other._cents
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self._cents < other._cents
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._cents)
+
+    def __reduce__(self):
+        return (Money, (self._cents,))
+
+    def __str__(self):
+        return str(self.to_decimal())
+
+    def __repr__(self):
+        return f"Money('{self.to_decimal()}')"
+
+    def __format__(self, format_spec):
+        return format(self.to_decimal(), format_spec)
+
+ZERO = Money(0)
+
+def to_milligrams(weight_kg) -> int:
+    """Convert a weight in kilograms (Decimal, str or number) to integer milligrams"""
+    mg = (Decimal(str(weight_kg)) * MILLIGRAMS_PER_KG).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+    return int(mg)
+
+def milligrams_to_kg(weight_mg: int) -> Decimal:
+    """Convert integer milligrams to a Decimal weight in kilograms without trailing zeros"""
+    kg = Decimal(weight_mg).scaleb(-6)
+    if kg == kg.to_integral_value():
+        return kg.quantize(Decimal('1'))
+    return kg.normalize()
+
+def money_fields_to_decimal(state: dict, fields: Iterable[str]) -> dict:
+    """Return a copy of an object's state with Money fields converted to Decimal for persistence"""
+    state = state.copy()
+    for field in fields:
+        if isinstance(state.get(field), Money):
+            state[field] = state[field].to_decimal()
+    return state
+
+def money_fields_from_decimal(state: dict, fields: Iterable[str]) -> dict:
+    """Convert persisted Decimal fields of an object's state back to Money in place"""
+    for field in fields:
+        if field in state and not isinstance(state[field], Money):
+            state[field] = Money.from_decimal(state[field])
+    return state
@@ -0,0 +1,120 @@
+import os
+import pickle
+import zlib
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Set
+from storage import file_lock, load_store, save_store
+from order_store import (month_key, months_overlapping, load_hot_orders,
+                         load_partitions, partition_months, remove_orders)
+
+ARCHIVE_DIR = 'data/archive'
+ARCHIVE_AFTER_DAYS = 90  # Fulfilled orders older than this move to the archive
+
+def archive_path(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"orders-{month}.pkl.z")
+
+def archived_months() -> List[str]:
+    """Return every month that has an archive partition, oldest first"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    return sorted(name[len('orders-'):-len('.pkl.z')] for name in os.listdir(ARCHIVE_DIR)
+                  if name.startswith('orders-') and name.endswith('.pkl.z'))
+
+def load_archive_month(month: str) -> Dict[str, 'Order']:
+    """Load the archived orders of one month, keyed by order number"""
+    compressed = load_store(archive_path(month), bytes)
+    return pickle.loads(zlib.decompress(compressed)) if compressed else {}
+
+def _add_to_archive_month(month: str, orders: Dict[str, 'Order']):
+    """Merge orders into a month's archive partition; re-adding an order is harmless"""
+    path = archive_path(month)
+    with file_lock(path):
+        archived = load_archive_month(month)
+        archived.update(orders)
+        save_store(path, zlib.compress(pickle.dumps(archived)))
+
+def load_archived_orders(start_date: date = None, end_date: date = None) -> Dict[str, 'Order']:
+    """Load archived orders, opening only the months that overlap the given range
+
+    Args:
+        start_date (date): First day of interest, or None for no lower bound
+        end_date (date): Last day of interest, or None for no upper bound
+
+    Returns:
+        Dict[str, Order]: Archived orders from the overlapping months, keyed by order number
+    """
+    first = month_key(start_date) if start_date else None
+    last = month_key(end_date) if end_date else None
+    orders = {}
+    for month in archived_months():
+        if (first is None or month >= first) and (last is None or month <= last):
+            orders.update(load_archive_month(month))
+    return orders
+
+def load_orders(start_date: date = None, end_date: date = None) -> Dict[str, 'Order']:
+    """Load hot and archived orders from the months overlapping the given range
+
+    The caller still filters by date, since whole months are loaded.
+
+    Args:
+        start_date (date): First day of interest, or None for no lower bound
+        end_date (date): Last day of interest, or None for no upper bound
+
+    Returns:
+        Dict[str, Order]: Orders keyed by order number
+    """
+    orders = load_archived_orders(start_date, end_date)
+    orders.update(load_hot_orders(start_date, end_date))  # The hot copy wins if an order is in both
+    return orders
+
+def load_orders_by_ref(refs: Iterable['OrderRef']) -> Dict[str, 'Order']:
+    """Load the referenced orders, opening only the hot and archived months they live in
+
+    Args:
+        refs (Iterable[OrderRef]): References to the orders wanted
+
+    Returns:
+        Dict[str, Order]: The referenced orders that still exist, keyed by order number
+    """
+    wanted: Dict[str, Set[str]] = {}
+    for ref in refs:
+        wanted.setdefault(ref.month, set()).add(ref.order_number)
+    hot, archived = set(partition_months()), set(archived_months())
+    orders = {}
+    for month, order_numbers in wanted.items():
+        month_orders = load_archive_month(month) if month in archived else {}
+        if month in hot:
+            month_orders.update(load_partitions([month]))  # The hot copy wins
+        orders.update((order_number, month_orders[order_number])
+                      for order_number in order_numbers if order_number in month_orders)
+    return orders
+
+def archive_fulfilled_orders(max_age_days: int = ARCHIVE_AFTER_DAYS, today: date = None) -> int:
+    """Move fulfilled orders older than max_age_days from the hot partitions to the archive
+
+    Only hot partitions that start before the cutoff are opened. Orders are written
+    to the archive before they are removed from the hot partitions, so a crash in
+    between leaves a duplicate rather than a lost order.
+
+    Args:
+        max_age_days (int): Minimum age of an order, by order date, to archive it
+        today (date): Reference date, today by default
+
+    Returns:
+        int: Number of orders archived
+    """
+    from model import OrderStatus
+    cutoff = (today or date.today()) - timedelta(days=max_age_days)
+    hot = load_partitions(months_overlapping(end_date=cutoff - timedelta(days=1)))
+    by_month: Dict[str, Dict[str, 'Order']] = {}
+    for order_number, order in hot.items():
+        if order.order_status == OrderStatus.FULFILLED and order.order_date < cutoff:
+            by_month.setdefault(month_key(order.order_date), {})[order_number] = order
+    if not by_month:
+        return 0
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    for month, orders in by_month.items():
+        _add_to_archive_month(month, orders)
+        remove_orders(month, orders)
+    return sum(len(orders) for orders in by_month.values())
@@ -0,0 +1,116 @@
+# Append-only journal of order events, the one write a checkout or fulfillment makes
+# for every store derived from the orders.
+import logging
+import os
+import pickle
+from typing import Iterator, NamedTuple, Tuple
+from storage import file_lock
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_FILE = 'data/order_events.journal'
+
+CHECKOUT, FULFILL = 'checkout', 'fulfill'
+
+# Product kinds of an event line
+KIND_WEIGHT, KIND_PACK, KIND_UNIT, KIND_BOX = range(4)
+NO_PARENT = -1
+
+class EventLine(NamedTuple):
+    """One product of an order, box contents included"""
+    name: str
+    kind: int    # KIND_*
+    qty: int     # Thousandths: grams weighed, 1000 per unit/pack/box; box contents once per box ordered
+    cents: int   # Line total in cents (0 for box contents, which the box price covers)
+    parent: int  # Index of the box line a content line belongs to, NO_PARENT for top-level lines
+
+class OrderEvent(NamedTuple):
+    """A placed or fulfilled order, as much of it as the derived stores need"""
+    kind: str                # CHECKOUT or FULFILL
+    order_number: str
+    cust_id: str
+    day: int                 # order_date as a date ordinal
+    sales_cents: int         # After discount, before delivery
+    total_cents: int         # Including delivery
+    lines: Tuple[EventLine, ...] = ()  # Empty for FULFILL
+
+def item_kind_and_qty(item) -> tuple:
+    """Return (KIND_*, quantity in thousandths) of an order item"""
+    from model import WeightedVeggie, PackVeggie, UnitPriceVeggie
+    if isinstance(item, WeightedVeggie):
+        return KIND_WEIGHT, item.weight_mg // 1000
+    if isinstance(item, PackVeggie):
+        return KIND_PACK, item.num_of_pack * 1000
+    if isinstance(item, UnitPriceVeggie):
+        return KIND_UNIT, item.quantity * 1000
+    return KIND_BOX, item.quantity * 1000
+
+def checkout_event(order: 'Order') -> OrderEvent:
+    """Describe a newly placed order"""
+    lines = []
+    for item in order.list_of_items:
+        parent = len(lines)
+        kind, qty = item_kind_and_qty(item)
+        lines.append(EventLine(item.item_name, kind, qty, item.total_price.cents, NO_PARENT))
+        # Every box holds the full contents, so contents count once per box ordered
+        for content in getattr(item, 'box_content', ()):
+            content_kind, content_qty = item_kind_and_qty(content)
+            lines.append(EventLine(content.item_name, content_kind, content_qty * item.quantity, 0, parent))
+    return OrderEvent(CHECKOUT, order.order_number, order.cust_id, order.order_date.toordinal(),
+                      order.sales_amount.cents, order.total_amount.cents, tuple(lines))
+
+def fulfill_event(order: 'Order') -> OrderEvent:
+    """Describe an order that was just fulfilled"""
+    return OrderEvent(FULFILL, order.order_number, order.cust_id, order.order_date.toordinal(),
+                      order.sales_amount.cents, order.total_amount.cents)
+
+def append_event(event: OrderEvent, journal_file: str = ORDER_EVENTS_FILE) -> None:
+    """Append one event to the journal under its file lock"""
+    with file_lock(journal_file), open(journal_file, 'ab') as file:
+        pickle.dump(tuple(event), file)
+        file.flush()
+        os.fsync(file.fileno())
+
+def _record(event: OrderEvent):
+    try:
+        append_event(event)
+    except Exception:
+        logger.exception("Could not journal order %s for the derived stores "
+                         "(run rebuild_stores.py to rebuild them)", event.order_number)
+
+def record_checkout(order: 'Order') -> None:
+    """Journal a newly placed order; a failure here must not fail the checkout"""
+    _record(checkout_event(order))
+
+def record_fulfillment(order: 'Order') -> None:
+    """Journal a fulfilled order; a failure here must not fail the fulfillment"""
+    _record(fulfill_event(order))
+
+def journal_size(journal_file: str = ORDER_EVENTS_FILE) -> int:
+    """Return the size of the journal in bytes, 0 if nothing was journalled yet"""
+    try:
+        return os.path.getsize(journal_file)
+    except FileNotFoundError:
+        return 0
+
+def read_events(offset: int = 0, journal_file: str = ORDER_EVENTS_FILE) -> Iterator[Tuple[OrderEvent, int]]:
+    """Read the events journalled from offset onwards
+
+    Args:
+        offset (int): End of the last event already read
+        journal_file (str): Journal to read
+
+    Yields:
+        Tuple[OrderEvent, int]: Each event and the offset just past it
+    """
+    if journal_size(journal_file) <= offset:
+        return
+    with open(journal_file, 'rb') as file:
+        file.seek(offset)
+        while True:
+            try:
+                kind, order_number, cust_id, day, sales_cents, total_cents, lines = pickle.load(file)
+            except Exception:
+                return  # End of journal, or an event still being written
+            yield (OrderEvent(kind, order_number, cust_id, day, sales_cents, total_cents,
+                              tuple(EventLine(*line) for line in lines)), file.tell())
@@ -0,0 +1,211 @@
+# Columnar store of order lines, derived from the order-event journal.
+# Rebuild from the project directory: python order_lines.py
+import mmap
+import os
+from array import array
+from typing import Dict, Iterable, List, Sequence
+from order_events import (CHECKOUT, NO_PARENT, ORDER_EVENTS_FILE, OrderEvent, checkout_event,
+                          journal_size, read_events)
+from report_cache import bump_data_version
+from storage import file_lock, load_store, save_store
+
+ORDER_LINES_DIR = 'data/order_lines'
+META_FILE = os.path.join(ORDER_LINES_DIR, 'meta.pkl')
+
+# One int64 per row in every column:
+#   day     order_date as a date ordinal
+#   order   numeric part of the order number
+#   cust    customer id, as an index into meta['customers']
+#   sku     product, as an index into meta['skus']
+#   qty     quantity in thousandths: grams for weighed veggies, 1000 per unit/pack/box;
+#           box contents count once per box ordered
+#   cents   line total in cents (0 for box contents, which the box price covers)
+#   parent  row of the box a content line belongs to, NO_PARENT for top-level lines
+COLUMNS = ('day', 'order', 'cust', 'sku', 'qty', 'cents', 'parent')
+TYPECODE = 'q'
+# SKU kinds, kept per SKU in meta['kinds'], are the KIND_* of order_events
+
+def column_path(name: str) -> str:
+    return os.path.join(ORDER_LINES_DIR, f"{name}.col")
+
+def _new_meta() -> dict:
+    # 'journal_offset': end of the last order event folded into the columns
+    return {'rows': 0, 'skus': [], 'kinds': [], 'customers': [], 'journal_offset': 0}
+
+class OrderLines:
+    def __init__(self, columns: Dict[str, Sequence[int]], meta: dict, maps: List[mmap.mmap] = ()):
+        """Initialize a read-only view of the order-line columns
+
+        Args:
+            columns (Dict[str, Sequence[int]]): Column name -> int64 buffer of equal length
+            meta (dict): Row count and the sku/customer dictionaries
+            maps (List[mmap.mmap]): Memory maps backing the columns, closed by close()
+        """
+        self.columns = columns
+        self.rows: int = meta['rows']
+        self.skus: List[str] = meta['skus']
+        self.kinds: List[int] = meta['kinds']
+        self.customers: List[str] = meta['customers']
+        self._maps = list(maps)
+
+    def __getitem__(self, name: str) -> Sequence[int]:
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self):
+        """Release memory-mapped columns"""
+        for column in self.columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_order_lines(use_mmap: bool = True) -> OrderLines:
+    """Open the order-line columns for reading
+
+    Orders journalled since the columns were last opened are folded in first.
+
+    Args:
+        use_mmap (bool): Map the column files instead of reading them into arrays
+
+    Returns:
+        OrderLines: Columns holding every committed row
+    """
+    meta = load_store(META_FILE, _new_meta)
+    if journal_size() > meta.get('journal_offset', 0):
+        meta = fold_journal()
+    rows = meta['rows']
+    columns: Dict[str, Sequence[int]] = {}
+    maps = []
+    for name in COLUMNS:
+        if rows == 0:
+            columns[name] = array(TYPECODE)
+            continue
+        with open(column_path(name), 'rb') as file:
+            if use_mmap:
+                mapped = mmap.mmap(file.fileno(), rows * array(TYPECODE).itemsize,
+                                   access=mmap.ACCESS_READ)
+                maps.append(mapped)
+                columns[name] = memoryview(mapped).cast(TYPECODE)
+            else:
+                column = array(TYPECODE)
+                column.fromfile(file, rows)
+                columns[name] = column
+    return OrderLines(columns, meta, maps)
+
+def _append_events(meta: dict, events: Iterable[OrderEvent]) -> int:
+    """Append the lines of checkout events to the columns and move meta past them
+
+    Columns are written past the committed row count before the metadata moves it,
+    so a crash in between leaves bytes that the next append overwrites. The caller
+    holds the metadata lock and saves meta.
+
+    Returns:
+        int: Number of rows appended
+    """
+    sku_ids = {sku: i for i, sku in enumerate(meta['skus'])}
+    cust_ids = {cust_id: i for i, cust_id in enumerate(meta['customers'])}
+    new = {name: array(TYPECODE) for name in COLUMNS}
+    row = meta['rows']
+
+    for event in events:
+        if event.kind != CHECKOUT:
+            continue
+        digits = event.order_number[3:]
+        order_no = int(digits) if digits.isdigit() else -1
+        cust = cust_ids.get(event.cust_id)
+        if cust is None:
+            cust = cust_ids[event.cust_id] = len(meta['customers'])
+            meta['customers'].append(event.cust_id)
+        first_row = row
+        for line in event.lines:
+            sku = sku_ids.get(line.name)
+            if sku is None:
+                sku = sku_ids[line.name] = len(meta['skus'])
+                meta['skus'].append(line.name)
+                meta['kinds'].append(line.kind)
+            parent = NO_PARENT if line.parent == NO_PARENT else first_row + line.parent
+            for name, value in (('day', event.day), ('order', order_no), ('cust', cust), ('sku', sku),
+                                ('qty', line.qty), ('cents', line.cents), ('parent', parent)):
+                new[name].append(value)
+            row += 1
+
+    appended = row - meta['rows']
+    if appended:
+        offset = meta['rows'] * array(TYPECODE).itemsize
+        for name in COLUMNS:
+            path = column_path(name)
+            with open(path, 'r+b' if os.path.exists(path) else 'w+b') as file:
+                file.seek(offset)
+                new[name].tofile(file)
+                file.truncate()
+                file.flush()
+                os.fsync(file.fileno())
+        meta['rows'] = row
+    return appended
+
+def fold_journal() -> dict:
+    """Append the orders journalled since the last fold to the store
+
+    Returns:
+        dict: The store's metadata after the fold
+    """
+    os.makedirs(ORDER_LINES_DIR, exist_ok=True)
+    with file_lock(META_FILE):
+        meta = load_store(META_FILE, _new_meta)
+        start = meta.get('journal_offset', 0)
+        end = start
+
+        def journalled():
+            nonlocal end
+            for event, end in read_events(start):
+                yield event
+
+        _append_events(meta, journalled())
+        if end != start:
+            meta['journal_offset'] = end
+            save_store(META_FILE, meta)
+    return meta
+
+def ensure_order_lines() -> None:
+    """Build the store from the existing orders if it has never been built"""
+    if not os.path.exists(META_FILE):
+        rebuild_order_lines()
+
+def rebuild_order_lines() -> int:
+    """Rebuild the store from every hot and archived order
+
+    The journal is locked meanwhile, so the store resumes folding it exactly where
+    the orders read here leave off.
+
+    Returns:
+        int: Number of rows written
+    """
+    from order_archive import load_orders
+    os.makedirs(ORDER_LINES_DIR, exist_ok=True)
+    with file_lock(ORDER_EVENTS_FILE), file_lock(META_FILE):
+        for name in COLUMNS:
+            if os.path.exists(column_path(name)):
+                os.remove(column_path(name))
+        meta = _new_meta()
+        meta['journal_offset'] = journal_size()
+        orders = load_orders()
+        # Numeric order so ORD999 comes before ORD1000
+        rows = _append_events(meta, (checkout_event(orders[number])
+                                     for number in sorted(orders, key=lambda n: (len(n), n))))
+        save_store(META_FILE, meta)
+    bump_data_version()
+    return rows
+
+if __name__ == "__main__":
+    import model  # noqa: F401  (pickled classes live in the model module)
+    print(f"{rebuild_order_lines()} order lines written to {ORDER_LINES_DIR}")
@@ -0,0 +1,257 @@
+import logging
+import os
+from contextlib import ExitStack
+from datetime import date
+from typing import Callable, Dict, Iterable, List, NamedTuple
+from report_cache import bump_data_version
+from storage import (PREVIOUS_GENERATION, file_lock, footer_version, load_store, save_store,
+                     update_store)
+
+logger = logging.getLogger(__name__)
+
+ORDERS_DIR = 'data/orders'
+MANIFEST_FILE = os.path.join(ORDERS_DIR, 'manifest.pkl')
+LEGACY_ORDERS_FILE = 'data/orders.pkl'
+
+class PartitionInfo(NamedTuple):
+    """Manifest entry for one month partition"""
+    first_day: int  # Earliest order_date in the partition, as a date ordinal
+    last_day: int   # Latest order_date in the partition, as a date ordinal
+    rows: int       # Number of orders in the partition
+    version: int = 0  # Store version of the partition this entry describes
+
+class OrderRef(NamedTuple):
+    """Reference to an order kept in place of the order itself, e.g. on a customer"""
+    order_number: str
+    month: str  # Month partition the order lives in, hot or archived
+
+def month_key(day: date) -> str:
+    """Return the partition an order date belongs to, e.g. '2024-05'"""
+    return f"{day.year:04d}-{day.month:02d}"
+
+def order_ref(order: 'Order') -> OrderRef:
+    """Return the reference to an order"""
+    return OrderRef(order.order_number, month_key(order.order_date))
+
+def partition_path(month: str) -> str:
+    return os.path.join(ORDERS_DIR, f"orders-{month}.pkl")
+
+def _new_manifest() -> dict:
+    # partitions: month -> PartitionInfo; pending: order_number -> month of each pending order
+    return {'partitions': {}, 'pending': {}}
+
+def _is_pending(order) -> bool:
+    from model import OrderStatus
+    return order.order_status == OrderStatus.PENDING
+
+def _describe(orders: Dict[str, 'Order'], version: int = 0) -> PartitionInfo:
+    days = [order.order_date.toordinal() for order in orders.values()]
+    if not days:
+        return PartitionInfo(0, 0, 0, version)
+    return PartitionInfo(min(days), max(days), len(days), version)
+
+def _record_partition(month: str, orders: Dict[str, 'Order'], touched: Iterable[str] = None):
+    """Bring the manifest entry of a partition, and its pending orders, up to date
+
+    The caller holds the partition lock, so the partition's version is the one just written.
+    """
+    info = _describe(orders, footer_version(partition_path(month)))
+    def update(manifest):
+        if info.rows:
+            manifest['partitions'][month] = info
+        else:
+            manifest['partitions'].pop(month, None)
+        for order_number in (orders if touched is None else touched):
+            order = orders.get(order_number)
+            if order is not None and _is_pending(order):
+                manifest['pending'][order_number] = month
+            else:
+                manifest['pending'].pop(order_number, None)
+    update_store(MANIFEST_FILE, update, _new_manifest)
+
+def _delete_partition(month: str):
+    """Remove a partition file and its previous generation; the caller holds the partition lock"""
+    path = partition_path(month)
+    for generation in (path, path + PREVIOUS_GENERATION):
+        if os.path.exists(generation):
+            os.remove(generation)
+
+def _partition_legacy_store():
+    """Split the single legacy orders.pkl into month partitions, once"""
+    legacy = load_store(LEGACY_ORDERS_FILE)
+    by_month: Dict[str, Dict[str, 'Order']] = {}
+    for order_number, order in legacy.items():
+        by_month.setdefault(month_key(order.order_date), {})[order_number] = order
+    manifest = _new_manifest()
+    for month, orders in by_month.items():
+        version = save_store(partition_path(month), orders)
+        manifest['partitions'][month] = _describe(orders, version)
+        for order_number, order in orders.items():
+            if _is_pending(order):
+                manifest['pending'][order_number] = month
+    save_store(MANIFEST_FILE, manifest)
+    if os.path.exists(LEGACY_ORDERS_FILE):
+        os.replace(LEGACY_ORDERS_FILE, LEGACY_ORDERS_FILE + '.bak')
+
+def read_manifest() -> dict:
+    """Return the manifest, partitioning the legacy order store on first use"""
+    if not os.path.exists(MANIFEST_FILE):
+        os.makedirs(ORDERS_DIR, exist_ok=True)
+        if partition_months():
+            # The manifest was lost, the partitions were not. Partition locks are taken
+            # before the manifest's, as save_order does, so this runs outside the latter.
+            rebuild_manifest()
+        else:
+            with file_lock(MANIFEST_FILE):
+                if not os.path.exists(MANIFEST_FILE):
+                    _partition_legacy_store()
+    return load_store(MANIFEST_FILE, _new_manifest)
+
+def manifest_is_stale() -> bool:
+    """True if any partition changed since the manifest described it
+
+    save_order writes the partition before the manifest, so a crash in between
+    leaves a partition whose footer version is ahead of its manifest entry. Only
+    footers are read.
+    """
+    partitions = load_store(MANIFEST_FILE, _new_manifest)['partitions']
+    on_disk = set(partition_months())
+    if set(partitions) - on_disk:
+        return True
+    for month in on_disk:
+        info = partitions.get(month)
+        if info is None or info.version != footer_version(partition_path(month)):
+            return True
+    return False
+
+def ensure_manifest() -> None:
+    """Create the manifest if it is missing and rebuild it if it is stale, e.g. at startup"""
+    if os.path.exists(MANIFEST_FILE) and manifest_is_stale():
+        logger.warning("%s is out of date with the order partitions; rebuilding it", MANIFEST_FILE)
+        rebuild_manifest()
+    read_manifest()
+
+def rebuild_manifest() -> dict:
+    """Recompute the manifest from the partitions, e.g. after a crash between the two writes
+
+    Every partition lock is held while the manifest is rebuilt, so no order can be
+    saved between reading a partition and writing the manifest. Partitions left
+    empty are deleted.
+    """
+    manifest = _new_manifest()
+    with ExitStack() as locks:
+        months = partition_months()
+        for month in months:
+            locks.enter_context(file_lock(partition_path(month)))
+        for month in months:
+            orders = load_store(partition_path(month))
+            if not orders:
+                _delete_partition(month)
+                continue
+            manifest['partitions'][month] = _describe(orders, footer_version(partition_path(month)))
+            for order_number, order in orders.items():
+                if _is_pending(order):
+                    manifest['pending'][order_number] = month
+        save_store(MANIFEST_FILE, manifest)
+    bump_data_version()
+    return manifest
+
+def partition_months() -> List[str]:
+    """Return every month with a partition file, oldest first"""
+    if not os.path.isdir(ORDERS_DIR):
+        return []
+    return sorted(name[len('orders-'):-len('.pkl')] for name in os.listdir(ORDERS_DIR)
+                  if name.startswith('orders-') and name.endswith('.pkl'))
+
+def store_paths() -> List[str]:
+    """Return the manifest and every partition file, e.g. for verify_stores"""
+    return [MANIFEST_FILE] + [partition_path(month) for month in partition_months()]
+
+def months_overlapping(start_date: date = None, end_date: date = None) -> List[str]:
+    """Return the months whose date range in the manifest overlaps [start_date, end_date]"""
+    first = start_date.toordinal() if start_date else None
+    last = end_date.toordinal() if end_date else None
+    return sorted(month for month, info in read_manifest()['partitions'].items()
+                  if (first is None or info.last_day >= first)
+                  and (last is None or info.first_day <= last))
+
+def load_partitions(months: Iterable[str]) -> Dict[str, 'Order']:
+    """Load the given month partitions into one dict keyed by order number"""
+    orders = {}
+    for month in months:
+        orders.update(load_store(partition_path(month)))
+    return orders
+
+def load_hot_orders(start_date: date = None, end_date: date = None) -> Dict[str, 'Order']:
+    """Load the orders of every partition overlapping the given range
+
+    Args:
+        start_date (date): First day of interest, or None for no lower bound
+        end_date (date): Last day of interest, or None for no upper bound
+    """
+    return load_partitions(months_overlapping(start_date, end_date))
+
+def load_pending_orders() -> Dict[str, 'Order']:
+    """Load pending orders, opening only the partitions that hold one"""
+    pending = read_manifest()['pending']
+    orders = load_partitions(sorted(set(pending.values())))
+    return {order_number: orders[order_number] for order_number in pending
+            if order_number in orders}
+
+def save_order(order: 'Order') -> None:
+    """Add or replace an order in its month's partition
+
+    Only the current month's partition and the manifest are rewritten.
+
+    Args:
+        order (Order): Order to save
+    """
+    read_manifest()
+    month = month_key(order.order_date)
+    def add(orders):
+        orders[order.order_number] = order
+        return orders
+    # The partition lock is held across both writes so manifest updates land in order
+    with file_lock(partition_path(month)):
+        orders = update_store(partition_path(month), add)
+        _record_partition(month, orders, [order.order_number])
+    bump_data_version()
+
+def update_order(order_number: str, mutate: Callable[['Order'], None]) -> bool:
+    """Change a pending order in place in its partition
+
+    Args:
+        order_number (str): Order to change
+        mutate (Callable[[Order], None]): Applied to the freshly loaded order
+
+    Returns:
+        bool: False if the order is not a pending order in any partition
+    """
+    month = read_manifest()['pending'].get(order_number)
+    if month is None:
+        return False
+    def change(orders):
+        order = orders.get(order_number)
+        if order is not None:
+            mutate(order)
+        return orders
+    with file_lock(partition_path(month)):
+        orders = update_store(partition_path(month), change)
+        _record_partition(month, orders, [order_number])
+    bump_data_version()
+    return order_number in orders
+
+def remove_orders(month: str, order_numbers: Iterable[str]) -> None:
+    """Remove orders from a month's partition, e.g. once they are archived"""
+    order_numbers = list(order_numbers)
+    def remove(orders):
+        for order_number in order_numbers:
+            orders.pop(order_number, None)
+        return orders
+    with file_lock(partition_path(month)):
+        orders = update_store(partition_path(month), remove)
+        _record_partition(month, orders, order_numbers)
+        if not orders:
+            # The manifest no longer lists the month, so nothing will read the empty file
+            _delete_partition(month)
+    bump_data_version()
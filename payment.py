@@ -261,7 +261,7 @@ class Payment:
                 card_expiry_date = date(int(year), int(month), 1)
                 
                 # 调用check_out_with_payment方法时传入所有必要参数
-                success = self.controller.temp_order_data['user'].check_out_with_payment(
+                success = self.controller.check_out_with_payment(
                     order_data=self.controller.temp_order_data,
                     payment_method="credit",
                     card_number=card_number,
@@ -306,7 +306,7 @@ class Payment:
             
             if hasattr(self.controller, 'temp_order_data'):
                 # 调用check_out_with_payment方法时传入所有必要参数
-                success = self.controller.temp_order_data['user'].check_out_with_payment(
+                success = self.controller.check_out_with_payment(
                     order_data=self.controller.temp_order_data,
                     payment_method="debit",
                     bank_name=bank_name,
@@ -329,7 +329,7 @@ class Payment:
         try:
             if hasattr(self.controller, 'temp_order_data'):
                 # 调用check_out_with_payment方法时传入所有必要参数
-                success = self.controller.temp_order_data['user'].check_out_with_payment(
+                success = self.controller.check_out_with_payment(
                     order_data=self.controller.temp_order_data,
                     payment_method="account"
                 )
@@ -0,0 +1,209 @@
+import os
+import pickle
+import threading
+from datetime import date
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from money import Money
+from storage import file_lock, load_store
+
+PAYMENTS_JOURNAL_FILE = 'data/payments.journal'
+PAYMENTS_INDEX_FILE = 'data/payments.idx'
+LEGACY_PAYMENTS_FILE = 'data/payments.pkl'
+
+class IndexEntry(NamedTuple):
+    """Location and keys of one payment record in the journal"""
+    payment_id: str
+    cust_id: Optional[str]
+    day: int      # payment_date as a date ordinal
+    offset: int   # Start of the pickled record in the journal
+    end: int      # End of the pickled record in the journal
+
+class PaymentsJournal:
+    def __init__(self, journal_file: str = PAYMENTS_JOURNAL_FILE,
+                 index_file: str = PAYMENTS_INDEX_FILE,
+                 legacy_file: str = LEGACY_PAYMENTS_FILE):
+        """Initialize an append-only payments journal with cust_id and payment_date indexes
+
+        Payments are appended to the journal as individual pickled records. A small
+        sidecar index of (payment_id, cust_id, day, offset, end) is appended alongside,
+        so opening the journal reads only the index, and lookups read only the records
+        they return. Appends hold a file lock on the journal, and index entries written
+        by other processes are picked up before every lookup.
+
+        Args:
+            journal_file (str): Append-only file of pickled payments
+            index_file (str): Append-only file of index entries
+            legacy_file (str): Old dict-of-payments pickle, imported on first open
+        """
+        self.journal_file = journal_file
+        self.index_file = index_file
+        self.legacy_file = legacy_file
+        self._by_id: Dict[str, IndexEntry] = {}
+        self._by_customer: Dict[Optional[str], List[IndexEntry]] = {}
+        self._by_day: Dict[int, List[IndexEntry]] = {}
+        self._end = 0
+        self._index_offset = 0  # End of the last complete index entry read
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _load(self):
+        """Read the index, recover entries for any records written after it, import legacy data"""
+        self._loaded = True
+        with file_lock(self.journal_file):
+            is_new = not os.path.exists(self.journal_file)
+            self._refresh_index()
+
+            # Records appended after the last index entry (e.g. a crash between the two writes)
+            if not is_new and os.path.getsize(self.journal_file) > self._end:
+                self._recover_tail()
+
+            if is_new and os.path.exists(self.legacy_file):
+                legacy_payments = load_store(self.legacy_file)
+                for payment in legacy_payments.values():
+                    self._append_locked(payment)
+
+    def _refresh_index(self):
+        """Read index entries written since the last refresh, including other processes' appends"""
+        if not os.path.exists(self.index_file):
+            return
+        if os.path.getsize(self.index_file) <= self._index_offset:
+            return
+        with open(self.index_file, 'rb') as file:
+            file.seek(self._index_offset)
+            while True:
+                try:
+                    entry = IndexEntry(*pickle.load(file))
+                except Exception:
+                    break  # End of index, or a torn final entry
+                self._index_offset = file.tell()
+                self._add_to_indexes(entry)
+
+    def _recover_tail(self):
+        """Index journal records that have no index entry yet"""
+        with open(self.journal_file, 'rb') as file:
+            file.seek(self._end)
+            while True:
+                offset = file.tell()
+                try:
+                    payment = pickle.load(file)
+                except Exception:
+                    # A torn final record can fail in several ways (EOFError, UnpicklingError,
+                    # ValueError...); drop it so later appends start on a clean boundary
+                    break
+                entry = self._entry_for(payment, offset, file.tell())
+                self._write_index(entry)
+                self._add_to_indexes(entry)
+        with open(self.journal_file, 'ab') as file:
+            file.truncate(self._end)
+
+    @staticmethod
+    def _entry_for(payment, offset: int, end: int) -> IndexEntry:
+        return IndexEntry(payment.payment_id, getattr(payment, 'cust_id', None),
+                          payment.payment_date.toordinal(), offset, end)
+
+    def _add_to_indexes(self, entry: IndexEntry):
+        self._by_id[entry.payment_id] = entry
+        self._by_customer.setdefault(entry.cust_id, []).append(entry)
+        self._by_day.setdefault(entry.day, []).append(entry)
+        self._end = max(self._end, entry.end)
+
+    def _write_index(self, entry: IndexEntry):
+        with open(self.index_file, 'ab') as file:
+            pickle.dump(tuple(entry), file)
+            file.flush()
+            os.fsync(file.fileno())
+            self._index_offset = file.tell()
+
+    def ensure_loaded(self):
+        """Load the index if this has not happened yet, otherwise pick up new index entries"""
+        if not self._loaded:
+            self._load()
+        else:
+            self._refresh_index()
+
+    def append(self, payment) -> None:
+        """Append one payment record and index it
+
+        Args:
+            payment (Payment): CreditCardPayment or DebitCardPayment to record
+        """
+        with self._lock:
+            self.ensure_loaded()
+            with file_lock(self.journal_file):
+                self._refresh_index()
+                self._append_locked(payment)
+
+    def _append_locked(self, payment):
+        with open(self.journal_file, 'ab') as file:
+            offset = file.tell()
+            pickle.dump(payment, file)
+            file.flush()
+            os.fsync(file.fileno())
+            end = file.tell()
+        entry = self._entry_for(payment, offset, end)
+        self._write_index(entry)
+        self._add_to_indexes(entry)
+
+    def _read(self, entries: List[IndexEntry]) -> List:
+        """Read the payment records for the given index entries"""
+        payments = []
+        if not entries:
+            return payments
+        with open(self.journal_file, 'rb') as file:
+            for entry in entries:
+                file.seek(entry.offset)
+                payments.append(pickle.load(file))
+        return payments
+
+    def scan(self) -> Iterator:
+        """Stream every indexed payment in journal order, one record in memory at a time"""
+        with self._lock:
+            self.ensure_loaded()
+            end = self._end
+        if not end:
+            return
+        with open(self.journal_file, 'rb') as file:
+            while file.tell() < end:
+                yield pickle.load(file)
+
+    def get(self, payment_id: str):
+        """Return a payment by id, or None if unknown"""
+        with self._lock:
+            self.ensure_loaded()
+            entry = self._by_id.get(payment_id)
+            return self._read([entry])[0] if entry else None
+
+    def by_customer(self, cust_id: str) -> List:
+        """Return all payments made by a customer, oldest first"""
+        with self._lock:
+            self.ensure_loaded()
+            return self._read(self._by_customer.get(cust_id, []))
+
+    def by_date(self, payment_date: date) -> List:
+        """Return all payments taken on a given day"""
+        with self._lock:
+            self.ensure_loaded()
+            return self._read(self._by_day.get(payment_date.toordinal(), []))
+
+    def takings(self, payment_date: date) -> Money:
+        """Return the total amount of payments taken on a given day"""
+        return Money.sum(Money.from_decimal(payment.payment_amount)
+                         for payment in self.by_date(payment_date))
+
+    def payment_ids(self) -> List[str]:
+        """Return the ids of all recorded payments"""
+        with self._lock:
+            self.ensure_loaded()
+            return list(self._by_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.ensure_loaded()
+            return len(self._by_id)
+
+# Process-wide payments journal
+_payments_journal = PaymentsJournal()
+
+def payments_journal() -> PaymentsJournal:
+    """Return the process-wide payments journal"""
+    return _payments_journal
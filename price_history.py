@@ -0,0 +1,123 @@
+from array import array
+from bisect import bisect_right
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from money import Money
+from storage import load_store, save_store, update_store
+
+class PriceHistory:
+    def __init__(self):
+        """Initialize an empty effective-dated price history
+
+        Each SKU (veggie name or box display name) keeps two parallel arrays sorted
+        by effective-from day: day ordinals and prices in cents. A price applies from
+        its effective day until the next entry for the same SKU.
+        """
+        self._days: Dict[str, array] = {}
+        self._cents: Dict[str, array] = {}
+
+    @classmethod
+    def load(cls, filename: str) -> 'PriceHistory':
+        """Load a price history from a pickle file, or return an empty one if it does not exist"""
+        history = cls()
+        history._days, history._cents = load_store(filename, lambda: ({}, {}))
+        return history
+
+    def save(self, filename: str) -> None:
+        """Save the price history to a pickle file"""
+        save_store(filename, (self._days, self._cents))
+
+    def skus(self) -> List[str]:
+        """Return all SKUs with at least one recorded price"""
+        return list(self._days)
+
+    def record(self, sku: str, effective_from: date, price) -> None:
+        """Record a price for a SKU effective from the given date
+
+        A second price recorded for the same SKU and day replaces the first.
+
+        Args:
+            sku (str): Product name
+            effective_from (date): First day the price applies
+            price (Money | Decimal): Price per kg/unit/pack/box
+        """
+        days = self._days.setdefault(sku, array('l'))
+        cents = self._cents.setdefault(sku, array('q'))
+        day = effective_from.toordinal()
+        amount = Money.from_decimal(price).cents
+        pos = bisect_right(days, day)
+        if pos and days[pos - 1] == day:
+            cents[pos - 1] = amount
+        else:
+            days.insert(pos, day)
+            cents.insert(pos, amount)
+
+    def price_at(self, sku: str, on_date: date) -> Optional[Money]:
+        """Return the price of a SKU on a given date
+
+        Args:
+            sku (str): Product name
+            on_date (date): Date to look up
+
+        Returns:
+            Money: The price in effect on that date, or None if the SKU had no price yet
+        """
+        days = self._days.get(sku)
+        if not days:
+            return None
+        pos = bisect_right(days, on_date.toordinal())
+        if pos == 0:
+            return None
+        return Money(self._cents[sku][pos - 1])
+
+    def prices_at(self, lookups: Iterable[Tuple[str, date]]) -> List[Optional[Money]]:
+        """Bulk version of price_at for (sku, date) pairs, e.g. when repricing historical orders"""
+        return [self.price_at(sku, on_date) for sku, on_date in lookups]
+
+    def current_price(self, sku: str) -> Optional[Money]:
+        """Return the most recently effective price recorded for a SKU"""
+        cents = self._cents.get(sku)
+        if not cents:
+            return None
+        return Money(cents[-1])
+
+    def sync_catalog(self, catalog_prices: Iterable[Tuple[str, Money, date]]) -> bool:
+        """Record every catalog price that differs from the latest recorded price
+
+        Args:
+            catalog_prices (Iterable[Tuple[str, Money, date]]): Current (sku, price,
+                effective_from) triples, dated by when the catalog changed
+
+        Returns:
+            bool: True if any price was recorded
+        """
+        changed = False
+        for sku, price, effective_from in catalog_prices:
+            if self.current_price(sku) != price:
+                self.record(sku, effective_from, price)
+                changed = True
+        return changed
+
+    @classmethod
+    def sync_store(cls, filename: str, catalog_prices: Iterable[Tuple[str, Money, date]]) -> 'PriceHistory':
+        """Record catalog price changes in a price history store and return the history
+
+        The store is only rewritten if a price changed, and then through update_store,
+        which writes under the store's file lock and retries against the latest
+        version on disk, so two tills syncing at once keep both sets of changes.
+
+        Args:
+            filename (str): Pickle store holding the price history
+            catalog_prices (Iterable[Tuple[str, Money, date]]): See sync_catalog
+
+        Returns:
+            PriceHistory: The history with the catalog's prices recorded
+        """
+        catalog_prices = list(catalog_prices)
+        history = cls.load(filename)
+        if history.sync_catalog(catalog_prices):
+            def sync(stored):
+                history._days, history._cents = stored
+                history.sync_catalog(catalog_prices)
+            update_store(filename, sync, lambda: ({}, {}))
+        return history
@@ -0,0 +1,116 @@
+from array import array
+from decimal import Decimal
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from money import Money
+
+# Quantities are scaled to thousandths so weights (0.1 kg steps) and counts share one integer path
+QUANTITY_SCALE = 1000
+
+class RepriceResult(NamedTuple):
+    """Outcome of repricing a batch of cart lines against the catalog"""
+    unit_cents: List[int]        # Catalog price per kg/unit/pack/box, -1 for unknown SKUs
+    line_cents: List[int]        # Line totals rounded half-up to whole cents
+    stale_line_ids: List[int]    # Lines whose quoted price differs from the catalog
+    unknown_line_ids: List[int]  # Lines whose SKU is not in the catalog
+
+    @property
+    def ok(self) -> bool:
+        """True if every line was found in the catalog at the quoted price"""
+        return not self.stale_line_ids and not self.unknown_line_ids
+
+class PriceTable:
+    def __init__(self):
+        """Initialize an empty in-memory SKU -> price table
+
+        SKUs are the product names used in the cart ("Carrot by weight/kg", "Small Box").
+        Each SKU gets a dense integer id indexing a contiguous array of prices in cents.
+        """
+        self._sku_ids: Dict[str, int] = {}
+        self._skus: List[str] = []
+        self._cents = array('q')
+
+    def __len__(self) -> int:
+        return len(self._skus)
+
+    def __contains__(self, sku: str) -> bool:
+        return sku in self._sku_ids
+
+    def set_price(self, sku: str, price) -> int:
+        """Add or update the price of a SKU
+
+        Args:
+            sku (str): Product name
+            price (Money | Decimal): Price per kg/unit/pack/box
+
+        Returns:
+            int: The SKU id
+        """
+        cents = Money.from_decimal(price).cents
+        sku_id = self._sku_ids.get(sku)
+        if sku_id is None:
+            sku_id = len(self._skus)
+            self._sku_ids[sku] = sku_id
+            self._skus.append(sku)
+            self._cents.append(cents)
+        else:
+            self._cents[sku_id] = cents
+        return sku_id
+
+    def items(self) -> Iterator[Tuple[str, Money]]:
+        """Iterate over (sku, price) pairs in SKU id order"""
+        for sku, cents in zip(self._skus, self._cents):
+            yield sku, Money(cents)
+
+    def sku_id(self, sku: str) -> int:
+        """Return the SKU id, or -1 if the SKU is unknown"""
+        return self._sku_ids.get(sku, -1)
+
+    def sku_name(self, sku_id: int) -> str:
+        """Return the product name for a SKU id"""
+        return self._skus[sku_id]
+
+    def price_of(self, sku: str) -> Optional[Money]:
+        """Return the catalog price of a SKU, or None if unknown"""
+        sku_id = self._sku_ids.get(sku)
+        if sku_id is None:
+            return None
+        return Money(self._cents[sku_id])
+
+    def reprice(self, lines: Sequence) -> RepriceResult:
+        """Reprice cart lines from the catalog in one pass over the batch
+
+        Args:
+            lines (Sequence[CartLine]): Lines with name, quantity, price and line_id
+
+        Returns:
+            RepriceResult: Catalog unit prices, line totals and any stale/unknown lines
+        """
+        sku_ids = self._sku_ids
+        table = self._cents
+        ids = [sku_ids.get(line.name, -1) for line in lines]
+        unit_cents = [table[i] if i >= 0 else -1 for i in ids]
+        quoted_cents = [Money.from_decimal(line.price).cents for line in lines]
+        quantities = [int(Decimal(line.quantity) * QUANTITY_SCALE) for line in lines]
+        half = QUANTITY_SCALE // 2
+        line_cents = [
+            (cents * qty + half) // QUANTITY_SCALE if cents >= 0 else 0
+            for cents, qty in zip(unit_cents, quantities)
+        ]
+        unknown = [line.line_id for line, cents in zip(lines, unit_cents) if cents < 0]
+        stale = [
+            line.line_id for line, cents, quoted in zip(lines, unit_cents, quoted_cents)
+            if cents >= 0 and cents != quoted
+        ]
+        return RepriceResult(unit_cents, line_cents, stale, unknown)
+
+# Process-wide catalog, loaded by Company at startup and used to reprice checkouts
+_catalog: Optional[PriceTable] = None
+
+def set_catalog(table: PriceTable) -> None:
+    """Install the price table used for server-side repricing"""
+    global _catalog
+    _catalog = table
+
+def get_catalog() -> Optional[PriceTable]:
+    """Return the installed price table, or None if no catalog has been loaded"""
+    return _catalog
@@ -1,9 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from decimal import Decimal, ROUND_HALF_UP
-import os
+from decimal import Decimal
 from my_widgts import ValidatedSpinbox
 from decimal import InvalidOperation
+from model import Cart
 
 
 
@@ -24,15 +24,11 @@ class Product:
             self.veggies_weight_list = self.controller.veggies_weight_list  # weight类蔬菜列表
             self.veggies_unit_list = self.controller.veggies_unit_list    # unit类蔬菜列表
             self.veggies_pack_list = self.controller.veggies_pack_list    # pack类蔬菜列表
-            # 初始化盒子配置
-            self.smallbox_default_dict = self.controller.smallbox_default_dict
-            self.mediumbox_default_dict = self.controller.mediumbox_default_dict
-            self.largebox_default_dict = self.controller.largebox_default_dict
-
-            # 初始化固定值
-            self.small_size = 3
-            self.medium_size = 4
-            self.large_size = 5
+            # 初始化盒子配置 (box registry, 每个size一个不可变模板)
+            self.box_registry = self.controller.box_registry
+
+            # 购物车数据模型 (cart_tree只是它的视图)
+            self.cart = Cart(getattr(self.user, 'discount_rate', Decimal('0.00')))
             
             # 创建主Frame
             self.main_frame = ttk.Frame(parent)
@@ -49,7 +45,7 @@ class Product:
             
             # 初始化变量
             self.veggie_type_var = tk.StringVar(value='weight/kg')
-            self.box_size_var = tk.StringVar(value='small')
+            self.box_size_var = tk.StringVar(value=next(iter(self.box_registry), ''))
             
             # 初始化三层界面
             self._setup_veggie_products()  # 上层 - 商品选择
@@ -143,11 +139,10 @@ class Product:
         size_frame = ttk.Frame(main_container)
         size_frame.grid(row=0, column=0, sticky='ew', padx=5, pady=5)
         
-        for i, size in enumerate(['small', 'medium', 'large']):
-            price = getattr(self, f"{size}box_default_dict")['price']
+        for i, (size, template) in enumerate(self.box_registry.items()):
             ttk.Radiobutton(
                 size_frame,
-                text=f"{size.capitalize()} (${float(price):.2f})",
+                text=f"{size.capitalize()} (${template.price:.2f})",
                 value=size,
                 variable=self.box_size_var,
                 command=self._update_b_contents
@@ -162,21 +157,8 @@ class Product:
         self.contents_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.contents_frame.grid_columnconfigure(1, weight=1)
         
-        # 创建固定的items标签和combobox
+        # items标签和combobox按需创建, 切换size时复用已有的行
         self.item_widgets = []
-        for i in range(5):
-            label = ttk.Label(self.contents_frame, text=f"Item {i+1}:")
-            label.grid(row=i, column=0, padx=5, pady=2, sticky='w')
-            
-            combo = ttk.Combobox(self.contents_frame, state='readonly', width=40)
-            combo['values'] = self.all_veggies_list
-            combo.grid(row=i, column=1, padx=5, pady=2, sticky='ew')
-            
-            self.item_widgets.append((label, combo))
-            
-            if i >= 3:
-                label.grid_remove()
-                combo.grid_remove()
         
         # Quantity选择区域 - row 2
         quantity_frame = ttk.Frame(main_container)
@@ -315,6 +297,20 @@ class Product:
         self.cart_tree.column('Contents', width=400, minwidth=800)
         
         self.cart_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.cart_tree.bind('<Delete>', lambda event: self._remove_selected_lines())
+
+        # 删除选中行的按钮
+        ttk.Button(
+            main_container,
+            text="Remove Selected",
+            command=self._remove_selected_lines
+        ).grid(row=1, column=0, sticky='w', pady=(5, 0))
+
+        # "Customers also added" suggestions for the current cart
+        suggestions_frame = ttk.LabelFrame(main_container, text="Customers Also Added")
+        suggestions_frame.grid(row=0, column=1, rowspan=2, sticky='ns', padx=(5, 0))
+        self.suggestions_list = tk.Listbox(suggestions_frame, width=30, height=6)
+        self.suggestions_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
     def _update_veggie_products(self):
         """更新A类商品下拉框的内容"""
@@ -344,11 +340,26 @@ class Product:
             self.veggie_product_combo['values'] = []
             self.veggie_product_combo.set('')
 
+    def _ensure_item_rows(self, num_items):
+        """确保至少有num_items行item控件, 只创建缺少的行"""
+        for i in range(len(self.item_widgets), num_items):
+            label = ttk.Label(self.contents_frame, text=f"Item {i+1}:")
+            label.grid(row=i, column=0, padx=5, pady=2, sticky='w')
+            
+            combo = ttk.Combobox(self.contents_frame, state='readonly', width=40)
+            combo['values'] = self.all_veggies_list
+            combo.grid(row=i, column=1, padx=5, pady=2, sticky='ew')
+            
+            self.item_widgets.append((label, combo))
+
     def _update_b_contents(self):
         """更新B类商品的contents显示"""
         current_size = self.box_size_var.get()
-        box_dict = getattr(self, f"{current_size}box_default_dict")
-        num_items = getattr(self, f"{current_size}_size")
+        if current_size not in self.box_registry:
+            return
+        template = self.box_registry[current_size]
+        num_items = template.num_items
+        self._ensure_item_rows(num_items)
         
         # 遍历所有items
         for i, (label, combo) in enumerate(self.item_widgets):
@@ -357,8 +368,8 @@ class Product:
                 label.grid()
                 combo.grid()
                 
-                # 设置默认值（从box_dict中获取）
-                default_content = box_dict['contents'][i]
+                # 设置默认值（从template中获取）
+                default_content = template.contents[i]
                 for option in self.all_veggies_list:
                     if default_content.split(' x ')[0] in option:
                         combo.set(option)
@@ -385,17 +396,15 @@ class Product:
                 messagebox.showwarning("Warning", "Quantity must be greater than zero")
                 return
             
+            type_mapping = {
+                'weight/kg': 'weight',
+                'unit': 'unit',
+                'pack': 'pack'
+            }
+            item_type = type_mapping[self.veggie_type_var.get()]
             name, price = product.split(' - $')
-            price = Decimal(price).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            subtotal = (price * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-            self.cart_tree.insert('', 'end', values=(
-                name,
-                quantity,
-                f"${float(price):.2f}",
-                f"${float(subtotal):.2f}",
-                ""  # No contents for standard products
-            ))
+            line = self.cart.add(item_type, name, quantity, Decimal(price))
+            self._insert_cart_row(line)
         except (ValueError, InvalidOperation) as e:
             messagebox.showerror("Error", f"Invalid input: {str(e)}")
         except Exception as e:
@@ -407,27 +416,16 @@ class Product:
         try:
             size = self.box_size_var.get()
             quantity = int(self.box_quantity_spinbox.get())
-            box_dict = getattr(self, f"{size}box_default_dict")
-            price = box_dict['price']
-            subtotal = (price * Decimal(quantity)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            template = self.box_registry[size]
             
             # 获取当前选择的contents
-            contents = []
-            num_items = getattr(self, f"{size}_size")
-            for i, (_, combo) in enumerate(self.item_widgets[:num_items]):
-                item_name = combo.get().split(' - $')[0]
-                contents.append(f"{item_name} x 1")
+            contents = tuple(
+                combo.get().split(' - $')[0]
+                for _, combo in self.item_widgets[:template.num_items]
+            )
             
-            # 格式化contents字符串
-            contents_str = ", ".join(contents)
-            
-            self.cart_tree.insert('', 'end', values=(
-                f"{size.capitalize()} Box",
-                quantity,
-                f"${float(price):.2f}",
-                f"${float(subtotal):.2f}",
-                contents_str
-            ))
+            line = self.cart.add('box', template.display_name, Decimal(quantity), template.price, contents)
+            self._insert_cart_row(line)
             
         except ValueError as e:
             messagebox.showerror("Error", f"Invalid input: {str(e)}")
@@ -438,54 +436,21 @@ class Product:
         """准备订单数据并显示支付界面"""
         try:
             # Check if the cart is empty
-            if not self.cart_tree.get_children():
+            if not self.cart:
                 messagebox.showwarning("Warning", "Cart is empty")
                 return
             
-            # Initialize cart list and total
-            self.cart_dict = []
-            subtotal = Decimal('0.00')
-            
-            # Iterate through cart items
-            for item in self.cart_tree.get_children():
-                values = self.cart_tree.item(item)['values']
-                
-                # Parse values [Product, Quantity, Price, Subtotal, Contents]
-                name = values[0]
-                quantity = Decimal(values[1])
-                price = Decimal(values[2].replace('$', ''))
-                subtotal_item = Decimal(values[3].replace('$', ''))
-                contents = values[4] if values[4] else ""
-                
-                # Accumulate subtotal
-                subtotal += subtotal_item
-                
-                # Create item dictionary and append to list
-                cart_item = {
-                    'type': 'box' if 'Box' in name else self._determine_item_type(name),
-                    'name': name,
-                    'quantity': quantity,
-                    'price': price,
-                    'subtotal': subtotal_item,
-                    'contents': contents
-                }
-                self.cart_dict.append(cart_item)
-            
-            # Calculate delivery fee if delivery is selected
-            delivery_fee = Decimal('10.00') if self.delivery_var.get() else Decimal('0.00')
-            
-            # Calculate total
-            total = subtotal + delivery_fee
+            self.cart.set_delivery(self.delivery_var.get())
             
             # 直接将数据存储在controller中
             self.controller.temp_order_data = {
-                'cart_items': self.cart_dict,
+                'cart_items': list(self.cart),
                 'user': self.user,
-                'subtotal': subtotal,
-                'delivery_fee': delivery_fee,
-                'discount': Decimal('0.00'),  # 如果有折扣逻辑可以在这里添加
-                'total': total,
-                'is_delivery': self.delivery_var.get(),
+                'subtotal': self.cart.subtotal,
+                'delivery_fee': self.cart.delivery_fee,
+                'discount': self.cart.discount,
+                'total': self.cart.total,
+                'is_delivery': self.cart.is_delivery,
             }
             
             # 调用支付回调显示支付界面
@@ -509,37 +474,43 @@ class Product:
             'unknown': 'item'
         }
         return unit_mapping.get(item_type, 'item')
+
+    def _insert_cart_row(self, line):
+        """在cart_tree中显示一行购物车数据, 行id即cart line id"""
+        self.cart_tree.insert('', 'end', iid=str(line.line_id), values=(
+            line.name,
+            line.quantity,
+            f"${line.price:.2f}",
+            f"${line.subtotal:.2f}",
+            line.contents_display
+        ))
+        self._update_suggestions()
+
+    def _update_suggestions(self):
+        """Refresh the "customers also added" list for the current cart"""
+        self.suggestions_list.delete(0, tk.END)
+        for name in self.controller.customer_suggestions(list(self.cart)):
+            self.suggestions_list.insert(tk.END, name)
+
+    def _remove_selected_lines(self):
+        """从购物车中删除选中的行"""
+        try:
+            for row_id in self.cart_tree.selection():
+                self.cart.remove(int(row_id))
+                self.cart_tree.delete(row_id)
+            self._update_suggestions()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error removing from cart: {str(e)}")
+
     def _clear_cart(self):
         """清空购物车"""
         try:
+            self.cart.clear()
             for item in self.cart_tree.get_children():
                 self.cart_tree.delete(item)
+            self._update_suggestions()
         except Exception as e:
             messagebox.showerror("Error", f"Error clearing cart: {str(e)}")
-    
-    def _determine_item_type(self, name):
-        """
-        Determine the type of item based on its name.
-        
-        Args:
-            name (str): Name of the product (e.g. "Spinach by weight/kg", "Small Box")
-            
-        Returns:
-            str: Type of the product ('weight', 'unit', 'pack', 'box', or 'unknown')
-        """
-        # Box类型的特殊处理
-        if name in ["Small Box", "Medium Box", "Large Box"]:
-            return 'box'
-        
-        # 根据商品名称中的标识判断类型
-        if "by weight/kg" in name:
-            return 'weight'
-        elif "by unit" in name:
-            return 'unit'
-        elif "by pack" in name:
-            return 'pack'
-        
-        return 'unknown'  # 如果都没找到，返回unknown
 
 
     def get_main_frame(self):
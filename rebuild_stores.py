@@ -0,0 +1,11 @@
+# Rebuild every store derived from the orders, from the project directory: python rebuild_stores.py
+# Run it while the tills are idle (see DerivedStore.rebuild).
+import model  # noqa: F401  (pickled classes live in the model module)
+import customer_stats, recommendations, sketches, trending  # noqa: F401  (register their stores)
+from derived_store import rebuild_derived_stores
+from order_lines import ORDER_LINES_DIR, rebuild_order_lines
+
+if __name__ == "__main__":
+    print(f"{rebuild_order_lines()} order lines written to {ORDER_LINES_DIR}")
+    for store in rebuild_derived_stores():
+        print(f"Rebuilt the {store.description} in {store.snapshot_file}")
@@ -0,0 +1,70 @@
+# "Customers also added" suggestions from item co-occurrence in past orders,
+# derived from the order-event journal.
+import heapq
+from typing import Dict, Iterable, List, Tuple
+from derived_store import DerivedStore, register
+from order_events import CHECKOUT, OrderEvent
+
+COOCCURRENCE_FILE = 'data/cooccurrence.snapshot.pkl'
+
+class Recommender(DerivedStore):
+    def __init__(self, snapshot_file: str = COOCCURRENCE_FILE):
+        """Initialize "customers also added" lookups over the sparse item-item counts
+
+        The counts are loaded once and then kept current from the order-event journal,
+        so a lookup costs a walk over the neighbours of the items in the cart, and a
+        checkout appends one event instead of rewriting the counts.
+
+        Args:
+            snapshot_file (str): Pickle store holding the co-occurrence counts
+        """
+        super().__init__(snapshot_file, "co-occurrence counts")
+
+    def new_state(self) -> dict:
+        # 'baskets': item name -> orders containing it
+        # 'pairs': item name -> {other item name: orders containing both}, kept symmetric
+        return {'baskets': {}, 'pairs': {}}
+
+    def apply(self, counts: dict, event: OrderEvent):
+        if event.kind != CHECKOUT:
+            return
+        baskets, pairs = counts['baskets'], counts['pairs']
+        names = {line.name for line in event.lines}  # Box contents included
+        for name in names:
+            baskets[name] = baskets.get(name, 0) + 1
+            row = pairs.setdefault(name, {})
+            for other in names:
+                if other != name:
+                    row[other] = row.get(other, 0) + 1
+
+    def suggest(self, cart_items: Iterable[str], k: int = 5) -> List[Tuple[str, float]]:
+        """Rank products often bought with the cart's items, excluding those already in it
+
+        Each candidate scores the sum over cart items of the share of that item's
+        orders that also contained the candidate.
+
+        Args:
+            cart_items (Iterable[str]): Product names in the cart, box contents included
+            k (int): Maximum number of suggestions
+
+        Returns:
+            List[Tuple[str, float]]: (product name, score), best first
+        """
+        counts = self.current()
+        in_cart = set(cart_items)
+        scores: Dict[str, float] = {}
+        for name in in_cart:
+            baskets = counts['baskets'].get(name)
+            if not baskets:
+                continue
+            for other, together in counts['pairs'].get(name, {}).items():
+                if other not in in_cart:
+                    scores[other] = scores.get(other, 0.0) + together / baskets
+        return heapq.nsmallest(k, scores.items(), key=lambda pair: (-pair[1], pair[0]))
+
+# Process-wide recommender used by the Product screen
+_recommender = register(Recommender())
+
+def recommender() -> Recommender:
+    """Return the process-wide recommender"""
+    return _recommender
@@ -0,0 +1,112 @@
+# Payment-to-order reconciliation.
+# Run from the project directory: python reconcile.py
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+import model  # noqa: F401  (pickled classes live in the model module)
+from money import Money
+from payments_journal import payments_journal
+from order_archive import load_orders
+
+# (cust_id, amount in cents, day ordinal)
+MatchKey = Tuple[str, int, int]
+
+class ReconciliationReport(NamedTuple):
+    """Outcome of one reconciliation pass"""
+    matched: Dict[str, str]              # payment_id -> order_number
+    unmatched: List[str]                 # payment_ids with no order
+    duplicates: List[Tuple[str, str]]    # (payment_id, order_number already paid)
+
+    def summary(self) -> str:
+        return (f"{len(self.matched)} matched, {len(self.unmatched)} unmatched, "
+                f"{len(self.duplicates)} duplicate payments")
+
+class Reconciler:
+    def __init__(self, orders: Dict[str, 'Order']):
+        """Initialize a reconciler with a hash table over the orders
+
+        Orders are the build side of the join: they are indexed once by order_number
+        and by (cust_id, total cents, order day). Payments are the probe side and are
+        streamed, so memory grows with the number of orders only.
+
+        Args:
+            orders (Dict[str, Order]): Orders keyed by order number
+        """
+        self._order_numbers = set(orders)
+        self._by_key: Dict[MatchKey, List[str]] = {}
+        for order_number, order in orders.items():
+            key = (order.cust_id, order.total_amount.cents, order.order_date.toordinal())
+            self._by_key.setdefault(key, []).append(order_number)
+        self._paid: Dict[str, str] = {}  # order_number -> first payment_id
+
+    def _claim_by_key(self, payment) -> Tuple[str, bool]:
+        """Find the order for a payment without an order_number
+
+        Returns:
+            Tuple[str, bool]: (order_number, already_paid), or (None, False) if no order
+                matches or the payment does not record its customer
+        """
+        # Payments taken before cust_id was recorded cannot be keyed
+        cust_id = getattr(payment, 'cust_id', None)
+        if cust_id is None:
+            return None, False
+        amount = Money.from_decimal(payment.payment_amount).cents
+        day = payment.payment_date.toordinal()
+        # Checkout creates the order before paying, so the order can be dated the day before
+        keys = [(cust_id, amount, day), (cust_id, amount, day - 1)]
+        for key in keys:
+            for order_number in self._by_key.get(key, ()):
+                if order_number not in self._paid:
+                    return order_number, False  # Oldest unpaid order first
+        for key in keys:
+            candidates = self._by_key.get(key)
+            if candidates:
+                return candidates[0], True
+        return None, False
+
+    def run(self, payments: Iterable) -> ReconciliationReport:
+        """Match each payment to at most one order in a single pass
+
+        Payments recorded with an order_number are matched on it directly; older
+        payments fall back to the (cust_id, amount, date) hash join. Legacy payments
+        recorded with neither are reported as unmatched.
+
+        Args:
+            payments (Iterable[Payment]): Payments in the order they were taken
+
+        Returns:
+            ReconciliationReport: Matched, unmatched and duplicate payments
+        """
+        report = ReconciliationReport({}, [], [])
+        for payment in payments:
+            order_number = getattr(payment, 'order_number', None)
+            if order_number is None:
+                order_number, already_paid = self._claim_by_key(payment)
+            elif order_number in self._order_numbers:
+                already_paid = order_number in self._paid
+            else:
+                # Paid, but the checkout never saved its order
+                order_number, already_paid = None, False
+
+            if order_number is None:
+                report.unmatched.append(payment.payment_id)
+            elif already_paid:
+                report.duplicates.append((payment.payment_id, order_number))
+            else:
+                self._paid[order_number] = payment.payment_id
+                report.matched[payment.payment_id] = order_number
+        return report
+
+def reconcile_payments() -> ReconciliationReport:
+    """Reconcile the payments journal against the hot and archived orders
+
+    Returns:
+        ReconciliationReport: Matched, unmatched and duplicate payments
+    """
+    return Reconciler(load_orders()).run(payments_journal().scan())
+
+if __name__ == "__main__":
+    report = reconcile_payments()
+    print(report.summary())
+    for payment_id in report.unmatched:
+        print(f"Unmatched payment: {payment_id}")
+    for payment_id, order_number in report.duplicates:
+        print(f"Duplicate payment: {payment_id} for order {order_number}")
@@ -0,0 +1,92 @@
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+from order_events import journal_size
+from storage import store_version, update_store
+
+DATA_VERSION_FILE = 'data/data_version.pkl'
+DEFAULT_BUDGET_BYTES = 32 * 1024 * 1024
+
+class ReportError(str):
+    """Error text a report returns in place of its result; shown like any report, never cached"""
+
+def data_version() -> Tuple[int, int]:
+    """Return the shared data version, which moves whenever orders or customers change"""
+    # Every write of a store moves its version, so the store itself holds nothing.
+    # Derived stores only append to the order-event journal, so its size counts too.
+    return store_version(DATA_VERSION_FILE), journal_size()
+
+def bump_data_version() -> None:
+    """Mark every cached report as out of date, in this process and every other one"""
+    update_store(DATA_VERSION_FILE, lambda data: None)
+
+class ReportCache:
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        """Initialize an LRU cache of report results keyed by (report, params, data version)
+
+        Results are kept until the data version changes or the cache exceeds its memory
+        budget, measured as the pickled size of the results. The least recently used
+        results are evicted first.
+
+        Args:
+            budget_bytes (int): Maximum total size of cached results
+        """
+        self.budget_bytes = budget_bytes
+        self._entries: 'OrderedDict[Tuple, Tuple[Any, int]]' = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, report: str, params: Tuple[Hashable, ...], compute: Callable[[], Any]) -> Any:
+        """Return a cached report result, computing and caching it on a miss
+
+        A ReportError is returned without being cached, so the report is tried again
+        on the next request.
+
+        Args:
+            report (str): Report type, e.g. 'popular_items'
+            params (Tuple[Hashable, ...]): Report parameters, e.g. a date range
+            compute (Callable[[], Any]): Builds the report
+
+        Returns:
+            Any: The report result
+        """
+        version = data_version()
+        key = (report, params, version)
+        with self._lock:
+            if version != self._version:
+                # Every entry was computed from older data
+                self._entries.clear()
+                self._size = 0
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+
+        result = compute()
+        if isinstance(result, ReportError):
+            return result
+        size = len(pickle.dumps(result))
+        if size > self.budget_bytes:
+            return result
+
+        with self._lock:
+            if version != self._version or key in self._entries:
+                return result
+            self._entries[key] = (result, size)
+            self._size += size
+            while self._size > self.budget_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Process-wide cache used by the staff screens
+_report_cache = ReportCache()
+
+def report_cache() -> ReportCache:
+    """Return the process-wide report cache"""
+    return _report_cache
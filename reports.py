@@ -0,0 +1,122 @@
+# Headless staff reports, aggregated in parallel across order partitions.
+# Run from the project directory, e.g.:
+#   python reports.py popular --workers 8
+#   python reports.py sales --start 2024-01-01 --end 2024-12-31 --workers 8
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+from money import Money
+from pricing import QUANTITY_SCALE
+
+class SalesPartial(NamedTuple):
+    """Sales aggregated over one order partition"""
+    sales_cents: int          # Sum of order sales_amount (after discount, before delivery)
+    orders: int               # Orders in the date range
+    day_cents: Dict[int, int] # Day ordinal -> sales cents
+
+def _run(tasks: List[Tuple[Callable, tuple]], workers: int) -> List:
+    """Run (function, args) tasks, in a process pool when more than one worker is asked for"""
+    if workers <= 1 or len(tasks) <= 1:
+        return [function(*args) for function, args in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(function, *args) for function, args in tasks]
+        return [future.result() for future in futures]
+
+def _merge_counts(partials: Iterable[Dict[int, int]]) -> Dict[int, int]:
+    """Add up per-key integer partials; exact, whatever the order they arrive in"""
+    merged: Dict[int, int] = {}
+    for partial in partials:
+        for key, value in partial.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+def _sku_quantities_partial(start: int, stop: int) -> Dict[int, int]:
+    """Worker: per-sku quantities over one slice of the order-line rows"""
+    from analytics import AnalyticsEngine
+    from order_lines import open_order_lines
+    with open_order_lines() as lines:
+        return AnalyticsEngine(lines, rows=range(start, stop)).sku_quantities()
+
+def _sales_partial(archived: bool, month: str, first_day: int, last_day: int) -> SalesPartial:
+    """Worker: sales within [first_day, last_day] in one hot or archived month partition"""
+    import model  # noqa: F401  (pickled classes live in the model module)
+    from order_archive import load_archive_month
+    from order_store import load_partitions
+    orders = load_archive_month(month) if archived else load_partitions([month])
+    sales_cents, count, day_cents = 0, 0, {}
+    for order in orders.values():
+        day = order.order_date.toordinal()
+        if first_day <= day <= last_day:
+            cents = order.sales_amount.cents
+            sales_cents += cents
+            count += 1
+            day_cents[day] = day_cents.get(day, 0) + cents
+    return SalesPartial(sales_cents, count, day_cents)
+
+def popular_products(workers: int) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+    """Rank products over the order-line store, splitting the rows across workers
+
+    Returns:
+        Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]: (veggies, boxes) as
+            (name, quantity in thousandths), best sellers first
+    """
+    from analytics import rank_products
+    from order_lines import open_order_lines
+    with open_order_lines() as lines:
+        rows = len(lines)
+        chunk = max(1, -(-rows // max(1, workers)))
+        tasks = [(_sku_quantities_partial, (start, min(start + chunk, rows)))
+                 for start in range(0, rows, chunk)]
+        quantities = _merge_counts(_run(tasks, workers))
+        return rank_products(lines, quantities)
+
+def sales_summary(start_date: date, end_date: date, workers: int) -> SalesPartial:
+    """Total sales in a date range, one task per overlapping hot or archived month partition
+
+    Partitions are aggregated independently, so an order left in both tiers by an
+    interrupted archive run is counted twice until the next archive pass removes
+    its hot copy.
+    """
+    from order_archive import archived_months
+    from order_store import month_key, months_overlapping
+    first_day, last_day = start_date.toordinal(), end_date.toordinal()
+    hot_months = months_overlapping(start_date, end_date)
+    archived = [month for month in archived_months()
+                if month_key(start_date) <= month <= month_key(end_date)]
+    tasks = ([(_sales_partial, (False, month, first_day, last_day)) for month in hot_months] +
+             [(_sales_partial, (True, month, first_day, last_day)) for month in archived])
+    partials = _run(tasks, workers)
+    return SalesPartial(sum(p.sales_cents for p in partials),
+                        sum(p.orders for p in partials),
+                        _merge_counts(p.day_cents for p in partials))
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Print staff reports without the GUI")
+    parser.add_argument('report', choices=['popular', 'sales'])
+    parser.add_argument('--start', type=date.fromisoformat, default=date.min,
+                        help="First day of the sales report (YYYY-MM-DD)")
+    parser.add_argument('--end', type=date.fromisoformat, default=date.today(),
+                        help="Last day of the sales report (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (1 runs everything in this process)")
+    args = parser.parse_args(argv)
+
+    if args.report == 'popular':
+        veggies, boxes = popular_products(args.workers)
+        print("[Veggie Products]")
+        for name, qty in veggies:
+            print(f"{name}: {qty / QUANTITY_SCALE:.2f} sold")
+        print("\n[Premade Boxes]")
+        for name, qty in boxes:
+            print(f"{name}: {qty // QUANTITY_SCALE} sold")
+    else:
+        summary = sales_summary(args.start, args.end, args.workers)
+        print(f"Sales {args.start} to {args.end}: ${Money(summary.sales_cents):.2f} "
+              f"over {summary.orders} orders")
+        for day, cents in sorted(summary.day_cents.items()):
+            print(f"  {date.fromordinal(day)}: ${Money(cents):.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import threading
+from typing import Callable, Dict, Iterable
+from storage import file_lock, load_store, save_store
+
+SEQUENCES_FILE = 'data/sequences.pkl'
+FIRST_ID = 1000
+BLOCK_SIZE = 20
+
+def _max_numeric_suffix(ids: Iterable[str], prefix: str, default: int) -> int:
+    """Return the largest number n among ids of the form prefix + n"""
+    highest = default
+    for id_ in ids:
+        if id_.startswith(prefix) and id_[len(prefix):].isdigit():
+            highest = max(highest, int(id_[len(prefix):]))
+    return highest
+
+def _seed_orders() -> int:
+    """First free order id, from the keys of the hot and archived orders"""
+    from order_archive import load_orders
+    orders = load_orders()
+    return _max_numeric_suffix(orders, 'ORD', FIRST_ID - 1) + 1
+
+def _seed_payments() -> int:
+    """First free payment id, from the payments journal index"""
+    from payments_journal import payments_journal
+    return _max_numeric_suffix(payments_journal().payment_ids(), 'PAY', FIRST_ID - 1) + 1
+
+class SequenceAllocator:
+    def __init__(self, seeders: Dict[str, Callable[[], int]],
+                 sequences_file: str = SEQUENCES_FILE,
+                 block_size: int = BLOCK_SIZE):
+        """Initialize an allocator of unique ids shared by every process using the data directory
+
+        The sequences file holds one high-water mark per sequence: the next number no
+        process has claimed. A process claims a block of block_size numbers at a time
+        under an exclusive file lock and hands them out from memory, so allocation
+        reads and writes a few bytes once per block. Numbers left in a block when a
+        process exits are skipped, never reused.
+
+        Args:
+            seeders (Dict[str, Callable[[], int]]): Per sequence, returns the first free number
+                from existing data; only called when the sequences file does not exist yet
+            sequences_file (str): Pickle file of high-water marks
+            block_size (int): Numbers claimed per trip to the sequences file
+        """
+        self.seeders = seeders
+        self.sequences_file = sequences_file
+        self.block_size = block_size
+        self._next: Dict[str, int] = {}
+        self._limit: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _claim_block(self, name: str):
+        """Move the high-water mark for a sequence forward by one block"""
+        with file_lock(self.sequences_file):
+            marks = load_store(self.sequences_file)
+            if name not in marks:
+                seeder = self.seeders.get(name)
+                marks[name] = seeder() if seeder else FIRST_ID
+            start = marks[name]
+            marks[name] = start + self.block_size
+            save_store(self.sequences_file, marks)
+        self._next[name] = start
+        self._limit[name] = start + self.block_size
+
+    def next_id(self, name: str) -> int:
+        """Return the next unique number in a sequence
+
+        Args:
+            name (str): Sequence name, e.g. 'order' or 'payment'
+        """
+        with self._lock:
+            if self._next.get(name, 0) >= self._limit.get(name, 0):
+                self._claim_block(name)
+            number = self._next[name]
+            self._next[name] = number + 1
+            return number
+
+    def high_water_mark(self, name: str) -> int:
+        """Return the first number no process has claimed yet, without claiming anything"""
+        return load_store(self.sequences_file).get(name, FIRST_ID)
+
+# Process-wide allocator for order and payment numbers
+_sequences = SequenceAllocator({'order': _seed_orders, 'payment': _seed_payments})
+
+def sequences() -> SequenceAllocator:
+    """Return the process-wide id allocator"""
+    return _sequences
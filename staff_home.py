@@ -289,6 +289,113 @@ class SalesReportFrame(ttk.Frame):
         
         self.on_date_submit(start_date, end_date)
 
+class CustomerDirectoryFrame(ttk.Frame):
+    HEADERS = ["Customer ID", "Name", "Username", "Address", "Balance", "Max Owing", "Type",
+               "Orders", "Lifetime Spend", "Avg Basket", "Last Order"]
+    SORTS = {"Name": "name", "Balance": "balance", "Credit Left": "owing",
+             "Lifetime Spend": "spend", "Last Order": "last_order"}
+    FIELDS = {"Name": "name", "Username": "username", "Address": "address"}
+
+    def __init__(self, parent, controller):
+        """Initialize a searchable customer table that loads one page at a time
+        
+        Only the pages scrolled into view are inserted into the Treeview, so the
+        table opens instantly however many customers there are.
+        
+        Args:
+            parent: The parent widget that will contain this frame.
+            controller: Controller serving directory pages.
+        """
+        super().__init__(parent)
+        self.controller = controller
+        self.next_after = None
+        self.loading = False
+        self.pending_load = None  # after_idle id of a page load already scheduled
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        # Search bar
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind('<KeyRelease>', lambda event: self.refresh())
+        
+        self.field_var = tk.StringVar(value="Name")
+        field_cb = ttk.Combobox(search_frame, textvariable=self.field_var, width=10,
+                                values=list(self.FIELDS), state="readonly")
+        field_cb.pack(side=tk.LEFT, padx=5)
+        field_cb.bind('<<ComboboxSelected>>', lambda event: self.refresh())
+        
+        ttk.Label(search_frame, text="Sort by:").pack(side=tk.LEFT, padx=(15, 0))
+        self.sort_var = tk.StringVar(value="Name")
+        sort_cb = ttk.Combobox(search_frame, textvariable=self.sort_var, width=12,
+                               values=list(self.SORTS), state="readonly")
+        sort_cb.pack(side=tk.LEFT, padx=5)
+        sort_cb.bind('<<ComboboxSelected>>', lambda event: self.refresh())
+        
+        self.count_label = ttk.Label(search_frame, text="")
+        self.count_label.pack(side=tk.RIGHT)
+        
+        # Table
+        table_frame = ttk.Frame(self)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.tree = ttk.Treeview(table_frame, columns=self.HEADERS, show="headings")
+        for header in self.HEADERS:
+            self.tree.heading(header, text=header, anchor="w")
+            self.tree.column(header, anchor="w", stretch=True, width=200 if header == "Address" else 100)
+        
+        self.scroll_y = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.config(yscrollcommand=self._on_scroll)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+    def refresh(self):
+        """Reload the table from the first page for the current search and sort"""
+        if self.pending_load is not None:
+            self.after_cancel(self.pending_load)
+            self.pending_load = None
+        self.tree.delete(*self.tree.get_children())
+        self.next_after = None
+        self.load_page(first=True)
+
+    def load_page(self, first=False):
+        """Append the next page of customers to the table"""
+        self.pending_load = None
+        if self.loading or (not first and self.next_after is None):
+            return
+        self.loading = True
+        try:
+            page = self.controller.staff_search_customers(
+                self.search_var.get().strip(), self.FIELDS[self.field_var.get()],
+                self.SORTS[self.sort_var.get()], self.next_after)
+            if isinstance(page, str):
+                self.count_label.config(text=page)
+                return
+            for row in page.rows:
+                self.tree.insert("", "end", values=(
+                    row.cust_id, row.name, row.username, row.address,
+                    f"${row.balance:.2f}", f"${row.max_owing:.2f}",
+                    "Corporate" if row.corporate else "Private",
+                    row.stats.orders, f"${row.stats.spend:.2f}", f"${row.stats.average_basket:.2f}",
+                    row.stats.last_order or "N/A"))
+            self.next_after = page.next_after
+            self.count_label.config(text=f"Showing {len(self.tree.get_children())} of {page.total}")
+        finally:
+            self.loading = False
+
+    def _on_scroll(self, first, last):
+        """Update the scrollbar and fetch the next page near the bottom of the table"""
+        self.scroll_y.set(first, last)
+        # Scroll events arrive in bursts; schedule at most one load until it has run
+        if float(last) > 0.9 and self.next_after is not None and self.pending_load is None:
+            self.pending_load = self.after_idle(self.load_page)
+
 class StaffHome:
     def __init__(self, root, staff, controller):
         """Initialize Staff Home window"""
@@ -351,9 +458,13 @@ class StaffHome:
             "All Products": lambda: self.show_text_content("All Products", self.controller.staff_all_products()),
             "Current Orders": lambda: self.show_treeview_content("Current Orders", self.get_current_orders_data(), True),
             "Previous Orders": lambda: self.show_treeview_content("Previous Orders", self.get_previous_orders_data(), False),
-            "All Customers": lambda: self.show_text_content("All Customers", self.controller.staff_all_customers()),
+            "All Customers": lambda: self.staff_customer_directory(),
             "Sales Report": lambda: self.staff_sales_reports(),
-            "Popular Items": lambda: self.show_text_content("Popular Items", self.controller.staff_popular_items())
+            "Popular Items": lambda: self.show_text_content("Popular Items", self.controller.staff_popular_items()),
+            "Trending Items": lambda: self.show_text_content("Trending Items", self.controller.staff_trending_items()),
+            "Demand Forecast": lambda: self.show_text_content("Demand Forecast", self.controller.staff_demand_forecast()),
+            "Customer Spend": lambda: self.show_text_content("Customer Spend", self.controller.staff_customer_spend()),
+            "Price Audit": lambda: self.show_text_content("Price Audit", self.controller.staff_price_audit())
         }
 
         for text, command in self.function_buttons.items():
@@ -400,11 +511,19 @@ class StaffHome:
                         order["Items"], order["Subtotal"], order["Delivery Fee"], order["Total Amount"]))
         return headers, data
 
+    def _clear_display(self):
+        """Destroy the widgets of the previous view so they do not pile up"""
+        for widget in self.display_frame.winfo_children():
+            widget.destroy()
+        self.current_treeview = None
+        self.report_frame = None
+        self.report_text = None
+        self.date_selection = None
+
     def show_text_content(self, title, content):
         """Display content in text widget"""
         try:
-            for widget in self.display_frame.winfo_children():
-                widget.pack_forget()
+            self._clear_display()
             
             ttk.Label(
                 self.display_frame,
@@ -446,8 +565,7 @@ class StaffHome:
     def show_treeview_content(self, title, data, editable=False):
         """Display content in treeview"""
         try:
-            for widget in self.display_frame.winfo_children():
-                widget.pack_forget()
+            self._clear_display()
             
             # Title container
             title_frame = ttk.Frame(self.display_frame)
@@ -476,12 +594,27 @@ class StaffHome:
         except Exception as e:
             messagebox.showerror("Error", f"Error displaying content: {str(e)}")
 
+    def staff_customer_directory(self):
+        """Display the searchable customer directory"""
+        try:
+            self._clear_display()
+            
+            ttk.Label(
+                self.display_frame,
+                text="All Customers",
+                font=('Helvetica', 14, 'bold')
+            ).pack(anchor=tk.W, pady=(0, 10))
+            
+            CustomerDirectoryFrame(self.display_frame, self.controller).pack(fill=tk.BOTH, expand=True)
+
+        except Exception as e:
+            messagebox.showerror("Error", f"Error displaying customers: {str(e)}")
+
     def staff_sales_reports(self):
         """Display sales report with date selection"""
         try:
             # Clear existing content
-            for widget in self.display_frame.winfo_children():
-                widget.pack_forget()
+            self._clear_display()
             
             # Title
             ttk.Label(
@@ -490,41 +623,39 @@ class StaffHome:
                 font=('Helvetica', 14, 'bold')
             ).pack(pady=(0, 10))
             
-            # Create date selection frame if it doesn't exist
-            if not self.date_selection:
-                self.date_selection = SalesReportFrame(self.display_frame, self.update_sales_report)
+            # Create date selection frame
+            self.date_selection = SalesReportFrame(self.display_frame, self.update_sales_report)
             self.date_selection.pack(fill=tk.X)
             
             # Add separator between date selection and report
             ttk.Separator(self.display_frame, orient='horizontal').pack(fill=tk.X, pady=10)
             
-            # Create report frame if it doesn't exist
-            if not self.report_frame:
-                self.report_frame = ttk.Frame(self.display_frame)
-                
-                # Create text widget with scrollbars for report content
-                text_container = ttk.Frame(self.report_frame)
-                text_container.pack(fill=tk.BOTH, expand=True)
-                
-                v_scrollbar = ttk.Scrollbar(text_container)
-                v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-                
-                h_scrollbar = ttk.Scrollbar(text_container, orient=tk.HORIZONTAL)
-                h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
-                
-                self.report_text = tk.Text(
-                    text_container,
-                    wrap=tk.NONE,
-                    width=50,
-                    height=20,
-                    yscrollcommand=v_scrollbar.set,
-                    xscrollcommand=h_scrollbar.set,
-                    font=('Helvetica', 10)
-                )
-                self.report_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
-                
-                v_scrollbar.config(command=self.report_text.yview)
-                h_scrollbar.config(command=self.report_text.xview)
+            # Create report frame
+            self.report_frame = ttk.Frame(self.display_frame)
+            
+            # Create text widget with scrollbars for report content
+            text_container = ttk.Frame(self.report_frame)
+            text_container.pack(fill=tk.BOTH, expand=True)
+            
+            v_scrollbar = ttk.Scrollbar(text_container)
+            v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            
+            h_scrollbar = ttk.Scrollbar(text_container, orient=tk.HORIZONTAL)
+            h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+            
+            self.report_text = tk.Text(
+                text_container,
+                wrap=tk.NONE,
+                width=50,
+                height=20,
+                yscrollcommand=v_scrollbar.set,
+                xscrollcommand=h_scrollbar.set,
+                font=('Helvetica', 10)
+            )
+            self.report_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+            
+            v_scrollbar.config(command=self.report_text.yview)
+            h_scrollbar.config(command=self.report_text.xview)
             
             self.report_frame.pack(fill=tk.BOTH, expand=True)
             
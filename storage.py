@@ -0,0 +1,311 @@
+import logging
+import os
+import pickle
+import shutil
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Tuple
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, writes are still version-checked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Every store ends with a footer after the pickled data: magic + version number + CRC32
+# of the pickled bytes. pickle.load stops at the end of the pickle, so a plain load
+# still reads the data. Stores written before checksums have the shorter v1 footer.
+_FOOTER = struct.Struct('>8sQI')
+_MAGIC = b'VEGSTOR2'
+_FOOTER_V1 = struct.Struct('>8sQ')
+_MAGIC_V1 = b'VEGSTOR1'
+PREVIOUS_GENERATION = '.prev'
+MAX_RETRIES = 5
+
+class StoreConflict(Exception):
+    """Raised when a store changed on disk since it was read"""
+
+class StoreCorrupt(Exception):
+    """Raised when neither generation of a store passes its checksum"""
+
+# Locks held by the current thread, so nested file_lock calls on the same store don't deadlock
+_held = threading.local()
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """Hold an flock on path + '.lock' for the duration of the block
+
+    Re-entering the lock for a store this thread already holds (in either mode) is a no-op.
+
+    Args:
+        path (str): Store the lock protects
+        shared (bool): True for a read lock, False for an exclusive write lock
+    """
+    held = _held.__dict__.setdefault('paths', set())
+    if path in held:
+        yield
+        return
+    with open(path + '.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+def _parse(raw: bytes) -> Tuple[bytes, int, bool]:
+    """Split a store file into its pickled bytes and version
+
+    Returns:
+        Tuple[bytes, int, bool]: (payload, version, intact); stores without a checksum
+            count as intact if they unpickle
+    """
+    if len(raw) >= _FOOTER.size:
+        magic, version, checksum = _FOOTER.unpack(raw[-_FOOTER.size:])
+        if magic == _MAGIC:
+            payload = raw[:-_FOOTER.size]
+            return payload, version, zlib.crc32(payload) == checksum
+    if len(raw) >= _FOOTER_V1.size:
+        magic, version = _FOOTER_V1.unpack(raw[-_FOOTER_V1.size:])
+        if magic == _MAGIC_V1:
+            return raw[:-_FOOTER_V1.size], version, True
+    return raw, 0, True
+
+def _load_generation(path: str) -> Tuple[Any, int]:
+    """Load one generation of a store, raising StoreCorrupt if it is damaged"""
+    with open(path, 'rb') as file:
+        raw = file.read()
+    payload, version, intact = _parse(raw)
+    if not intact:
+        raise StoreCorrupt(f"{path} failed its checksum")
+    try:
+        return pickle.loads(payload), version
+    except Exception as e:
+        raise StoreCorrupt(f"{path} could not be unpickled: {e}")
+
+def _load_verified(path: str) -> Tuple[Any, int]:
+    """Load the current generation of a store, or the previous one if it is damaged"""
+    try:
+        return _load_generation(path)
+    except StoreCorrupt as e:
+        previous = path + PREVIOUS_GENERATION
+        if not os.path.exists(previous):
+            raise
+        logger.warning("%s; using previous generation", e)
+        return _load_generation(previous)
+
+def _verified_version(path: str) -> int:
+    """Return the version of the generation a reader would load, checking checksums but not unpickling"""
+    for generation in (path, path + PREVIOUS_GENERATION):
+        if os.path.exists(generation):
+            with open(generation, 'rb') as file:
+                _, version, intact = _parse(file.read())
+            if intact:
+                return version
+    raise StoreCorrupt(f"{path} and its previous generation failed their checksums")
+
+def store_version(path: str) -> int:
+    """Return the current version of a store, 0 if it does not exist"""
+    if not os.path.exists(path):
+        return 0
+    with file_lock(path, shared=True):
+        return _verified_version(path)
+
+def footer_version(path: str) -> int:
+    """Return the version in a store's footer without reading the rest of the file
+
+    Unlike store_version, the checksum is not verified, so this is cheap enough to
+    run over many stores at startup. Returns 0 for a missing store or one without
+    a footer.
+    """
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        for footer, magic in ((_FOOTER, _MAGIC), (_FOOTER_V1, _MAGIC_V1)):
+            if size > footer.size:
+                file.seek(size - footer.size)
+                fields = footer.unpack(file.read(footer.size))
+                if fields[0] == magic:
+                    return fields[1]
+    return 0
+
+def read_store(path: str, default_factory: Callable[[], Any] = dict) -> Tuple[Any, int]:
+    """Load a store together with its version, verifying its checksum
+
+    Args:
+        path (str): Pickle store
+        default_factory (Callable): Builds the data for a store that does not exist yet
+
+    Returns:
+        Tuple[Any, int]: (data, version)
+
+    Raises:
+        StoreCorrupt: If neither the current nor the previous generation is intact
+    """
+    if not os.path.exists(path):
+        return default_factory(), 0
+    with file_lock(path, shared=True):
+        return _load_verified(path)
+
+def load_store(path: str, default_factory: Callable[[], Any] = dict) -> Any:
+    """Load a store's data, verifying its checksum; see read_store"""
+    return read_store(path, default_factory)[0]
+
+def _atomic_write(path: str, data: Any, version: int):
+    """Write a new generation of a store without ever truncating the live file
+
+    The data goes to a temp file that is fsynced and renamed over the store, so a
+    crash leaves either the old or the new file in place. The replaced file is kept
+    as the previous generation.
+    """
+    payload = pickle.dumps(data)
+    temp_file = path + '.tmp'
+    with open(temp_file, 'wb') as file:
+        file.write(payload)
+        file.write(_FOOTER.pack(_MAGIC, version, zlib.crc32(payload)))
+        file.flush()
+        os.fsync(file.fileno())
+    if os.path.exists(path):
+        previous = path + PREVIOUS_GENERATION
+        if os.path.exists(previous):
+            os.remove(previous)
+        try:
+            os.link(path, previous)
+        except OSError:  # File systems without hard links
+            shutil.copy2(path, previous)
+    os.replace(temp_file, path)
+    _fsync_dir(path)
+
+def _fsync_dir(path: str):
+    """Make a rename in path's directory durable"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_store(path: str, data: Any, expected_version: int) -> int:
+    """Write a store if nobody else has written it since expected_version was read
+
+    Args:
+        path (str): Pickle store
+        data (Any): Data to write
+        expected_version (int): Version the data was based on
+
+    Returns:
+        int: The new version
+
+    Raises:
+        StoreConflict: If the store is no longer at expected_version
+    """
+    with file_lock(path):
+        current = _verified_version(path) if os.path.exists(path) else 0
+        if current != expected_version:
+            raise StoreConflict(f"{path} is at version {current}, expected {expected_version}")
+        version = current + 1
+        _atomic_write(path, data, version)
+        return version
+
+def save_store(path: str, data: Any) -> int:
+    """Write a store unconditionally, for stores with a single writer
+
+    Args:
+        path (str): Pickle store
+        data (Any): Data to write
+
+    Returns:
+        int: The new version
+    """
+    with file_lock(path):
+        current = 0
+        if os.path.exists(path):
+            try:
+                current = _verified_version(path)
+            except StoreCorrupt:
+                pass  # Replaced below
+        _atomic_write(path, data, current + 1)
+        return current + 1
+
+def update_store(path: str, mutate: Callable[[Any], Any],
+                 default_factory: Callable[[], Any] = dict,
+                 retries: int = MAX_RETRIES) -> Any:
+    """Read-modify-write a store with optimistic concurrency
+
+    mutate is applied to freshly loaded data. If another process wrote the store in
+    the meantime, the write is rejected and mutate is applied again to the new data,
+    so concurrent writers never overwrite each other's changes.
+
+    Args:
+        path (str): Pickle store
+        mutate (Callable[[Any], Any]): Changes the data in place; its return value is passed back
+        default_factory (Callable): Builds the data for a store that does not exist yet
+        retries (int): Attempts before giving up
+
+    Returns:
+        Any: What mutate returned on the attempt that was written
+
+    Raises:
+        StoreConflict: If every attempt lost to another writer
+    """
+    for _ in range(retries):
+        data, version = read_store(path, default_factory)
+        result = mutate(data)
+        try:
+            write_store(path, data, version)
+            return result
+        except StoreConflict:
+            continue
+    raise StoreConflict(f"Gave up writing {path} after {retries} conflicting attempts")
+
+def _read_footer_magic(path: str) -> bytes:
+    """Return the footer magic a store file ends with, or None; reads only the footer"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        for footer, magic in ((_FOOTER, _MAGIC), (_FOOTER_V1, _MAGIC_V1)):
+            # A footer with nothing before it cannot be a complete store
+            if size > footer.size:
+                file.seek(size - footer.size)
+                if footer.unpack(file.read(footer.size))[0] == magic:
+                    return magic
+    return None
+
+def _looks_intact(path: str) -> bool:
+    """Cheap startup check from the footer and length alone
+
+    A store without a footer is only suspicious when its previous generation has one,
+    since stores written before footers existed have none. Checksums are verified
+    when a store is first read, which falls back to the previous generation.
+    """
+    if _read_footer_magic(path) is not None:
+        return True
+    previous = path + PREVIOUS_GENERATION
+    return not (os.path.exists(previous) and _read_footer_magic(previous) is not None)
+
+def verify_stores(paths: Iterable[str]) -> None:
+    """Check every store's footer at startup, restoring the previous generation of any damaged one
+
+    Only footers and lengths are read, so startup does not grow with the data; full
+    checksums are verified lazily by read_store.
+
+    Args:
+        paths (Iterable[str]): Stores to check; missing stores are skipped
+    """
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with file_lock(path):
+            if _looks_intact(path):
+                continue
+            previous = path + PREVIOUS_GENERATION
+            logger.warning("%s is truncated or damaged; restored previous generation", path)
+            shutil.copy2(previous, path + '.tmp')
+            os.replace(path + '.tmp', path)
+            _fsync_dir(path)
@@ -0,0 +1,49 @@
+import os
+import sys
+from decimal import Decimal
+import pytest
+
+# The modules live flat in the project directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import Customer, DeliveryMethod, Order, OrderStatus
+from order_events import record_checkout
+from order_store import save_order
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Run every test in an empty project directory, since store paths are relative to it"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    return tmp_path / 'data'
+
+@pytest.fixture
+def make_customer():
+    """Build customers; max_owing defaults to the private customer limit"""
+    def make(cust_id, name="Ann Lee", max_owing='100.00'):
+        first_name, last_name = name.split()
+        return Customer(first_name, last_name, cust_id.lower(), "secret", "5 Main St",
+                        Decimal('0.00'), Decimal(max_owing), cust_id)
+    return make
+
+@pytest.fixture
+def make_order():
+    """Build priced orders from model items"""
+    def make(customer, order_date, *items, status=OrderStatus.PENDING):
+        for item in items:
+            item.calculate_total()
+        order = Order(customer, order_date, DeliveryMethod.PICKUP)
+        order.set_items(list(items))
+        order.order_status = status
+        return order
+    return make
+
+@pytest.fixture
+def place_order(make_order):
+    """Save and journal orders the way checkout does"""
+    def place(customer, order_date, *items):
+        order = make_order(customer, order_date, *items)
+        save_order(order)
+        record_checkout(order)
+        return order
+    return place
@@ -0,0 +1,67 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+import analytics
+from analytics import AnalyticsEngine
+from model import UnitPriceVeggie
+from order_lines import open_order_lines
+
+START = date(2024, 5, 1)
+VEGGIES = {'Kale': '1.20', 'Carrot': '2.50', 'Leek': '3.00', 'Onion': '0.80'}
+
+@pytest.fixture
+def history(make_customer, place_order):
+    """Sixty random orders over two months; returns the placed orders"""
+    generator = random.Random(3)
+    customers = [make_customer(f'C{number}') for number in range(4)]
+    orders = []
+    for _ in range(60):
+        names = generator.sample(sorted(VEGGIES), generator.randint(1, 3))
+        orders.append(place_order(generator.choice(customers), START + timedelta(days=generator.randrange(60)),
+                                  *(UnitPriceVeggie(name, generator.randint(1, 5), Decimal(VEGGIES[name]))
+                                    for name in names)))
+    return orders
+
+def test_python_path_matches_the_orders(history):
+    spend, by_day = {}, {}
+    for order in history:
+        spend[order.cust_id] = spend.get(order.cust_id, 0) + order.subtotal.cents
+        by_day[order.order_date] = by_day.get(order.order_date, 0) + order.subtotal.cents
+    sold = {}
+    for order in history:
+        for item in order.list_of_items:
+            sold[item.item_name] = sold.get(item.item_name, 0) + item.quantity * 1000
+
+    with open_order_lines() as lines:
+        engine = AnalyticsEngine(lines, use_numpy=False)
+        assert dict(engine.customer_spend()) == spend
+        assert engine.revenue_by_day(START, START + timedelta(days=59)) == sorted(by_day.items())
+        veggies, boxes = engine.popular_products()
+        assert dict(veggies) == sold and boxes == []
+
+def test_numpy_path_matches_python(history):
+    pytest.importorskip('numpy')
+    first, last = START + timedelta(days=10), START + timedelta(days=45)
+    with open_order_lines() as lines:
+        python = AnalyticsEngine(lines, use_numpy=False)
+        vectorized = AnalyticsEngine(lines, use_numpy=True)
+        for report in ('popular_products', 'sku_quantities', 'customer_spend'):
+            assert getattr(vectorized, report)() == getattr(python, report)()
+        assert vectorized.revenue_by_day(first, last) == python.revenue_by_day(first, last)
+        assert vectorized.revenue_by_week(first, last) == python.revenue_by_week(first, last)
+
+def test_row_ranges_partition_the_work(history):
+    with open_order_lines() as lines:
+        middle = len(lines) // 2
+        halves = [AnalyticsEngine(lines, use_numpy=False, rows=rows).sku_quantities()
+                  for rows in (range(0, middle), range(middle, len(lines)))]
+        merged = {sku: halves[0].get(sku, 0) + halves[1].get(sku, 0) for sku in set(halves[0]) | set(halves[1])}
+        assert merged == AnalyticsEngine(lines, use_numpy=False).sku_quantities()
+
+def test_numpy_path_needs_numpy(history, monkeypatch):
+    monkeypatch.setattr(analytics, 'np', None)
+    with open_order_lines() as lines:
+        with pytest.raises(ImportError):
+            AnalyticsEngine(lines, use_numpy=True)
+        assert not AnalyticsEngine(lines).use_numpy
@@ -0,0 +1,59 @@
+from decimal import Decimal
+import pytest
+import credit_ledger
+from credit_ledger import CreditLedger
+from identity_map import CustomerIdentityMap
+from money import Money
+
+JOURNAL = 'data/credit_ledger.log'
+
+@pytest.fixture
+def customers(monkeypatch, make_customer):
+    customers = CustomerIdentityMap()
+    monkeypatch.setattr(credit_ledger, 'customer_map', lambda: customers)
+    customers.commit(customers.register(make_customer('C1', max_owing='100.00')))
+    return customers
+
+def test_reserve_holds_credit_until_released(customers):
+    ledger = CreditLedger(JOURNAL)
+    first = ledger.reserve('C1', Money(6000))
+    assert first is not None
+    assert ledger.reserve('C1', Money(5000)) is None  # 60 + 50 is over the limit
+    ledger.release(first)
+    ledger.release(first)  # Releasing twice does nothing
+    assert ledger.reserve('C1', Money(5000)) is not None
+
+def test_reserve_unknown_customer(customers):
+    ledger = CreditLedger(JOURNAL)
+    assert ledger.reserve('NOBODY', Money(100)) is None
+    assert ledger.balance('NOBODY') is None
+
+def test_commit_charges_balance_and_journals_it(customers):
+    ledger = CreditLedger(JOURNAL)
+    reservation = ledger.reserve('C1', Money(4000))
+    assert ledger.commit(reservation) == Money(4000)
+    assert ledger.balance('C1') == Money(4000)
+    assert customers.get('C1').cust_balance == Decimal('40.00')
+    assert not ledger.can_reserve('C1', Money(6001))
+    assert ledger.can_reserve('C1', Money(6000))
+    with pytest.raises(ValueError):
+        ledger.commit(reservation)  # Already closed
+
+def test_refund_reverses_a_charge(customers):
+    ledger = CreditLedger(JOURNAL)
+    ledger.commit(ledger.reserve('C1', Money(2500)))
+    assert ledger.refund('C1', Money(2500)) == Money(0)
+    assert ledger.balance('C1') == Money(0)
+
+def test_commit_rechecks_charges_journalled_by_another_ledger(customers):
+    till_1, till_2 = CreditLedger(JOURNAL), CreditLedger(JOURNAL)
+    held = till_1.reserve('C1', Money(7000))
+    till_2.commit(till_2.reserve('C1', Money(7000)))
+    assert till_1.commit(held) is None
+    assert till_1.balance('C1') == Money(7000)
+
+def test_new_ledger_replays_the_journal(customers):
+    ledger = CreditLedger(JOURNAL)
+    ledger.commit(ledger.reserve('C1', Money(1234)))
+    ledger.commit(ledger.reserve('C1', Money(1000)))
+    assert CreditLedger(JOURNAL).balance('C1') == Money(2234)
@@ -0,0 +1,54 @@
+from datetime import date
+import pytest
+import customer_directory
+from customer_directory import CustomerDirectory
+from customer_stats import CustomerStats
+from identity_map import CustomerIdentityMap
+
+NAMES = [('Ann', 'Lee'), ('Bob', 'Stone'), ('Cara', 'Lee'), ('Dan', 'Ng'), ('Eve', 'Adams'),
+         ('Finn', 'Lee'), ('Gus', 'Park')]
+
+@pytest.fixture
+def directory(monkeypatch, make_customer):
+    customers = CustomerIdentityMap()
+    for number, (first_name, last_name) in enumerate(NAMES):
+        customers.register(make_customer(f'C{number}', f"{first_name} {last_name}"))
+    stats = {'C3': CustomerStats(2, 1, 5000, date(2024, 1, 1), date(2024, 2, 1)),
+             'C5': CustomerStats(1, 0, 9000, date(2024, 3, 1), date(2024, 3, 1))}
+    monkeypatch.setattr(customer_directory, 'customer_map', lambda: customers)
+    monkeypatch.setattr(customer_directory, 'load_customer_stats', lambda: stats)
+    return CustomerDirectory()
+
+def all_pages(directory, **query):
+    rows, after = [], None
+    while True:
+        page = directory.page(after=after, limit=2, **query)
+        rows.extend(row.cust_id for row in page.rows)
+        if page.next_after is None:
+            return rows, page.total
+        after = page.next_after
+
+@pytest.mark.parametrize('sort', customer_directory.SORT_KEYS)
+def test_keyset_pages_cover_every_row_once(directory, sort):
+    rows, total = all_pages(directory, sort=sort)
+    assert total == len(NAMES)
+    assert rows == [row.cust_id for row in directory.page(sort=sort).rows]
+    assert len(set(rows)) == len(NAMES)
+
+def test_keyset_pages_of_a_search(directory):
+    rows, total = all_pages(directory, search='lee')
+    assert total == 3
+    assert rows == ['C0', 'C2', 'C5']  # Ann, Cara and Finn Lee by name
+
+def test_offset_jumps_to_a_page(directory):
+    assert [row.cust_id for row in directory.page(offset=2, limit=2).rows] == ['C2', 'C3']
+
+def test_sort_by_spend_and_last_order(directory):
+    assert [row.cust_id for row in directory.page(sort='spend', limit=2).rows] == ['C5', 'C3']
+    assert [row.cust_id for row in directory.page(sort='last_order', limit=2).rows] == ['C5', 'C3']
+
+def test_prefix_search_by_field(directory):
+    assert [row.cust_id for row in directory.page(search='st', field='name').rows] == ['C1']
+    assert directory.page(search='5 main', field='address').total == len(NAMES)
+    with pytest.raises(ValueError):
+        directory.page(field='password')
@@ -0,0 +1,60 @@
+from datetime import date
+from decimal import Decimal
+import pytest
+from customer_stats import CustomerStats, CustomerStatsStore
+from derived_store import DerivedStore
+from model import OrderStatus, UnitPriceVeggie
+from order_events import journal_size, record_fulfillment
+from order_store import update_order
+from storage import load_store
+
+SNAPSHOT = 'data/stats.snapshot.pkl'
+
+@pytest.fixture
+def placed(make_customer, place_order):
+    ann, bob = make_customer('C1'), make_customer('C2', "Bob Stone")
+    kale = lambda quantity: UnitPriceVeggie('Kale', quantity, Decimal('1.20'))
+    return [place_order(ann, date(2024, 5, 6), kale(2)),
+            place_order(ann, date(2024, 5, 13), kale(5)),
+            place_order(bob, date(2024, 6, 1), kale(1))]
+
+def fulfill(order):
+    update_order(order.order_number, lambda stored: setattr(stored, 'order_status', OrderStatus.FULFILLED))
+    order.order_status = OrderStatus.FULFILLED
+    record_fulfillment(order)
+
+def expected_stats(orders):
+    stats = {}
+    for order in orders:
+        stats[order.cust_id] = stats.get(order.cust_id, CustomerStats()).add_order(
+            order.order_date, order.sales_amount.cents)
+        if order.order_status == OrderStatus.FULFILLED:
+            stats[order.cust_id] = stats[order.cust_id]._replace(fulfilled=stats[order.cust_id].fulfilled + 1)
+    return stats
+
+def test_totals_follow_checkouts_and_fulfillments(placed):
+    store = CustomerStatsStore(SNAPSHOT)
+    assert store.current() == expected_stats(placed)
+    fulfill(placed[0])
+    assert store.current()['C1'].fulfilled == 1
+    assert store.current() == expected_stats(placed)
+    assert store.current()['C1'].average_basket.cents == (240 + 600) // 2
+
+def test_compact_and_rebuild_agree_with_the_journal(placed):
+    fulfill(placed[2])
+    CustomerStatsStore(SNAPSHOT).compact()
+    assert load_store(SNAPSHOT) == {'state': expected_stats(placed), 'offset': journal_size()}
+    CustomerStatsStore(SNAPSHOT).rebuild()
+    assert load_store(SNAPSHOT) == {'state': expected_stats(placed), 'offset': journal_size()}
+
+def test_reader_picks_up_a_rewritten_snapshot(placed, make_customer, place_order):
+    reader = CustomerStatsStore(SNAPSHOT)
+    reader.current()
+    CustomerStatsStore(SNAPSHOT).compact()
+    placed.append(place_order(make_customer('C3'), date(2024, 6, 2),
+                              UnitPriceVeggie('Leek', 1, Decimal('3.00'))))
+    assert reader.current() == expected_stats(placed)
+
+def test_stores_must_define_their_state():
+    with pytest.raises(TypeError):
+        DerivedStore(SNAPSHOT, "nothing")
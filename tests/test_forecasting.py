@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from forecasting import HISTORY_DAYS, MOVING_AVERAGE_DAYS, DemandForecaster
+from model import PremadeBox, UnitPriceVeggie
+from money import ZERO
+from order_events import checkout_event
+from order_lines import open_order_lines
+
+TODAY = date(2024, 6, 30)
+
+def boxes(quantity):
+    box = PremadeBox('Small Box', quantity, Decimal('10.00'))
+    box.set_content([UnitPriceVeggie('Leek', 2, ZERO)])
+    return box
+
+def forecasts(use_numpy=False):
+    with open_order_lines() as lines:
+        return {forecast.name: forecast for forecast in
+                DemandForecaster(lines, use_numpy=use_numpy).forecast(TODAY)}
+
+def test_box_contents_count_once_per_box(make_customer, make_order, place_order):
+    order = make_order(make_customer('C1'), TODAY, boxes(3))
+    box_line, leek_line = checkout_event(order).lines
+    assert (box_line.qty, leek_line.qty) == (3000, 6000)
+
+    place_order(make_customer('C1'), TODAY, boxes(3))
+    leek = forecasts()['Leek']
+    assert leek.moving_average == 6000 / MOVING_AVERAGE_DAYS
+
+def test_steady_demand_is_forecast_flat(make_customer, place_order):
+    ann = make_customer('C1')
+    for days_ago in range(HISTORY_DAYS):
+        place_order(ann, TODAY - timedelta(days=days_ago), UnitPriceVeggie('Kale', 2, Decimal('1.20')))
+    kale = forecasts()['Kale']
+    assert kale.moving_average == pytest.approx(2000)
+    assert kale.daily == pytest.approx((2000,) * 7)
+    assert kale.next_week == pytest.approx(14000)
+
+def test_numpy_fit_matches_python(make_customer, place_order):
+    pytest.importorskip('numpy')
+    ann = make_customer('C1')
+    for days_ago in range(0, 120, 3):
+        place_order(ann, TODAY - timedelta(days=days_ago),
+                    UnitPriceVeggie('Kale', days_ago % 5 + 1, Decimal('1.20')), boxes(days_ago % 2 + 1))
+    python, vectorized = forecasts(), forecasts(use_numpy=True)
+    assert python.keys() == vectorized.keys()
+    for name, forecast in python.items():
+        assert vectorized[name].moving_average == pytest.approx(forecast.moving_average)
+        assert vectorized[name].smoothed == pytest.approx(forecast.smoothed)
+        assert vectorized[name].daily == pytest.approx(forecast.daily)
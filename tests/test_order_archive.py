@@ -0,0 +1,61 @@
+import pickle
+from datetime import date
+from decimal import Decimal
+import pytest
+import order_archive
+from model import OrderStatus, Staff, UnitPriceVeggie
+from order_archive import (archive_fulfilled_orders, archived_months, load_archive_month,
+                           load_orders, load_orders_by_ref)
+from order_store import load_hot_orders, order_ref, partition_months, save_order
+
+TODAY = date(2024, 9, 1)
+
+@pytest.fixture
+def save(make_customer, make_order):
+    customer = make_customer('C1')
+    def save(order_date, status=OrderStatus.FULFILLED):
+        order = make_order(customer, order_date, UnitPriceVeggie('Kale', 1, Decimal('2.00')), status=status)
+        save_order(order)
+        return order.order_number
+    return save
+
+def test_archive_moves_only_old_fulfilled_orders(save):
+    old = save(date(2024, 3, 5))
+    pending = save(date(2024, 3, 9), OrderStatus.PENDING)
+    recent = save(date(2024, 8, 20))
+
+    assert archive_fulfilled_orders(max_age_days=90, today=TODAY) == 1
+    assert set(load_archive_month('2024-03')) == {old}
+    assert set(load_hot_orders()) == {pending, recent}
+    assert archive_fulfilled_orders(max_age_days=90, today=TODAY) == 0
+
+def test_archived_orders_load_like_hot_ones(save):
+    numbers = [save(date(2024, 3, 5)), save(date(2024, 8, 20))]
+    before = load_orders()
+    refs = [order_ref(order) for order in before.values()]
+    archive_fulfilled_orders(max_age_days=0, today=TODAY)
+
+    after = load_orders()
+    assert partition_months() == [] and archived_months() == ['2024-03', '2024-08']
+    for number in numbers:
+        assert pickle.dumps(after[number]) == pickle.dumps(before[number])
+    assert load_orders_by_ref(refs).keys() == set(numbers)
+    assert set(load_orders(date(2024, 8, 1))) == {numbers[1]}
+
+def test_emptied_hot_partition_is_dropped(save):
+    save(date(2024, 3, 5))
+    save(date(2024, 4, 1), OrderStatus.PENDING)
+    archive_fulfilled_orders(max_age_days=0, today=TODAY)
+    assert partition_months() == ['2024-04']
+
+def test_previous_orders_open_only_recent_archive_months(save, monkeypatch):
+    old, recent = save(date(2023, 1, 5)), save(date(2024, 8, 20))
+    archive_fulfilled_orders(max_age_days=0, today=TODAY)
+    opened, load_archive_month = [], order_archive.load_archive_month
+    monkeypatch.setattr(order_archive, 'load_archive_month',
+                        lambda month: opened.append(month) or load_archive_month(month))
+
+    staff = Staff("Sam", "Hill", "sam", "secret", "Sales", TODAY, "S1")
+    assert set(staff.show_previous_orders(since=date(2024, 6, 1))) == {recent}
+    assert opened == ['2024-08']
+    assert set(staff.show_previous_orders(since=date(2022, 1, 1))) == {old, recent}
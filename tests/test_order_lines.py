@@ -0,0 +1,47 @@
+from datetime import date
+from decimal import Decimal
+from model import PremadeBox, UnitPriceVeggie, WeightedVeggie
+from money import ZERO
+from order_events import NO_PARENT
+from order_lines import META_FILE, open_order_lines, rebuild_order_lines
+from storage import load_store
+
+def small_box(quantity):
+    box = PremadeBox('Small Box', quantity, Decimal('10.00'))
+    box.set_content([UnitPriceVeggie('Leek', 1, ZERO), WeightedVeggie('Kale', Decimal('0.5'), ZERO)])
+    return box
+
+def columns(lines):
+    return {name: list(lines[name]) for name in lines.columns}
+
+def test_lines_are_folded_from_the_journal_on_open(make_customer, place_order):
+    ann = make_customer('C1')
+    place_order(ann, date(2024, 5, 6), UnitPriceVeggie('Carrot', 2, Decimal('2.50')))
+    with open_order_lines() as lines:
+        assert len(lines) == 1
+    place_order(ann, date(2024, 5, 7), small_box(1))
+    with open_order_lines(use_mmap=False) as lines:
+        assert len(lines) == 4
+        assert lines.skus == ['Carrot', 'Small Box', 'Leek', 'Kale']
+    assert load_store(META_FILE)['rows'] == 4
+
+def test_box_contents_point_at_their_box(make_customer, place_order):
+    place_order(make_customer('C1'), date(2024, 5, 6),
+                UnitPriceVeggie('Carrot', 2, Decimal('2.50')), small_box(1))
+    with open_order_lines() as lines:
+        box_row = lines.skus.index('Small Box')
+        assert list(lines['parent']) == [NO_PARENT, NO_PARENT, box_row, box_row]
+        assert list(lines['cents']) == [500, 1000, 0, 0]
+        assert list(lines['qty']) == [2000, 1000, 1000, 500]
+
+def test_rebuild_matches_the_folded_lines(make_customer, place_order):
+    ann, bob = make_customer('C1'), make_customer('C2', "Bob Stone")
+    place_order(ann, date(2024, 5, 6), UnitPriceVeggie('Carrot', 2, Decimal('2.50')))
+    place_order(bob, date(2024, 5, 8), small_box(1))
+    place_order(ann, date(2024, 6, 1), UnitPriceVeggie('Kale', 1, Decimal('1.20')))
+    with open_order_lines() as lines:
+        folded, skus, customers = columns(lines), list(lines.skus), list(lines.customers)
+
+    assert rebuild_order_lines() == len(folded['day'])
+    with open_order_lines() as lines:
+        assert (columns(lines), lines.skus, lines.customers) == (folded, skus, customers)
@@ -0,0 +1,65 @@
+import os
+from datetime import date
+from decimal import Decimal
+import pytest
+from model import OrderStatus, UnitPriceVeggie
+from order_store import (MANIFEST_FILE, ensure_manifest, load_hot_orders, load_pending_orders,
+                         manifest_is_stale, month_key, months_overlapping, partition_months,
+                         partition_path, read_manifest, remove_orders, save_order, update_order)
+from storage import footer_version, load_store, save_store
+
+DAYS = [date(2024, 4, 30), date(2024, 5, 1), date(2024, 5, 20)]
+
+@pytest.fixture
+def orders(make_customer, make_order):
+    customer = make_customer('C1')
+    orders = [make_order(customer, day, UnitPriceVeggie('Kale', 1, Decimal('2.00'))) for day in DAYS]
+    for order in orders:
+        save_order(order)
+    return orders
+
+def test_manifest_describes_every_partition(orders):
+    manifest = read_manifest()
+    for month in partition_months():
+        days = [order.order_date.toordinal() for order in orders if month_key(order.order_date) == month]
+        info = manifest['partitions'][month]
+        assert (info.first_day, info.last_day, info.rows) == (min(days), max(days), len(days))
+        assert info.version == footer_version(partition_path(month))
+    assert manifest['pending'] == {order.order_number: month_key(order.order_date) for order in orders}
+    assert not manifest_is_stale()
+
+def test_date_range_opens_only_overlapping_months(orders):
+    assert months_overlapping(date(2024, 5, 2)) == ['2024-05']
+    assert months_overlapping(end_date=date(2024, 4, 30)) == ['2024-04']
+    assert set(load_hot_orders(date(2024, 5, 2))) == {order.order_number for order in orders[1:]}
+
+def test_fulfilled_order_is_no_longer_pending(orders):
+    fulfill = lambda order: setattr(order, 'order_status', OrderStatus.FULFILLED)
+    assert update_order(orders[1].order_number, fulfill)
+    assert not update_order(orders[1].order_number, fulfill)
+    assert orders[1].order_number not in load_pending_orders()
+    assert load_hot_orders()[orders[1].order_number].order_status == OrderStatus.FULFILLED
+
+def test_emptied_partition_is_deleted(orders):
+    remove_orders('2024-04', [orders[0].order_number])
+    assert not os.path.exists(partition_path('2024-04'))
+    assert '2024-04' not in read_manifest()['partitions']
+    assert orders[0].order_number not in read_manifest()['pending']
+
+def test_partition_written_without_its_manifest_update_is_repaired(orders):
+    # As if save_order crashed between the partition and the manifest write
+    partition = load_store(partition_path('2024-05'))
+    del partition[orders[2].order_number]
+    save_store(partition_path('2024-05'), partition)
+    assert manifest_is_stale()
+
+    ensure_manifest()
+    assert not manifest_is_stale()
+    assert read_manifest()['partitions']['2024-05'].rows == 1
+    assert orders[2].order_number not in load_pending_orders()
+
+def test_lost_manifest_is_rebuilt(orders):
+    manifest = read_manifest()
+    os.remove(MANIFEST_FILE)
+    ensure_manifest()
+    assert read_manifest() == manifest
@@ -0,0 +1,25 @@
+from datetime import date
+from decimal import Decimal
+from model import UnitPriceVeggie
+from recommendations import Recommender
+
+DAY = date(2024, 5, 6)
+
+def basket(*names):
+    return [UnitPriceVeggie(name, 1, Decimal('1.00')) for name in names]
+
+def test_suggestions_rank_by_share_of_orders_together(make_customer, place_order):
+    ann = make_customer('C1')
+    for names in (('Kale', 'Leek'), ('Kale', 'Leek'), ('Kale', 'Onion'), ('Carrot', 'Onion')):
+        place_order(ann, DAY, *basket(*names))
+    recommender = Recommender('data/cooccurrence.pkl')
+    suggestions = recommender.suggest(['Kale'])
+    assert [name for name, _ in suggestions] == ['Leek', 'Onion']
+    assert [round(score, 3) for _, score in suggestions] == [0.667, 0.333]
+    # Onion goes with both cart items; Kale and Carrot are already in the cart
+    assert recommender.suggest(['Kale', 'Carrot'])[0] == ('Onion', 1 / 3 + 1.0)
+    assert recommender.suggest(['Kale', 'Leek', 'Onion', 'Carrot']) == []
+
+def test_unknown_items_have_no_suggestions(make_customer, place_order):
+    place_order(make_customer('C1'), DAY, *basket('Kale', 'Leek'))
+    assert Recommender('data/cooccurrence.pkl').suggest(['Turnip'], k=3) == []
@@ -0,0 +1,49 @@
+from datetime import date
+from decimal import Decimal
+import pytest
+from model import Payment, UnitPriceVeggie
+from reconcile import Reconciler
+
+DAY = date(2024, 5, 6)
+
+@pytest.fixture
+def orders(make_customer, make_order):
+    ann = make_customer('C1')
+    return {order.order_number: order for order in (
+        make_order(ann, DAY, UnitPriceVeggie('Kale', 2, Decimal('1.20'))),
+        make_order(ann, DAY, UnitPriceVeggie('Kale', 2, Decimal('1.20'))))}
+
+def payment(amount='2.40', day=DAY, cust_id='C1', order_number=None):
+    return Payment(payment_amount=Decimal(amount), payment_date=day,
+                   cust_id=cust_id, order_number=order_number)
+
+def legacy_payment(amount='2.40', day=DAY):
+    """A payment as unpickled from the old payments.pkl, from before cust_id and order_number"""
+    legacy = Payment.__new__(Payment)
+    legacy.__dict__.update(payment_id='PAY1', payment_amount=Decimal(amount), payment_date=day)
+    return legacy
+
+def test_order_number_wins_over_the_key(orders):
+    first, second = orders
+    paid = [payment(order_number=second), payment(order_number=second)]
+    report = Reconciler(orders).run(paid)
+    assert report.matched == {paid[0].payment_id: second}
+    assert report.duplicates == [(paid[1].payment_id, second)]
+    assert report.unmatched == []
+
+def test_key_join_pays_each_order_once(orders):
+    # Both orders have the same key, so three payments leave one duplicate
+    paid = [payment(), payment(day=DAY.replace(day=7)), payment()]
+    report = Reconciler(orders).run(paid)
+    assert sorted(report.matched.values()) == sorted(orders)
+    assert [payment_id for payment_id, _ in report.duplicates] == [paid[2].payment_id]
+
+def test_payments_without_an_order_are_unmatched(orders):
+    paid = [payment(amount='9.99'), payment(cust_id='C2'), payment(order_number='ORD1')]
+    report = Reconciler(orders).run(paid)
+    assert report.unmatched == [p.payment_id for p in paid]
+
+def test_legacy_payment_is_reported_unmatched(orders):
+    report = Reconciler(orders).run([legacy_payment()])
+    assert report.unmatched == ['PAY1']
+    assert not report.matched and not report.duplicates
@@ -0,0 +1,40 @@
+from report_cache import ReportCache, ReportError, bump_data_version
+
+def counting(result):
+    calls = []
+    def compute():
+        calls.append(1)
+        return result
+    return compute, calls
+
+def test_result_is_reused_until_the_data_version_moves():
+    cache = ReportCache()
+    compute, calls = counting("report")
+    assert cache.get_or_compute('popular_items', (), compute) == "report"
+    assert cache.get_or_compute('popular_items', (), compute) == "report"
+    assert len(calls) == 1
+    bump_data_version()
+    cache.get_or_compute('popular_items', (), compute)
+    assert len(calls) == 2
+
+def test_parameters_are_part_of_the_key():
+    cache = ReportCache()
+    compute, calls = counting("report")
+    cache.get_or_compute('sales_report', (1, 2), compute)
+    cache.get_or_compute('sales_report', (1, 3), compute)
+    assert len(calls) == 2
+
+def test_errors_are_not_cached():
+    cache = ReportCache()
+    compute, calls = counting(ReportError("Error generating report: boom"))
+    assert cache.get_or_compute('popular_items', (), compute) == "Error generating report: boom"
+    cache.get_or_compute('popular_items', (), compute)
+    assert len(calls) == 2 and len(cache) == 0
+
+def test_least_recently_used_results_are_evicted_over_budget():
+    cache = ReportCache(budget_bytes=250)
+    for report in ('a', 'b', 'c'):
+        cache.get_or_compute(report, (), lambda: "x" * 100)
+    compute, calls = counting("x" * 100)
+    cache.get_or_compute('a', (), compute)
+    assert len(calls) == 1 and len(cache) == 2
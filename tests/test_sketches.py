@@ -0,0 +1,74 @@
+import random
+from datetime import date
+import pytest
+from order_events import CHECKOUT, FULFILL, NO_PARENT, EventLine, OrderEvent, append_event
+from sketches import DistinctCounter, OrderSketch, OrderSketches, QuantileSketch
+
+def true_quantile(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+def event(order_number, cust_id, day, total_cents, lines=1, kind=CHECKOUT):
+    top = tuple(EventLine(f'Veggie {i}', 2, 1000, 100, NO_PARENT) for i in range(lines))
+    return OrderEvent(kind, order_number, cust_id, day.toordinal(), total_cents, total_cents, top)
+
+def test_quantile_sketch_is_within_one_percent():
+    generator = random.Random(7)
+    values = [generator.randint(1, 10 ** 6) for _ in range(5000)] + [0] * 10
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    for q in (0.0, 0.5, 0.95, 1.0):
+        assert sketch.quantile(q) == pytest.approx(true_quantile(values, q), rel=0.01)
+    assert QuantileSketch().quantile(0.5) is None
+
+def test_quantile_sketch_merge_equals_adding_the_union():
+    left, right, union = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in range(0, 3000, 7):
+        left.add(value)
+        union.add(value)
+    for value in range(5, 90000, 11):
+        right.add(value)
+        union.add(value)
+    left.merge(right)
+    assert left.counts == union.counts
+    assert left.count == union.count
+    assert left.quantile(0.5) == union.quantile(0.5)
+
+def test_distinct_counter_merge():
+    left, right = DistinctCounter(), DistinctCounter()
+    for number in range(3000):
+        left.add(f'C{number}')
+    for number in range(2000, 6000):
+        right.add(f'C{number}')
+    assert left.estimate() == pytest.approx(3000, rel=0.1)
+    left.merge(right)
+    assert left.estimate() == pytest.approx(6000, rel=0.1)
+    assert DistinctCounter().estimate() == 0
+
+def test_order_sketch_merge():
+    monday, tuesday = OrderSketch(), OrderSketch()
+    monday.add(event('ORD1', 'C1', date(2024, 5, 6), 1000, lines=2))
+    monday.add(event('ORD2', 'C2', date(2024, 5, 6), 3000, lines=1))
+    tuesday.add(event('ORD3', 'C1', date(2024, 5, 7), 2000, lines=2))
+    monday.merge(tuesday)
+    assert monday.orders == 3
+    assert monday.basket_sizes == {1: 1, 2: 2}
+    assert monday.customers.estimate() == 2
+    assert monday.values.quantile(0.5) == pytest.approx(2000, rel=0.01)
+
+def test_summary_merges_whole_months_and_partial_days(monkeypatch):
+    import sketches
+    store = OrderSketches('data/sketches.pkl')
+    monkeypatch.setattr(sketches, '_order_sketches', store)
+    days = [date(2024, 4, 30), date(2024, 5, 1), date(2024, 5, 31), date(2024, 6, 1), date(2024, 6, 2)]
+    for number, day in enumerate(days):
+        append_event(event(f'ORD{number}', f'C{number % 2}', day, 1000 * (number + 1)))
+    append_event(event('ORD0', 'C0', days[0], 1000, kind=FULFILL))  # Not counted again
+
+    summary = sketches.summarize_orders(date(2024, 4, 30), date(2024, 6, 1))
+    assert summary.orders == 4
+    assert summary.basket_sizes == {1: 4}
+    assert summary.distinct_customers == 2
+    assert summary.p95_cents == pytest.approx(true_quantile([1000, 2000, 3000, 4000], 0.95), rel=0.01)
+    assert sketches.summarize_orders(date(2024, 5, 1), date(2024, 5, 31)).orders == 2
+    assert sketches.summarize_orders(date(2024, 7, 1), date(2024, 7, 31)).median_cents is None
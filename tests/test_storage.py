@@ -0,0 +1,63 @@
+import os
+import pytest
+from storage import (PREVIOUS_GENERATION, StoreConflict, StoreCorrupt, footer_version, load_store,
+                     read_store, save_store, store_version, update_store, verify_stores, write_store)
+
+STORE = 'data/store.pkl'
+
+def flip_byte(path: str, position: int = 0):
+    with open(path, 'r+b') as file:
+        file.seek(position)
+        byte = file.read(1)
+        file.seek(position)
+        file.write(bytes([byte[0] ^ 0xFF]))
+
+def test_missing_store_uses_default():
+    assert read_store(STORE, list) == ([], 0)
+    assert store_version(STORE) == 0
+
+def test_save_and_load_round_trip():
+    assert save_store(STORE, {'a': 1}) == 1
+    assert save_store(STORE, {'a': 2}) == 2
+    assert read_store(STORE) == ({'a': 2}, 2)
+    assert store_version(STORE) == footer_version(STORE) == 2
+
+def test_checksum_failure_falls_back_to_previous_generation(caplog):
+    save_store(STORE, {'a': 1})
+    save_store(STORE, {'a': 2})
+    flip_byte(STORE)
+    assert load_store(STORE) == {'a': 1}
+    assert store_version(STORE) == 1
+    assert 'using previous generation' in caplog.text
+
+def test_both_generations_damaged_raises():
+    save_store(STORE, {'a': 1})
+    save_store(STORE, {'a': 2})
+    flip_byte(STORE)
+    flip_byte(STORE + PREVIOUS_GENERATION)
+    with pytest.raises(StoreCorrupt):
+        load_store(STORE)
+
+def test_write_store_rejects_stale_version():
+    version = save_store(STORE, {'a': 1})
+    assert write_store(STORE, {'a': 2}, version) == version + 1
+    with pytest.raises(StoreConflict):
+        write_store(STORE, {'a': 3}, version)
+    assert load_store(STORE) == {'a': 2}
+
+def test_update_store_applies_mutation_and_returns_its_result():
+    def increment(data):
+        data['count'] = data.get('count', 0) + 1
+        return data['count']
+    assert update_store(STORE, increment) == 1
+    assert update_store(STORE, increment) == 2
+    assert read_store(STORE) == ({'count': 2}, 2)
+
+def test_verify_stores_restores_truncated_store(caplog):
+    save_store(STORE, {'a': 1})
+    save_store(STORE, {'a': 2})
+    with open(STORE, 'r+b') as file:
+        file.truncate(os.path.getsize(STORE) - 3)
+    verify_stores([STORE, 'data/missing.pkl'])
+    assert read_store(STORE) == ({'a': 1}, 1)
+    assert 'restored previous generation' in caplog.text
@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+import trending
+from model import PremadeBox, UnitPriceVeggie
+from money import ZERO
+from trending import RETAIN_DAYS, TrendingCounters, trending_products
+
+TODAY = date.today()
+
+@pytest.fixture
+def counters(monkeypatch):
+    counters = TrendingCounters('data/trending.pkl')
+    monkeypatch.setattr(trending, '_trending_counters', counters)
+    return counters
+
+def veggies(**quantities):
+    return [UnitPriceVeggie(name, quantity, Decimal('1.00')) for name, quantity in quantities.items()]
+
+def test_ranks_move_between_windows(counters, make_customer, place_order):
+    ann = make_customer('C1')
+    place_order(ann, TODAY - timedelta(days=10), *veggies(Kale=5, Leek=3, Onion=1))
+    place_order(ann, TODAY - timedelta(days=2), *veggies(Leek=4, Onion=9))
+
+    current, boxes = trending_products(7, today=TODAY)
+    assert [(row.name, row.quantity, row.change) for row in current] == [
+        ('Onion', 9000, 2), ('Leek', 4000, 0)]
+    assert boxes == []
+    # Onion was third, so it did not place in the previous top one
+    assert trending_products(7, k=1, today=TODAY)[0][0].previous_rank is None
+
+def test_box_contents_count_towards_veggies(counters, make_customer, place_order):
+    box = PremadeBox('Small Box', 1, Decimal('10.00'))
+    box.set_content([UnitPriceVeggie('Kale', 1, ZERO)])
+    place_order(make_customer('C1'), TODAY, box, *veggies(Leek=2))
+    current, boxes = trending_products(30, today=TODAY)
+    assert {row.name: row.quantity for row in current} == {'Leek': 2000, 'Kale': 1000}
+    assert [row.name for row in boxes] == ['Small Box']
+
+def test_compaction_keeps_only_retained_days(counters, make_customer, place_order):
+    ann = make_customer('C1')
+    place_order(ann, TODAY - timedelta(days=RETAIN_DAYS + 1), *veggies(Kale=1))
+    place_order(ann, TODAY, *veggies(Leek=1))
+    counters.compact()
+    assert list(TrendingCounters('data/trending.pkl').current()['days']) == [TODAY.toordinal()]
+
+def test_windows_are_bounded():
+    with pytest.raises(ValueError):
+        trending_products(RETAIN_DAYS)
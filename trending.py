@@ -0,0 +1,91 @@
+# Trending products over sliding windows, from per-day sales counters
+# derived from the order-event journal.
+import heapq
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from derived_store import DerivedStore, register
+from order_events import CHECKOUT, KIND_BOX, OrderEvent
+
+TRENDING_FILE = 'data/trending.snapshot.pkl'
+WINDOWS = (7, 30, 90)
+# Two of the longest window, so the previous window can be compared with the current one
+RETAIN_DAYS = 2 * max(WINDOWS)
+
+class TrendRow(NamedTuple):
+    """One product in a trending ranking"""
+    name: str
+    quantity: int                 # In thousandths over the current window
+    rank: int                     # 1 is the best seller
+    previous_rank: Optional[int]  # Rank over the previous window, None if it did not place
+
+    @property
+    def change(self) -> Optional[int]:
+        """Places gained since the previous window (negative if it fell), None if new"""
+        return None if self.previous_rank is None else self.previous_rank - self.rank
+
+class TrendingCounters(DerivedStore):
+    def __init__(self, snapshot_file: str = TRENDING_FILE):
+        """Initialize per-day sales counters over the last RETAIN_DAYS days"""
+        super().__init__(snapshot_file, "trending counters")
+
+    def new_state(self) -> dict:
+        # 'days': day ordinal -> {product name: quantity in thousandths}, box contents included
+        # 'kinds': product name -> KIND_* of order_events
+        return {'days': {}, 'kinds': {}}
+
+    def apply(self, counters: dict, event: OrderEvent):
+        if event.kind != CHECKOUT:
+            return
+        bucket = counters['days'].setdefault(event.day, {})
+        for line in event.lines:
+            counters['kinds'].setdefault(line.name, line.kind)
+            bucket[line.name] = bucket.get(line.name, 0) + line.qty
+
+    def trim(self, counters: dict):
+        oldest = date.today().toordinal() - RETAIN_DAYS
+        for day in [day for day in counters['days'] if day <= oldest]:
+            del counters['days'][day]
+
+_trending_counters = register(TrendingCounters())
+
+def _window_totals(counters: dict, first_day: int, last_day: int) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for day in range(first_day, last_day + 1):
+        for name, qty in counters['days'].get(day, {}).items():
+            totals[name] = totals.get(name, 0) + qty
+    return totals
+
+def _top(totals: Dict[str, int], k: int) -> List[Tuple[str, int]]:
+    return heapq.nsmallest(k, totals.items(), key=lambda pair: (-pair[1], pair[0]))
+
+def trending_products(window_days: int, k: int = 10,
+                      today: date = None) -> Tuple[List[TrendRow], List[TrendRow]]:
+    """Rank the best sellers of the last window_days against the window before it
+
+    Only the day buckets of the two windows are read, so the cost depends on the
+    window and the catalogue, never on how much history there is.
+
+    Args:
+        window_days (int): Window length in days, at most RETAIN_DAYS // 2
+        k (int): Products to rank per category
+        today (date): Last day of the current window, today by default
+
+    Returns:
+        Tuple[List[TrendRow], List[TrendRow]]: (veggies, boxes), best sellers first
+    """
+    if not 0 < window_days <= RETAIN_DAYS // 2:
+        raise ValueError(f"Trending windows are 1 to {RETAIN_DAYS // 2} days")
+    counters = _trending_counters.current()
+    last_day = (today or date.today()).toordinal()
+    current = _window_totals(counters, last_day - window_days + 1, last_day)
+    previous = _window_totals(counters, last_day - 2 * window_days + 1, last_day - window_days)
+
+    rankings = []
+    for is_box in (False, True):
+        in_category = lambda totals: {name: qty for name, qty in totals.items()
+                                      if (counters['kinds'][name] == KIND_BOX) == is_box}
+        previous_ranks = {name: rank for rank, (name, _) in
+                          enumerate(_top(in_category(previous), k), start=1)}
+        rankings.append([TrendRow(name, qty, rank, previous_ranks.get(name)) for rank, (name, qty)
+                         in enumerate(_top(in_category(current), k), start=1)])
+    return rankings[0], rankings[1]